@@ -1,9 +1,9 @@
 # app/__init__.py
 
 import os
-from flask import Flask
+import time
+from flask import Flask, current_app
 from flask_cors import CORS
-from flask_session import Session
 from flask_mail import Mail
 from config import Config
 
@@ -13,7 +13,10 @@ mail = Mail()
 def create_app(config_class=Config):
     """
     Application Factory: Membuat dan mengonfigurasi instance aplikasi Flask.
+    TensorFlow tidak diimpor di sini; model dimuat lazy oleh ModelProvider.
     """
+    startup_started = time.perf_counter()
+
     # Secara eksplisit memberitahu Flask lokasi folder static dan templates
     # relatif terhadap folder 'app' ini.
     app = Flask(__name__,
@@ -22,10 +25,18 @@ def create_app(config_class=Config):
 
     # Memuat konfigurasi dari file config.py
     app.config.from_object(config_class)
+    if app.config.get('UPLOAD_SEND_MODE') == 'x-sendfile':
+        app.config['USE_X_SENDFILE'] = True
+
+    # Alamat klien dari X-Forwarded-For jika aplikasi berada di belakang proxy terpercaya
+    if app.config.get('PROXY_FIX_X_FOR'):
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
 
     # Inisialisasi ekstensi Flask dengan aplikasi
     CORS(app)
-    Session(app)
+    from app.utils.sessions import init_app as init_sessions
+    init_sessions(app)
     mail.init_app(app)
 
     # Memastikan folder untuk unggahan ada
@@ -34,7 +45,20 @@ def create_app(config_class=Config):
     os.makedirs(os.path.join(root_dir, app.config['UPLOAD_FOLDER_RAW']), exist_ok=True)
     os.makedirs(os.path.join(root_dir, app.config['UPLOAD_FOLDER_DETECTED']), exist_ok=True)
     os.makedirs(os.path.join(root_dir, app.config['UPLOAD_FOLDER_PROFILE']), exist_ok=True)
+    os.makedirs(os.path.join(root_dir, app.config['THUMBNAIL_FOLDER']), exist_ok=True)
+
 
+    # Pool koneksi database (satu koneksi per request, dikembalikan saat teardown)
+    from app.utils.db import init_app as init_db
+    init_db(app)
+
+    # Cache record pengguna (profil dan avatar) per proses
+    from app.utils.user_cache import user_cache
+    user_cache.init_app(app)
+
+    # Rate limit token bucket (login, unggah) dan batas inferensi bersamaan
+    from app.utils.rate_limit import init_app as init_rate_limit
+    init_rate_limit(app)
 
     # --- Registrasi Blueprint ---
     # Impor dilakukan di dalam fungsi untuk menghindari circular import
@@ -49,4 +73,134 @@ def create_app(config_class=Config):
     app.register_blueprint(profile_bp, url_prefix='/profile')
     app.register_blueprint(admin_bp, url_prefix='/admin')
 
-    return app
\ No newline at end of file
+    # Menerapkan konfigurasi inferensi (batching) ke modul prediksi
+    from app.utils.prediction import init_app as init_prediction
+    init_prediction(app)
+
+    # Buffer write-behind record deteksi (didaftarkan sebelum upload_writer agar
+    # di-flush setelah antrean writer kosong saat proses berhenti)
+    from app.utils.detection_buffer import detection_buffer
+    from app.utils.detections import write_detections
+    detection_buffer.init_app(app, write_detections)
+
+    # Writer background untuk menyimpan file unggahan dan data deteksi
+    from app.utils.background_writer import upload_writer
+    upload_writer.init_app(app)
+
+    # Antrean job deteksi asinkron (/upload?mode=async)
+    from app.utils.job_queue import detection_jobs
+    from app.routes.main_routes import run_detection_job
+    detection_jobs.init_app(app, run_detection_job)
+
+    # Antrean email keluar (reset password) dengan koneksi SMTP yang dipakai ulang
+    from app.utils.mailer import init_app as init_mailer
+    init_mailer(app)
+
+    # Antrean job penghapusan massal (tombstone + penghapusan file paralel)
+    from app.utils.purge import purge_jobs, run_purge_job
+    purge_jobs.init_app(app, run_purge_job, config_prefix='PURGE_JOB')
+
+    # Metrik latensi per rute + gauge dari komponen internal untuk /metrics
+    from app.utils.metrics import metrics, init_app as init_metrics
+    init_metrics(app)
+    metrics.register_collector('runtime', _runtime_gauges)
+
+    # Perintah CLI (konversi model, dll.)
+    from app.commands import register_commands
+    register_commands(app)
+
+    # Worker antrean job dijalankan oleh entry point server; flag ini untuk server WSGI lain
+    if app.config.get('JOB_QUEUE_START_WORKERS'):
+        start_job_workers()
+
+    # Mencatat waktu startup aplikasi (tanpa waktu pemuatan model)
+    app.extensions['startup_seconds'] = time.perf_counter() - startup_started
+    print(f"Application created in {app.extensions['startup_seconds'] * 1000:.1f} ms.")
+
+    return app
+
+
+def start_job_workers():
+    """Menjalankan thread worker antrean deteksi, email, dan purge di proses ini."""
+    from app.utils.job_queue import detection_jobs
+    from app.utils.mailer import mail_jobs
+    from app.utils.purge import purge_jobs
+
+    for queue in (detection_jobs, mail_jobs, purge_jobs):
+        queue.start()
+
+
+def _runtime_gauges():
+    """Gauge dan counter dari komponen internal (batcher, cache, writer, buffer deteksi, pool DB, cache pengguna, session, admission, antrean job, purge dan email) untuk /metrics."""
+    from app.utils.prediction import batcher, prediction_cache
+    from app.utils.background_writer import upload_writer
+    from app.utils.job_queue import detection_jobs
+    from app.utils.db_pool import db_pool
+    from app.utils.detection_buffer import detection_buffer
+    from app.utils.user_cache import user_cache
+    from app.utils.purge import purge_jobs
+    from app.utils.rate_limit import inference_admission, rate_limiter
+    from app.utils.mailer import mail_jobs, smtp_sender
+
+    batch_stats = batcher.stats()
+    samples = [
+        ('inference_batch_queue_depth', {}, batch_stats['queue_depth']),
+        ('inference_batch_avg_size', {}, batch_stats['avg_batch_size']),
+        ('inference_batch_avg_queue_wait_seconds', {}, batch_stats['avg_queue_wait_ms'] / 1000.0),
+        ('prediction_cache_hits_total', {}, prediction_cache.hits, 'counter'),
+        ('prediction_cache_misses_total', {}, prediction_cache.misses, 'counter'),
+        ('upload_writer_queue_depth', {}, upload_writer.stats()['queue_depth']),
+        ('user_cache_hits_total', {}, user_cache.hits, 'counter'),
+        ('user_cache_misses_total', {}, user_cache.misses, 'counter'),
+        ('user_cache_entries', {}, len(user_cache._entries)),
+        ('inference_inflight', {}, inference_admission.inflight),
+        ('rate_limit_tracked_keys', {}, len(rate_limiter)),
+    ]
+    session_stats = getattr(current_app.session_interface, 'stats', None)
+    if session_stats is not None:
+        stats = session_stats()
+        samples += [
+            ('session_store_reads_total', {}, stats['reads'], 'counter'),
+            ('session_store_writes_total', {}, stats['writes'], 'counter'),
+            ('session_store_touches_total', {}, stats['touches'], 'counter'),
+            ('session_store_gc_removed_total', {}, stats['gc_removed'], 'counter'),
+        ]
+    buffer_stats = detection_buffer.stats()
+    samples += [
+        ('detection_buffer_pending', {}, buffer_stats['pending']),
+        ('detection_buffer_oldest_age_seconds', {}, buffer_stats['oldest_pending_age_ms'] / 1000.0),
+        ('detection_buffer_failed_rows_total', {}, buffer_stats['failed'], 'counter'),
+        ('detection_buffer_spilled_rows_total', {}, buffer_stats['spilled'], 'counter'),
+        ('detection_buffer_spill_pending', {}, buffer_stats['spill_pending']),
+    ]
+    pool_stats = db_pool.stats()
+    samples += [
+        ('db_pool_connections_open', {}, pool_stats['open']),
+        ('db_pool_connections_in_use', {}, pool_stats['in_use']),
+        ('db_pool_checkouts_total', {}, pool_stats['checkouts'], 'counter'),
+        ('db_pool_waits_total', {}, pool_stats['waits'], 'counter'),
+        ('db_pool_timeouts_total', {}, pool_stats['timeouts'], 'counter'),
+    ]
+    if detection_jobs.enabled:
+        job_stats = detection_jobs.stats()
+        samples += [
+            ('detection_jobs_queue_length', {}, job_stats['queue_length']),
+            ('detection_jobs_running', {}, job_stats['running']),
+            ('detection_jobs_oldest_age_seconds', {}, job_stats['oldest_queued_age_seconds']),
+        ]
+    if purge_jobs.enabled:
+        purge_stats = purge_jobs.stats()
+        samples += [
+            ('purge_jobs_queue_length', {}, purge_stats['queue_length']),
+            ('purge_jobs_running', {}, purge_stats['running']),
+        ]
+    if mail_jobs.enabled:
+        mail_stats = mail_jobs.stats()
+        samples += [
+            ('mail_queue_length', {}, mail_stats['queue_length']),
+            ('mail_queue_failed', {}, mail_stats['failed']),
+            ('mail_queue_oldest_age_seconds', {}, mail_stats['oldest_queued_age_seconds']),
+            ('mail_smtp_connects_total', {}, smtp_sender.connects, 'counter'),
+            ('mail_sent_total', {}, smtp_sender.sent, 'counter'),
+        ]
+    return samples
\ No newline at end of file
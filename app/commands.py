@@ -0,0 +1,288 @@
+# app/commands.py
+import json
+import os
+import resource
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+# Grup perintah CLI untuk pengelolaan model: `flask --app run model ...`
+model_cli = AppGroup('model', help='Konversi dan pengecekan artefak model.')
+
+# Grup perintah CLI untuk data deteksi: `flask --app run detections ...`
+detections_cli = AppGroup('detections', help='Pemeliharaan data deteksi.')
+
+# Grup perintah CLI untuk skema database: `flask --app run db ...`
+db_cli = AppGroup('db', help='Migrasi dan pengecekan skema database.')
+
+# Grup perintah CLI untuk session server-side: `flask --app run sessions ...`
+sessions_cli = AppGroup('sessions', help='Pemeliharaan store session.')
+
+# Grup perintah untuk pemeliharaan folder uploads
+uploads_cli = AppGroup('uploads', help='Retensi dan rekonsiliasi file unggahan.')
+
+# Grup perintah untuk email keluar
+mail_cli = AppGroup('mail', help='Pengujian SMTP dan status antrean email.')
+
+
+@model_cli.command('convert')
+@click.option('--target', 'targets', multiple=True,
+              type=click.Choice(['tflite_fp16', 'tflite_int8', 'onnx']),
+              help='Artefak yang dibuat (default: semua).')
+def convert_model(targets):
+    """Membuat artefak TFLite (fp16/int8) dan ONNX dari model Keras."""
+    from .utils.model_convert import convert_tflite, convert_onnx
+
+    model_path = current_app.config['MODEL_PATH']
+    for target in targets or ('tflite_fp16', 'tflite_int8', 'onnx'):
+        try:
+            if target == 'onnx':
+                out_path = convert_onnx(model_path)
+            else:
+                out_path = convert_tflite(model_path, target.split('_', 1)[1])
+            click.echo(f"{target}: {out_path}")
+        except Exception as e:
+            click.echo(f"{target}: gagal ({e})", err=True)
+
+
+@model_cli.command('parity')
+@click.argument('sample_folder', type=click.Path(exists=True, file_okay=False))
+@click.option('--backend', required=True, type=click.Choice(['tflite_fp16', 'tflite_int8', 'onnx']))
+@click.option('--tolerance', default=0.02, show_default=True, help='Selisih confidence maksimum.')
+@click.option('--limit', default=None, type=int, help='Jumlah gambar maksimum yang diperiksa.')
+def parity_check(sample_folder, backend, tolerance, limit):
+    """Memastikan label dan confidence backend kandidat sama dengan Keras."""
+    from .utils.model_convert import check_parity
+
+    report = check_parity(
+        current_app.config['MODEL_PATH'], backend, sample_folder,
+        tolerance=tolerance, limit=limit,
+        num_threads=current_app.config.get('INFERENCE_NUM_THREADS')
+    )
+    # ru_maxrss dalam KB di Linux
+    report['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    click.echo(json.dumps(report, indent=2))
+    if not report['passed']:
+        raise SystemExit(1)
+
+
+@model_cli.command('serve-pool')
+@click.option('--workers', default=None, type=int, help='Jumlah proses worker (default: INFERENCE_POOL_WORKERS).')
+def serve_inference_pool(workers):
+    """Menjalankan pool proses inferensi yang memiliki model."""
+    from functools import partial
+    from .utils.inference_backends import create_backend
+    from .utils.inference_pool import InferencePoolServer, parse_cpu_affinity, pool_settings
+    from .utils.prediction import model_provider
+
+    config = current_app.config
+    # Jangan fork selagi thread preload (klien pool) masih berjalan
+    model_provider.join_preload()
+    if not config.get('INFERENCE_POOL_ADDRESS'):
+        raise click.UsageError("INFERENCE_POOL_ADDRESS belum dikonfigurasi.")
+    try:
+        address, authkey = pool_settings(config)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    server = InferencePoolServer(
+        address,
+        authkey,
+        partial(create_backend, config.get('INFERENCE_BACKEND', 'keras'), config['MODEL_PATH'],
+                num_threads=config.get('INFERENCE_NUM_THREADS')),
+        num_workers=workers or int(config.get('INFERENCE_POOL_WORKERS', 2)),
+        cpu_affinity=parse_cpu_affinity(config.get('INFERENCE_POOL_CPU_AFFINITY'))
+    )
+    server.serve_forever()
+
+
+@detections_cli.command('rescore')
+@click.option('--batch-size', default=32, show_default=True, help='Jumlah gambar per batch inferensi.')
+@click.option('--workers', default=None, type=int, help='Jumlah proses untuk decode/preprocessing (default: jumlah CPU).')
+@click.option('--checkpoint', default='rescore_checkpoint.json', show_default=True,
+              help='File checkpoint untuk melanjutkan proses yang terhenti.')
+@click.option('--dry-run', is_flag=True, help='Hanya tampilkan perubahan label tanpa menulis ke database.')
+@click.option('--limit', default=None, type=int, help='Jumlah gambar maksimum yang diproses.')
+@click.option('--output', default=None, type=click.Path(dir_okay=False), help='Simpan ringkasan (JSON) ke file.')
+def rescore_detections(batch_size, workers, checkpoint, dry_run, limit, output):
+    """Memprediksi ulang semua gambar tersimpan dengan model saat ini."""
+    from .utils.rescoring import rescore_images
+
+    upload_base_dir = os.path.normpath(os.path.join(current_app.root_path, '..', current_app.config['UPLOAD_FOLDER_BASE']))
+    summary = rescore_images(
+        upload_base_dir, batch_size=batch_size, workers=workers,
+        checkpoint_path=checkpoint, dry_run=dry_run, limit=limit, progress=click.echo
+    )
+
+    click.echo(
+        f"Selesai: {summary['processed']} gambar diproses, {summary['missing']} file tidak ditemukan, "
+        f"{summary['changed']} label berubah, {summary['images_per_second']:.1f} images/sec."
+    )
+    if dry_run:
+        for change in summary['changes']:
+            click.echo(f"  #{change['detection_id']} {change['image_path']}: {change['old']} -> {change['new']}")
+    if output:
+        with open(output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+@detections_cli.command('replay-spill')
+def replay_spilled_detections():
+    """Menulis ulang record deteksi yang tersimpan di file spill buffer."""
+    from .utils.detection_buffer import detection_buffer
+
+    replayed = detection_buffer.replay_spilled()
+    click.echo(f"{replayed} record ditulis ulang, {detection_buffer.stats()['spill_pending']} masih tersimpan di spill.")
+
+
+@detections_cli.command('rebuild-stats')
+def rebuild_detection_stats():
+    """Menghitung ulang tabel ringkasan dan users.total_uploads dari tabel deteksi."""
+    from .utils.detection_stats import rebuild_stats
+
+    counts = rebuild_stats()
+    click.echo(f"Ringkasan dibangun ulang: {counts['daily_rows']} baris harian, {counts['user_rows']} baris per pengguna.")
+
+
+@db_cli.command('upgrade')
+def db_upgrade():
+    """Menjalankan file migrasi SQL (folder migrations/) yang belum diterapkan."""
+    from .utils.db import get_db_connection
+    from .utils.migrations import apply_migrations
+
+    conn = get_db_connection()
+    if conn is None:
+        raise click.ClickException("Koneksi database gagal.")
+    try:
+        applied = apply_migrations(conn, progress=click.echo)
+    finally:
+        conn.close()
+    click.echo(f"{len(applied)} migrasi diterapkan." if applied else "Skema sudah terbaru.")
+
+
+@db_cli.command('status')
+def db_status():
+    """Menampilkan migrasi yang sudah dan belum diterapkan."""
+    from .utils.db import get_db_connection
+    from .utils.migrations import applied_migrations, list_migrations
+
+    conn = get_db_connection()
+    if conn is None:
+        raise click.ClickException("Koneksi database gagal.")
+    try:
+        done = applied_migrations(conn)
+    finally:
+        conn.close()
+    for version in list_migrations():
+        click.echo(f"[{'x' if version in done else ' '}] {version}")
+
+
+@db_cli.command('explain')
+def db_explain():
+    """
+    Menampilkan rencana EXPLAIN untuk query paginasi /history dan /admin/logs.
+    Keluar dengan status 1 jika ada full table scan atau filesort (jalankan
+    pada database berisi data, mis. hasil benchmarks/seed.py).
+    """
+    from datetime import datetime
+    from .utils.db import get_db_connection
+    from .utils.detection_queries import HISTORY_SELECT, ADMIN_LOGS_SELECT, ORDER_BY, detection_where
+    from .utils.migrations import explain, plan_problems
+
+    cursor = (datetime.now(), 2 ** 31 - 1)
+    cases = [
+        ('history', HISTORY_SELECT, {'user_id': 1}, None),
+        ('history (cursor)', HISTORY_SELECT, {'user_id': 1}, cursor),
+        ('admin logs', ADMIN_LOGS_SELECT, {}, None),
+        ('admin logs (cursor)', ADMIN_LOGS_SELECT, {}, cursor),
+        ('admin logs (result)', ADMIN_LOGS_SELECT, {'result': 'Healthy'}, cursor),
+        ('admin logs (date range)', ADMIN_LOGS_SELECT,
+         {'date_from': datetime(2024, 1, 1), 'date_to': datetime(2024, 2, 1)}, None),
+        ('admin logs (user)', ADMIN_LOGS_SELECT, {'user_id': 1}, cursor),
+    ]
+
+    conn = get_db_connection()
+    if conn is None:
+        raise click.ClickException("Koneksi database gagal.")
+    failed = False
+    try:
+        for name, select_from, filters, page_cursor in cases:
+            where, params = detection_where(filters, page_cursor)
+            plan = explain(conn, f"{select_from} {where} {ORDER_BY} LIMIT %s", (*params, 51))
+            problems = plan_problems(plan)
+            failed = failed or bool(problems)
+            click.echo(f"{name}: {'OK' if not problems else ', '.join(problems)}")
+            for row in plan:
+                click.echo(f"    {row.get('table')}: type={row.get('type')} key={row.get('key')} "
+                           f"rows={row.get('rows')} extra={row.get('Extra')}")
+    finally:
+        conn.close()
+    if failed:
+        raise SystemExit(1)
+
+
+@sessions_cli.command('gc')
+def sessions_gc():
+    """Menghapus entri session yang sudah kedaluwarsa (SESSION_BACKEND = 'kv')."""
+    interface = current_app.session_interface
+    if not hasattr(interface, 'gc'):
+        click.echo(f"Backend session '{current_app.config.get('SESSION_BACKEND')}' tidak menyimpan entri di server.")
+        return
+    removed = interface.gc()
+    remaining = interface.store.count()
+    click.echo(f"{removed} session kedaluwarsa dihapus." + (f" {remaining} session tersisa." if remaining is not None else ""))
+
+
+@uploads_cli.command('reap')
+@click.option('--dry-run', is_flag=True, help='Hanya hitung file dan token yang akan dihapus.')
+@click.option('--limit', default=None, type=int, help='Jumlah file tanpa referensi maksimum per folder (default: RETENTION_MAX_FILES_PER_RUN).')
+def uploads_reap(dry_run, limit):
+    """Menghapus file unggahan tanpa referensi yang melewati masa retensi dan token reset kedaluwarsa."""
+    from app.utils.retention import run_retention
+
+    try:
+        report = run_retention(dry_run=dry_run, limit=limit, progress=click.echo)
+    except ConnectionError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Total {report['bytes_reclaimed'] / 1024 / 1024:.1f} MB "
+               f"{'dapat dibebaskan' if dry_run else 'dibebaskan'} dalam {report['duration_seconds']} detik.")
+
+
+@mail_cli.command('send-test')
+@click.argument('recipient')
+@click.option('--count', default=1, show_default=True, help='Jumlah email (lewat satu koneksi SMTP yang dipakai ulang).')
+def mail_send_test(recipient, count):
+    """Mengirim email uji langsung (tanpa antrean) ke server SMTP yang dikonfigurasi."""
+    from app.utils.mailer import smtp_sender, build_message
+
+    started = time.perf_counter()
+    try:
+        for i in range(count):
+            smtp_sender.send(build_message({
+                "subject": f"FusaCheck test email {i + 1}/{count}",
+                "recipients": [recipient],
+                "body": "Email uji dari `flask mail send-test`.",
+            }))
+    finally:
+        smtp_sender.close()
+    stats = smtp_sender.stats()
+    click.echo(f"{stats['sent']} email terkirim lewat {stats['connects']} koneksi SMTP "
+               f"dalam {time.perf_counter() - started:.2f} detik.")
+
+
+@mail_cli.command('status')
+def mail_status():
+    """Menampilkan statistik antrean email (termasuk job yang gagal permanen)."""
+    from app.utils.mailer import mail_jobs
+    click.echo(json.dumps(mail_jobs.stats(), indent=2))
+
+
+def register_commands(app):
+    """Mendaftarkan semua grup perintah CLI ke aplikasi."""
+    app.cli.add_command(model_cli)
+    app.cli.add_command(detections_cli)
+    app.cli.add_command(db_cli)
+    app.cli.add_command(sessions_cli)
+    app.cli.add_command(uploads_cli)
+    app.cli.add_command(mail_cli)
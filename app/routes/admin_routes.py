@@ -10,17 +10,39 @@ from flask import (
     request, 
     url_for, 
     current_app,
-    flash
+    flash,
+    Response,
+    stream_with_context
 )
 from werkzeug.security import generate_password_hash
 
 # --- Impor Modul Internal (Gunakan Impor Relatif) ---
-from ..utils.db import query_db, execute_db, get_db_connection
+from ..utils.db import query_db, execute_db
+from ..utils.detection_queries import (
+    FilterError, ADMIN_LOGS_SELECT, parse_detection_filters, parse_page_args, fetch_detection_page
+)
+from ..utils.prediction import batcher, prediction_cache, model_provider, readable_labels
+from ..utils.background_writer import upload_writer
+from ..utils.detections import delete_detections
+from ..utils.detection_stats import get_dashboard_stats
+from ..utils.exports import iter_detection_rows, iter_csv, iter_ndjson, gzip_stream
+from ..utils.detection_buffer import detection_buffer
+from ..utils.thumbnails import thumbnail_url
+from ..utils.job_queue import detection_jobs, QueueFullError, JOB_FAILED
+from ..utils.purge import purge_jobs, run_purge_job, new_purge_payload, PURGE_ALL, PURGE_FILTER, PURGE_USER
+from ..utils.db_pool import db_pool
+from ..utils.prefork import read_status, process_memory
+from ..utils.user_cache import user_cache
+from ..utils.rate_limit import inference_admission
+from ..utils.retention import read_report
 from .auth_routes import admin_required
 
 # --- Definisi Blueprint ---
 admin_bp = Blueprint('admin', __name__)
 
+# Filter yang diterima oleh /logs/purge
+PURGE_FILTER_KEYS = ('result', 'date_from', 'date_to', 'min_confidence', 'min_confidence_pct', 'user_id')
+
 # ====================================================================
 # RUTE UNTUK MENAMPILKAN HALAMAN (RENDER TEMPLATE)
 # ====================================================================
@@ -29,7 +51,8 @@ admin_bp = Blueprint('admin', __name__)
 @admin_required
 def dashboard():
     """Menampilkan halaman utama dashboard admin."""
-    return render_template('admin/dashboard.html', admin_username=session.get('admin_username'))
+    return render_template('admin/dashboard.html', admin_username=session.get('admin_username'),
+                           result_labels=readable_labels)
 
 @admin_bp.route('/users')
 @admin_required
@@ -44,21 +67,20 @@ def users_page():
 @admin_bp.route('/logs', methods=['GET'])
 @admin_required
 def get_admin_logs():
-    """API untuk mengambil semua data log deteksi untuk ditampilkan di dashboard."""
+    """
+    API untuk mengambil log deteksi untuk ditampilkan di dashboard.
+    Dipaginasi dengan cursor keyset (detection_date, id); mendukung filter
+    result, date_from, date_to, min_confidence dan user_id.
+    """
     try:
-        logs_data = query_db(
-            """
-            SELECT
-                d.id, d.detection_date, d.result, d.confidence,
-                r.image_path AS raw_image_path,
-                u.display_name AS user_name,
-                u.phone_number AS user_phone
-            FROM fusarium_new_detections d
-            JOIN users u ON d.user_id = u.id
-            LEFT JOIN fusarium_new_raw_images r ON d.raw_image_id = r.id
-            ORDER BY d.detection_date DESC
-            """
-        )
+        filters = parse_detection_filters(request.args, allow_user_filter=True)
+        limit, cursor = parse_page_args(request.args, current_app.config['DETECTION_PAGE_SIZE'],
+                                        current_app.config['DETECTION_MAX_PAGE_SIZE'])
+    except FilterError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        logs_data, next_cursor = fetch_detection_page(ADMIN_LOGS_SELECT, filters, cursor, limit)
 
         if logs_data is None:
             return jsonify({"error": "Gagal mengambil log dari database"}), 500
@@ -71,14 +93,54 @@ def get_admin_logs():
             image_path = log.get('raw_image_path')
             if image_path:
                 log['raw_image_url'] = url_for('main.serve_upload', filepath_in_uploads_dir=image_path.replace('\\', '/'))
+                log['thumbnail_url'] = thumbnail_url(image_path)
             else:
                 log['raw_image_url'] = None
+                log['thumbnail_url'] = None
         
-        return jsonify(logs_data)
+        return jsonify({"items": logs_data, "next_cursor": next_cursor, "limit": limit})
     except Exception as e:
         print(f"Error fetching admin logs: {e}")
         return jsonify({"error": "Terjadi kesalahan internal saat mengambil log."}), 500
 
+@admin_bp.route('/logs/export', methods=['GET'])
+@admin_required
+def export_admin_logs():
+    """
+    Mengekspor log deteksi sebagai CSV (default) atau NDJSON (?format=ndjson),
+    opsional dikompres gzip (?compress=gzip). Filter sama dengan /admin/logs.
+    Baris dialirkan langsung dari cursor database sehingga memori tetap konstan.
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({"error": "Format harus csv atau ndjson."}), 400
+    compress = request.args.get('compress') == 'gzip'
+    try:
+        filters = parse_detection_filters(request.args, allow_user_filter=True)
+    except FilterError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = iter_detection_rows(
+        filters,
+        fetch_size=current_app.config['EXPORT_FETCH_SIZE'],
+        net_write_timeout=current_app.config.get('EXPORT_NET_WRITE_TIMEOUT')
+    )
+    if rows is None:
+        return jsonify({"error": "Gagal mengambil log dari database"}), 500
+    chunks = iter_csv(rows) if export_format == 'csv' else iter_ndjson(rows)
+    filename = f"detections_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    if compress:
+        chunks = gzip_stream(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    else:
+        mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @admin_bp.route('/logs/<int:detection_id>', methods=['DELETE'])
 @admin_required
 def delete_admin_log(detection_id):
@@ -98,10 +160,9 @@ def delete_admin_log(detection_id):
     if not detection_info:
         return jsonify({"error": "Log deteksi tidak ditemukan"}), 404
 
-    # Hapus dari database
-    execute_db("DELETE FROM fusarium_new_detections WHERE id = %s", (detection_id,))
-    if detection_info.get('raw_image_id'):
-        execute_db("DELETE FROM fusarium_new_raw_images WHERE id = %s", (detection_info['raw_image_id'],))
+    # Hapus dari database (satu transaksi, ringkasan statistik ikut dikurangi)
+    if delete_detections("d.id = %s", (detection_id,)) is None:
+        return jsonify({"error": "Gagal menghapus log deteksi"}), 500
 
     # Hapus file gambar dari server
     if detection_info.get('image_path'):
@@ -117,6 +178,86 @@ def delete_admin_log(detection_id):
     return jsonify({"message": "Log dan data terkait berhasil dihapus"}), 200
 
 
+# ====================================================================
+# API ENDPOINTS UNTUK RINGKASAN DASHBOARD
+# ====================================================================
+
+@admin_bp.route('/stats', methods=['GET'])
+@admin_required
+def get_admin_stats():
+    """
+    API ringkasan dashboard (total per hasil, deret harian, pengguna teratas).
+    Dibaca dari tabel ringkasan sehingga waktunya tidak bergantung pada jumlah deteksi.
+    """
+    try:
+        days = max(1, min(int(request.args.get('days', 30)), 366))
+    except ValueError:
+        return jsonify({"error": "days harus berupa angka."}), 400
+    stats = get_dashboard_stats(days=days)
+    if stats is None:
+        return jsonify({"error": "Gagal mengambil statistik dari database"}), 500
+    return jsonify(stats)
+
+
+# ====================================================================
+# API ENDPOINTS UNTUK STATISTIK INFERENSI
+# ====================================================================
+
+@admin_bp.route('/inference/stats', methods=['GET'])
+@admin_required
+def get_inference_stats():
+    """API untuk melihat statistik batching inferensi dan cache hasil prediksi."""
+    stats = batcher.stats()
+    stats['cache'] = prediction_cache.stats()
+    stats['writer'] = upload_writer.stats()
+    stats['detection_buffer'] = detection_buffer.stats()
+    stats['jobs'] = detection_jobs.stats()
+    stats['admission'] = inference_admission.stats()
+    stats['model'] = model_provider.status()
+    backend = model_provider.get() if model_provider.is_ready() else None
+    if hasattr(backend, 'stats'):
+        stats['pool'] = backend.stats()
+    return jsonify(stats)
+
+
+@admin_bp.route('/cache/stats', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """API untuk melihat hit rate cache pengguna dan cache hasil prediksi."""
+    return jsonify({
+        "user_cache": user_cache.stats(),
+        "prediction_cache": prediction_cache.stats(),
+    })
+
+
+@admin_bp.route('/server/stats', methods=['GET'])
+@admin_required
+def get_server_stats():
+    """API memori per proses: master dan semua worker jika berjalan lewat serve.py (prefork)."""
+    status = read_status(current_app.config.get('SERVER_STATUS_FILE') or '')
+    if status is None:
+        return jsonify({"mode": "single", "pid": os.getpid(), "memory": process_memory()})
+    status.update({"mode": "prefork", "pid": os.getpid()})
+    return jsonify(status)
+
+
+@admin_bp.route('/retention/stats', methods=['GET'])
+@admin_required
+def get_retention_stats():
+    """API laporan run retensi terakhir (file tanpa referensi, byte yang dibebaskan, token kedaluwarsa)."""
+    report = read_report(current_app.config.get('RETENTION_REPORT_FILE'))
+    if report is None:
+        return jsonify({"error": "Retensi belum pernah dijalankan"}), 404
+    return jsonify(report)
+
+
+@admin_bp.route('/db/stats', methods=['GET'])
+@admin_required
+def get_db_stats():
+    """API untuk melihat utilisasi pool koneksi database."""
+    return jsonify(db_pool.stats())
+
+
 # ====================================================================
 # API ENDPOINTS UNTUK MANAJEMEN PENGGUNA (CRUD)
 # ====================================================================
@@ -181,6 +322,7 @@ def update_admin_user(user_id):
         success = execute_db("UPDATE users SET display_name=%s, phone_number=%s, email=%s, password_hash=%s WHERE id=%s", (name, phone, email, hashed_password, user_id))
     else: # Jika password kosong, jangan update password
         success = execute_db("UPDATE users SET display_name=%s, phone_number=%s, email=%s WHERE id=%s", (name, phone, email, user_id))
+    user_cache.invalidate(user_id)
     
     return jsonify({"message": "Pengguna berhasil diperbarui"}) if success else jsonify({"error": "Gagal memperbarui pengguna"}), (200 if success else 500)
 
@@ -194,81 +336,81 @@ def toggle_user_activation(user_id):
     
     new_status = not user['is_active']
     success = execute_db("UPDATE users SET is_active = %s WHERE id = %s", (new_status, user_id))
+    user_cache.invalidate(user_id)
     action = "diaktifkan" if new_status else "dinonaktifkan"
     return jsonify({"message": f"Pengguna berhasil {action}", "is_active": new_status}) if success else jsonify({"error": "Gagal mengubah status"}), (200 if success else 500)
 
 @admin_bp.route('/users/delete/<int:user_id>', methods=['DELETE'])
 @admin_required
 def delete_admin_user(user_id):
-    """API untuk menghapus pengguna."""
-    # Untuk keamanan, hapus dulu data terkait pengguna ini
-    execute_db("DELETE FROM fusarium_new_detections WHERE user_id = %s", (user_id,))
-    execute_db("DELETE FROM fusarium_new_raw_images WHERE user_id = %s", (user_id,))
-    execute_db("DELETE FROM password_reset_tokens WHERE user_id = %s", (user_id,))
-    
-    # Baru hapus pengguna
-    success = execute_db("DELETE FROM users WHERE id = %s", (user_id,))
-    
-    return jsonify({"message": "Pengguna dan semua data terkait berhasil dihapus"}) if success else jsonify({"error": "Gagal menghapus pengguna"}), (200 if success else 500)
+    """
+    API untuk menghapus pengguna beserta semua log, gambar, dan foto profilnya.
+    Pengguna langsung dinonaktifkan; penghapusan data dan file berjalan sebagai job purge.
+    """
+    if not query_db("SELECT id FROM users WHERE id = %s", (user_id,), one=True):
+        return jsonify({"error": "Pengguna tidak ditemukan"}), 404
+    # Cegah login dan unggahan baru selama penghapusan berjalan
+    execute_db("UPDATE users SET is_active = 0 WHERE id = %s", (user_id,))
+    user_cache.invalidate(user_id)
+    return _start_purge(new_purge_payload(PURGE_USER, user_id=user_id), "Penghapusan pengguna dan semua data terkait")
 
 @admin_bp.route('/logs/delete_all', methods=['DELETE'])
 @admin_required
 def delete_all_admin_logs():
     """
     Endpoint API untuk menghapus SEMUA log deteksi dan gambar mentah terkait.
+    Baris database dihapus dalam satu transaksi oleh job purge, file dihapus paralel di background.
     """
-    conn = None
-    cursor = None
+    return _start_purge(new_purge_payload(PURGE_ALL), "Penghapusan semua log")
+
+@admin_bp.route('/logs/purge', methods=['POST'])
+@admin_required
+def purge_admin_logs():
+    """
+    API untuk menghapus log deteksi yang cocok dengan filter (result, date_from, date_to,
+    min_confidence, user_id) beserta gambarnya. Filter diterima sebagai JSON atau form.
+    """
+    args = request.get_json(silent=True) or request.form.to_dict()
+    args = {key: str(value) for key, value in args.items() if key in PURGE_FILTER_KEYS and value not in (None, '')}
     try:
-        conn = get_db_connection()
-        if conn is None:
-            return jsonify({"error": "Koneksi database gagal"}), 500
-        cursor = conn.cursor(dictionary=True)
-
-        # Langkah 1: Kumpulkan semua path gambar yang akan dihapus SEBELUM menghapus record DB
-        cursor.execute("SELECT image_path FROM fusarium_new_raw_images WHERE image_path IS NOT NULL")
-        image_paths_to_delete = [row['image_path'] for row in cursor.fetchall()]
-
-        # Langkah 2: Lakukan penghapusan database dalam satu transaksi
-        conn.start_transaction()
-        cursor.execute("DELETE FROM fusarium_new_detections")
-        detections_deleted_count = cursor.rowcount
-        
-        cursor.execute("DELETE FROM fusarium_new_raw_images")
-        raw_images_deleted_count = cursor.rowcount
-        conn.commit()
-
-        # Langkah 3: Hapus file fisik dari server
-        deleted_files_count = 0
-        failed_to_delete_files = []
-        for rel_path in image_paths_to_delete:
-            full_path = os.path.join(current_app.root_path, '..', current_app.config['UPLOAD_FOLDER_BASE'], rel_path.replace('\\', '/'))
-            if os.path.exists(full_path):
-                try:
-                    os.remove(full_path)
-                    deleted_files_count += 1
-                except OSError as e:
-                    print(f"Gagal menghapus file {full_path}: {e}")
-                    failed_to_delete_files.append(os.path.basename(full_path))
-        
-        # Buat pesan respons yang informatif
-        message = (
-            f"Operasi selesai. {detections_deleted_count} log deteksi dan "
-            f"{raw_images_deleted_count} data gambar dihapus dari database. "
-            f"{deleted_files_count} file gambar berhasil dihapus dari server."
-        )
-        if failed_to_delete_files:
-            message += f" Gagal menghapus beberapa file: {', '.join(failed_to_delete_files)}."
-            
-        return jsonify({"message": message}), 200
+        if not parse_detection_filters(args, allow_user_filter=True):
+            return jsonify({"error": "Minimal satu filter harus diisi. Gunakan hapus semua untuk menghapus seluruh log."}), 400
+    except FilterError as e:
+        return jsonify({"error": str(e)}), 400
+    return _start_purge(new_purge_payload(PURGE_FILTER, filters=args), "Penghapusan log sesuai filter")
 
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        print(f"Error saat menghapus semua log: {e}")
-        return jsonify({"error": f"Terjadi kesalahan tak terduga: {e}"}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
\ No newline at end of file
+@admin_bp.route('/purge/<job_id>', methods=['GET'])
+@admin_required
+def get_purge_status(job_id):
+    """API progres job purge: fase, jumlah baris terhapus, dan jumlah file yang sudah dihapus."""
+    job = purge_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job tidak ditemukan"}), 404
+    return jsonify({
+        "job_id": job_id,
+        "status": job['status'],
+        "scope": job['payload']['scope'],
+        "progress": job['result'] or job['progress'] or {},
+        "error": job['error'] if job['status'] == JOB_FAILED else None,
+    })
+
+def _start_purge(payload, description):
+    """Mendaftarkan job purge (202 + URL progres), atau menjalankannya langsung jika antrean nonaktif."""
+    if not purge_jobs.enabled:
+        try:
+            result = run_purge_job(payload)
+        except Exception as e:
+            print(f"Error saat menjalankan purge: {e}")
+            return jsonify({"error": "Gagal menghapus data"}), 500
+        return jsonify({"message": f"{description} selesai.", "progress": result}), 200
+    try:
+        job_id = purge_jobs.enqueue(payload)
+    except QueueFullError:
+        response = jsonify({"error": "Terlalu banyak penghapusan yang sedang berjalan. Coba lagi nanti."})
+        response.headers['Retry-After'] = str(current_app.config.get('JOB_QUEUE_RETRY_AFTER', 5))
+        return response, 503
+    return jsonify({
+        "message": f"{description} sedang diproses di background.",
+        "job_id": job_id,
+        "status_url": url_for('admin.get_purge_status', job_id=job_id),
+    }), 202
\ No newline at end of file
@@ -20,6 +20,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 # --- Impor Modul Internal (Gunakan Impor Relatif) ---
 from ..utils.db import query_db, execute_db
 from ..utils.mailer import send_reset_email
+from ..utils.rate_limit import record_failed_login
 
 # --- Definisi Blueprint ---
 auth_bp = Blueprint('auth', __name__)
@@ -78,6 +79,7 @@ def login():
             flash(f"Login berhasil! Selamat datang, {user['display_name']}.", 'success')
             return redirect(url_for('main.index'))
         else:
+            record_failed_login()
             flash('Email/No. Telepon atau password salah.', 'danger')
             return render_template('auth/login.html')
 
@@ -138,11 +140,12 @@ def forgot_password():
             token = secrets.token_urlsafe(32)
             expires_at = datetime.utcnow() + timedelta(hours=1)
             execute_db("DELETE FROM password_reset_tokens WHERE user_id = %s", (user['id'],))
-            execute_db(
+            token_id = execute_db(
                 "INSERT INTO password_reset_tokens (user_id, token, expires_at) VALUES (%s, %s, %s)",
-                (user['id'], token, expires_at)
+                (user['id'], token, expires_at),
+                fetch_lastrowid=True
             )
-            if send_reset_email(user, token):
+            if token_id and send_reset_email(user, token_id):
                 flash('Link untuk mereset password telah dikirim ke email Anda.', 'success')
             else:
                 flash('Gagal mengirim email reset. Coba lagi nanti.', 'danger')
@@ -196,6 +199,7 @@ def login_administrator():
             session['admin_username'] = admin['username']
             return redirect(url_for('admin.dashboard'))
         else:
+            record_failed_login()
             flash('Username atau password admin salah.', 'danger')
             return redirect(url_for('auth.login_administrator'))
 
@@ -1,7 +1,13 @@
 # app/routes/main_routes.py
 
+import hmac
 import os
+import json
+import tempfile
+import time
 import uuid
+import zipfile
+import zlib
 from datetime import datetime
 from flask import (
     Blueprint, 
@@ -10,13 +16,25 @@ from flask import (
     jsonify, 
     session, 
     url_for, 
-    send_from_directory, 
-    current_app
+    current_app,
+    Response,
+    stream_with_context,
+    abort
 )
 
 # --- Impor Modul Internal (Gunakan Impor Relatif) ---
-from ..utils.db import query_db, execute_db
-from ..utils.prediction import predict_image
+from ..utils.detections import record_detection, save_detection, save_detections_bulk
+from ..utils.detection_queries import (
+    FilterError, HISTORY_SELECT, parse_detection_filters, parse_page_args, fetch_detection_page
+)
+from ..utils.prediction import predict_image_bytes, predict_images_bytes, model_provider
+from ..utils.background_writer import upload_writer
+from ..utils.job_queue import detection_jobs, QueueFullError, JOB_DONE, JOB_FAILED
+from ..utils.thumbnails import ensure_thumbnail, generate_thumbnails, thumbnail_url
+from ..utils.user_cache import user_cache
+from ..utils.http_cache import send_upload_file
+from ..utils.metrics import metrics
+from ..utils.rate_limit import inference_admission
 from .auth_routes import login_required # Mengimpor decorator
 
 # --- Definisi Blueprint ---
@@ -33,10 +51,7 @@ def index():
     default_avatar = url_for('static', filename='assets/default-avatar.png')
     
     if session.get('logged_in'):
-        user_id = session.get('user_id')
-        user = query_db("SELECT profile_picture_path FROM users WHERE id = %s", (user_id,), one=True)
-        if user and user.get('profile_picture_path'):
-            profile_pic_url = url_for('main.serve_upload', filepath_in_uploads_dir=user['profile_picture_path'].replace('\\', '/'))
+        profile_pic_url = user_cache.avatar_url(session.get('user_id'), current_app.config['THUMBNAIL_AVATAR_SIZE'])
 
     # PASTIKAN BARIS DI BAWAH INI MENGGUNAKAN 'public/index.html'
     return render_template('public/index.html', 
@@ -46,16 +61,203 @@ def index():
     )
 
 
+## Rute Health Check
+@main_bp.route('/health')
+def health():
+    """
+    Mengembalikan status kesiapan aplikasi dan model.
+    Status 503 selama model belum siap agar load balancer menunda trafik.
+    """
+    model_status = model_provider.status()
+    if model_status['ready']:
+        status = "ok"
+    elif model_status['state'] == 'failed':
+        status = "error"
+    else:
+        status = "starting"
+    payload = {
+        "status": status,
+        "startup_seconds": current_app.extensions.get('startup_seconds'),
+        "model": model_status,
+    }
+    return jsonify(payload), (200 if model_status['ready'] else 503)
+
+
+## Rute Metrik (format Prometheus)
+def _metrics_access_allowed():
+    """Admin yang login, bearer token METRICS_TOKEN, atau alamat di METRICS_ALLOWED_IPS."""
+    if session.get('admin_logged_in'):
+        return True
+    token = current_app.config.get('METRICS_TOKEN')
+    auth_header = request.headers.get('Authorization', '')
+    if token and auth_header.startswith('Bearer ') and hmac.compare_digest(auth_header[7:].encode(), token.encode()):
+        return True
+    return request.remote_addr in current_app.config.get('METRICS_ALLOWED_IPS', ())
+
+@main_bp.route('/metrics')
+def metrics_endpoint():
+    """Mengekspor histogram latensi dan counter dalam format teks Prometheus."""
+    if not current_app.config.get('METRICS_ENABLED', True):
+        abort(404)
+    if not _metrics_access_allowed():
+        abort(403)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 ## Rute untuk Menyajikan File dari Folder 'uploads'
 @main_bp.route('/uploads/<path:filepath_in_uploads_dir>')
 def serve_upload(filepath_in_uploads_dir):
     """
     Menyajikan file statis (gambar) dari direktori UPLOAD_FOLDER_BASE.
     Ini penting untuk menampilkan gambar profil dan gambar hasil deteksi.
+    Mendukung ETag/304, Range, cache immutable, dan X-Accel-Redirect/X-Sendfile.
     """
     # Membuat path absolut ke direktori 'uploads' yang berada di luar folder 'app'
     base_upload_dir = os.path.join(current_app.root_path, '..', current_app.config['UPLOAD_FOLDER_BASE'])
-    return send_from_directory(os.path.normpath(base_upload_dir), filepath_in_uploads_dir)
+    return send_upload_file(os.path.normpath(base_upload_dir), filepath_in_uploads_dir, current_app.config['UPLOAD_ACCEL_PREFIX'])
+
+## Rute untuk Menyajikan Thumbnail (dibuat lazy dan disimpan di cache disk)
+@main_bp.route('/uploads/thumb/<int:size>/<path:filepath_in_uploads_dir>')
+def serve_thumbnail(size, filepath_in_uploads_dir):
+    """
+    Menyajikan versi kecil (WebP) dari file di folder uploads.
+    Thumbnail dibuat saat pertama diminta lalu disimpan di THUMBNAIL_FOLDER.
+    Hanya ukuran yang ada di THUMBNAIL_SIZES yang diizinkan.
+    """
+    if size not in current_app.config['THUMBNAIL_SIZES']:
+        return jsonify({"error": "Unsupported thumbnail size"}), 404
+
+    thumb_relpath = ensure_thumbnail(filepath_in_uploads_dir, size)
+    if thumb_relpath is None:
+        # Sumber tidak bisa dibuatkan thumbnail; kembalikan file aslinya
+        return serve_upload(filepath_in_uploads_dir)
+
+    thumb_dir = os.path.join(current_app.root_path, '..', current_app.config['THUMBNAIL_FOLDER'])
+    thumb_accel_prefix = current_app.config['UPLOAD_ACCEL_PREFIX'].rstrip('/') + '/' + os.path.relpath(
+        current_app.config['THUMBNAIL_FOLDER'], current_app.config['UPLOAD_FOLDER_BASE']).replace(os.sep, '/')
+    return send_upload_file(os.path.normpath(thumb_dir), thumb_relpath, thumb_accel_prefix)
+
+def persist_upload(save_path, image_bytes, user_id, raw_image_path_for_db, result):
+    """
+    Menyimpan gambar mentah ke disk dan, jika pengguna login, mencatat
+    gambar serta hasil deteksinya ke database. Dipanggil oleh upload_writer.
+    """
+    try:
+        with metrics.span('stage_duration_seconds', stage='file_write'):
+            with open(save_path, 'wb') as f:
+                f.write(image_bytes)
+    except Exception as e:
+        print(f"Error saving file: {e}")
+        return
+
+    if current_app.config.get('THUMBNAIL_AT_INGEST'):
+        generate_thumbnails(raw_image_path_for_db)
+
+    # Jika pengguna login, simpan data ke database
+    if user_id:
+        save_detection(user_id, raw_image_path_for_db, result)
+
+def run_detection_job(payload):
+    """
+    Handler job deteksi asinkron (dijalankan oleh worker detection_jobs).
+    Kegagalan sementara (model belum siap / prediksi gagal) dilempar sebagai
+    exception agar job diulang; gambar yang tidak valid langsung diselesaikan.
+    Record ditulis sinkron: job baru selesai setelah hasilnya tersimpan di database.
+    """
+    with open(payload['save_path'], 'rb') as f:
+        image_bytes = f.read()
+    result = predict_image_bytes(image_bytes)
+    if result['label'] in ("Model not loaded.", "Prediction failed."):
+        raise RuntimeError(result['label'])
+
+    if result.get('color') != 'black':
+        if current_app.config.get('THUMBNAIL_AT_INGEST'):
+            generate_thumbnails(payload['raw_image_path_for_db'])
+        if payload.get('user_id'):
+            record_detection(payload['user_id'], payload['raw_image_path_for_db'], result)
+    return result
+
+
+def enqueue_detection_job(save_path, image_bytes, user_id, raw_image_path_for_db):
+    """Menyimpan gambar ke disk (agar job tahan restart) lalu mendaftarkannya ke antrean."""
+    try:
+        with open(save_path, 'wb') as f:
+            f.write(image_bytes)
+        job_id = detection_jobs.enqueue({
+            "save_path": save_path,
+            "user_id": user_id,
+            "raw_image_path_for_db": raw_image_path_for_db,
+        })
+    except QueueFullError:
+        if os.path.exists(save_path):
+            os.remove(save_path)
+        response = jsonify({"error": "Server sedang sibuk, coba lagi nanti."})
+        response.headers['Retry-After'] = str(current_app.config.get('JOB_QUEUE_RETRY_AFTER', 5))
+        return response, 503
+    except Exception as e:
+        print(f"Error enqueueing detection job: {e}")
+        return jsonify({"error": "Failed to save uploaded file"}), 500
+
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": url_for('main.job_status', job_id=job_id),
+        "events_url": url_for('main.job_events', job_id=job_id),
+        "logged_in": session.get('logged_in', False),
+        "user_name": session.get('user_name', "")
+    }), 202
+
+
+def _get_job_for_session(job_id):
+    """Job hanya dapat dilihat oleh pemiliknya (job anonim dapat dilihat lewat id-nya)."""
+    job = detection_jobs.get(job_id)
+    if job is None:
+        abort(404)
+    owner_id = job['payload'].get('user_id')
+    if owner_id and owner_id != session.get('user_id'):
+        abort(404)
+    return job
+
+
+def _job_response(job):
+    return {"job_id": job['id'], "status": job['status'], "attempts": job['attempts'],
+            "result": job['result'], "error": job['error'] if job['status'] == JOB_FAILED else None}
+
+
+## Rute untuk Status Job Deteksi (polling)
+@main_bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Mengembalikan status dan hasil job deteksi asinkron."""
+    return jsonify(_job_response(_get_job_for_session(job_id)))
+
+
+## Rute untuk Status Job Deteksi (Server-Sent Events)
+@main_bp.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Mengalirkan perubahan status job sebagai Server-Sent Events sampai job
+    selesai/gagal atau batas waktu JOB_EVENTS_TIMEOUT tercapai.
+    """
+    job = _get_job_for_session(job_id)
+    timeout = float(current_app.config.get('JOB_EVENTS_TIMEOUT', 60))
+
+    def generate(job):
+        deadline = time.time() + timeout
+        last_status = None
+        while True:
+            if job['status'] != last_status:
+                last_status = job['status']
+                yield f"event: status\ndata: {json.dumps(_job_response(job))}\n\n"
+            if job['status'] in (JOB_DONE, JOB_FAILED) or time.time() > deadline:
+                return
+            time.sleep(0.25)
+            job = detection_jobs.get(job_id) or job
+
+    response = Response(stream_with_context(generate(job)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 
 ## Rute untuk Proses Unggah dan Prediksi Gambar (API)
 @main_bp.route("/upload", methods=["POST"])
@@ -80,38 +282,34 @@ def upload_image():
     # Path relatif yang akan disimpan di database
     raw_image_path_for_db = os.path.join('raw_images', unique_filename).replace('\\', '/')
 
+    # Baca isi unggahan satu kali; buffer yang sama dipakai untuk prediksi dan penyimpanan
     try:
-        file.save(raw_image_save_path)
+        with metrics.span('stage_duration_seconds', stage='read'):
+            image_bytes = file.read()
     except Exception as e:
-        print(f"Error saving file: {e}")
-        return jsonify({"error": "Failed to save uploaded file"}), 500
-
-    # Panggil fungsi prediksi pada gambar yang telah disimpan
-    result = predict_image(raw_image_save_path)
+        print(f"Error reading uploaded file: {e}")
+        return jsonify({"error": "Failed to read uploaded file"}), 500
 
     # Cek status login dari session
     user_id = session.get('user_id')
 
-    # Jika pengguna login, simpan data ke database
-    if user_id:
-        try:
-            # 1. Simpan data gambar mentah
-            raw_image_id = execute_db(
-                "INSERT INTO fusarium_new_raw_images (user_id, image_path) VALUES (%s, %s)",
-                (user_id, raw_image_path_for_db),
-                fetch_lastrowid=True
-            )
-
-            # 2. Simpan hasil deteksi yang merujuk ke gambar mentah
-            if raw_image_id:
-                execute_db(
-                    "INSERT INTO fusarium_new_detections (user_id, raw_image_id, result, confidence, image_path) VALUES (%s, %s, %s, %s, %s)",
-                    (user_id, raw_image_id, result['label'], result['confidence'], raw_image_path_for_db)
-                )
-            else:
-                print("Failed to get raw_image_id for detection record.")
-        except Exception as e:
-            print(f"Database error during result saving: {e}")
+    # Mode asinkron: simpan gambar, daftarkan job, dan langsung kembalikan job id
+    if request.args.get('mode') == 'async' and detection_jobs.enabled:
+        return enqueue_detection_job(raw_image_save_path, image_bytes, user_id, raw_image_path_for_db)
+
+    # Batas inferensi bersamaan: tolak cepat (503) daripada menumpuk antrean di depan model
+    release = inference_admission.try_acquire()
+    if release is None:
+        return inference_admission.reject(request.endpoint)
+
+    # Prediksi langsung dari memori (hasil diambil dari cache jika gambar yang sama pernah diunggah)
+    try:
+        result = predict_image_bytes(image_bytes)
+    finally:
+        release()
+
+    # Simpan file (dan data DB jika pengguna login) di background writer
+    upload_writer.submit(persist_upload, raw_image_save_path, image_bytes, user_id, raw_image_path_for_db, result)
 
     return jsonify({
         "result": result, 
@@ -119,33 +317,225 @@ def upload_image():
         "user_name": session.get('user_name', "")
     })
 
+ALLOWED_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def persist_upload_batch(items, user_id):
+    """
+    Versi bulk dari persist_upload untuk /upload/batch.
+    items: daftar (save_path, image_bytes, raw_image_path_for_db, result).
+    File ditulis satu per satu, lalu record deteksi dimasukkan ke detection_buffer.
+    """
+    saved = []
+    for save_path, image_bytes, raw_image_path_for_db, result in items:
+        try:
+            with open(save_path, 'wb') as f:
+                f.write(image_bytes)
+            saved.append((raw_image_path_for_db, result))
+            if current_app.config.get('THUMBNAIL_AT_INGEST'):
+                generate_thumbnails(raw_image_path_for_db)
+        except Exception as e:
+            print(f"Error saving file: {e}")
+
+    if not user_id or not saved:
+        return
+
+    save_detections_bulk(user_id, saved)
+
+
+def _copy_limited(source, target, limit, chunk_size=64 * 1024):
+    """Menyalin paling banyak `limit` byte dari source ke target. Mengembalikan jumlah byte."""
+    copied = 0
+    while copied < limit:
+        data = source.read(min(chunk_size, limit - copied))
+        if not data:
+            break
+        target.write(data)
+        copied += len(data)
+    return copied
+
+
+class _BatchSpool:
+    """
+    Salinan field 'files' dan 'archive' di file sementara (disk). Harus dibuat sebelum
+    response streaming dimulai karena file unggahan ditutup saat request selesai.
+    Hanya max_files file pertama yang dibaca, tiap file dibaca paling banyak
+    max_file_bytes + 1 byte dan arsip paling banyak max_archive_bytes + 1 byte,
+    sehingga memori dan disk tidak bergantung pada ukuran unggahan.
+    """
+
+    def __init__(self, max_files, max_file_bytes, max_archive_bytes):
+        self.files = tempfile.TemporaryFile()
+        self.entries = []  # (nama_file, offset, panjang); panjang None jika melebihi batas
+        self.archive = None
+        self.archive_too_large = False
+
+        for upload in request.files.getlist('files'):
+            if len(self.entries) >= max_files:
+                break
+            if not upload.filename:
+                continue
+            offset = self.files.tell()
+            length = _copy_limited(upload.stream, self.files, max_file_bytes + 1)
+            if length > max_file_bytes:
+                self.files.seek(offset)
+                self.files.truncate()
+                length = None
+            self.entries.append((upload.filename, offset, length))
+
+        upload = request.files.get('archive')
+        if upload and upload.filename and len(self.entries) < max_files:
+            self.archive = tempfile.TemporaryFile()
+            if _copy_limited(upload.stream, self.archive, max_archive_bytes + 1) > max_archive_bytes:
+                self.archive_too_large = True
+            self.archive.seek(0)
+
+    def read(self, offset, length):
+        if length is None:
+            return b''
+        self.files.seek(offset)
+        return self.files.read(length)
+
+    def close(self):
+        self.files.close()
+        if self.archive is not None:
+            self.archive.close()
+
+
+def _iter_batch_uploads(spool, max_files, max_file_bytes):
+    """
+    Menghasilkan (nama_file, isi_bytes) dari file yang diunggah langsung
+    dan/atau entri gambar di dalam arsip zip, dibaca satu per satu dari spool.
+    File yang melebihi max_file_bytes menghasilkan b'' (dilaporkan sebagai file tidak valid).
+    """
+    count = 0
+    for filename, offset, length in spool.entries:
+        count += 1
+        yield filename, spool.read(offset, length)
+
+    if spool.archive is not None:
+        with zipfile.ZipFile(spool.archive) as zf:
+            for info in zf.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name.lower().endswith(ALLOWED_IMAGE_EXTENSIONS):
+                    continue
+                if count >= max_files:
+                    return
+                count += 1
+                # Entri yang terlalu besar (mis. zip bomb) tidak dibaca dan dilaporkan sebagai file tidak valid
+                yield name, (_read_zip_entry(zf, info) if info.file_size <= max_file_bytes else b'')
+
+
+def _read_zip_entry(zf, info):
+    """
+    Isi satu entri arsip, atau b'' (file tidak valid) jika entri tidak dapat dibaca:
+    terenkripsi, metode kompresi tidak didukung, atau data rusak (CRC/zlib).
+    Entri lain di arsip tetap diproses.
+    """
+    try:
+        return zf.read(info)
+    except (RuntimeError, NotImplementedError, zipfile.BadZipFile, zlib.error, EOFError) as e:
+        print(f"Error reading zip entry {info.filename!r}: {e}")
+        return b''
+
+
+## Rute untuk Unggah Banyak Gambar Sekaligus (API)
+@main_bp.route("/upload/batch", methods=["POST"])
+def upload_batch():
+    """
+    Endpoint API yang menerima banyak file ('files') atau arsip zip ('archive'),
+    memprediksinya per batch, dan mengalirkan hasil per gambar dalam format
+    NDJSON (satu objek JSON per baris) segera setelah tiap batch selesai.
+    """
+    # Satu slot inferensi untuk seluruh batch, dilepas saat response streaming selesai.
+    # Diambil sebelum request.files diakses: body multipart baru dibaca setelah request diterima.
+    release = inference_admission.try_acquire()
+    if release is None:
+        return inference_admission.reject(request.endpoint)
+
+    try:
+        if not request.files.getlist('files') and 'archive' not in request.files:
+            release()
+            return jsonify({"error": "No files in the request"}), 400
+
+        user_id = session.get('user_id')
+        chunk_size = max(1, int(current_app.config.get('INFERENCE_MAX_BATCH_SIZE', 16)))
+        max_files = int(current_app.config.get('BATCH_UPLOAD_MAX_FILES', 500))
+        max_file_bytes = int(current_app.config.get('BATCH_UPLOAD_MAX_FILE_BYTES', 20 * 1024 * 1024))
+        max_archive_bytes = int(current_app.config.get('BATCH_UPLOAD_MAX_ARCHIVE_BYTES', 200 * 1024 * 1024))
+        raw_folder = current_app.config['UPLOAD_FOLDER_RAW']
+        spool = _BatchSpool(max_files, max_file_bytes, max_archive_bytes)
+    except BaseException:
+        release()
+        raise
+
+    if spool.archive_too_large:
+        spool.close()
+        release()
+        return jsonify({"error": f"Archive exceeds {max_archive_bytes} bytes"}), 413
+
+    def process_chunk(chunk):
+        results = predict_images_bytes([data for _, data in chunk])
+        items = []
+        lines = []
+        for (filename, data), result in zip(chunk, results):
+            unique_filename = f"{uuid.uuid4().hex}{os.path.splitext(filename)[1]}"
+            if result.get('color') != 'black':
+                items.append((
+                    os.path.join(raw_folder, unique_filename),
+                    data,
+                    os.path.join('raw_images', unique_filename).replace('\\', '/'),
+                    result
+                ))
+            lines.append(json.dumps({"filename": filename, "result": result}) + "\n")
+        if items:
+            upload_writer.submit(persist_upload_batch, items, user_id)
+        return lines
+
+    def generate():
+        chunk = []
+        total = 0
+        try:
+            for filename, data in _iter_batch_uploads(spool, max_files, max_file_bytes):
+                chunk.append((filename, data))
+                if len(chunk) >= chunk_size:
+                    total += len(chunk)
+                    yield from process_chunk(chunk)
+                    chunk = []
+            if chunk:
+                total += len(chunk)
+                yield from process_chunk(chunk)
+        except zipfile.BadZipFile:
+            yield json.dumps({"error": "Invalid zip archive"}) + "\n"
+        yield json.dumps({"done": True, "total": total}) + "\n"
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.call_on_close(release)
+    response.call_on_close(spool.close)
+    return response
+
 ## Rute untuk Riwayat Deteksi (API)
 @main_bp.route('/history')
 @login_required # Hanya pengguna yang sudah login yang bisa mengakses rute ini
 def history_api():
     """
     Endpoint API untuk mengambil data riwayat deteksi dari pengguna yang sedang login.
-    Mengembalikan data riwayat dalam format JSON.
+    Dipaginasi dengan cursor keyset (detection_date, id); mendukung filter
+    result, date_from, date_to dan min_confidence.
+    Mengembalikan {"items": [...], "next_cursor": ..., "limit": ...}.
     """
-    user_id = session.get('user_id')
-    
-    query = """
-        SELECT
-            d.detection_date,
-            d.result,
-            d.confidence,
-            r.image_path AS raw_image_path
-        FROM
-            fusarium_new_detections d
-        JOIN
-            fusarium_new_raw_images r ON d.raw_image_id = r.id
-        WHERE
-            d.user_id = %s
-        ORDER BY
-            d.detection_date DESC
-    """
-    history_data = query_db(query, (user_id,))
-    
+    try:
+        filters = parse_detection_filters(request.args)
+        limit, cursor = parse_page_args(request.args, current_app.config['DETECTION_PAGE_SIZE'],
+                                        current_app.config['DETECTION_MAX_PAGE_SIZE'])
+    except FilterError as e:
+        return jsonify({"error": str(e)}), 400
+    filters['user_id'] = session.get('user_id')
+
+    history_data, next_cursor = fetch_detection_page(HISTORY_SELECT, filters, cursor, limit)
+    if history_data is None:
+        return jsonify({"error": "Gagal mengambil riwayat dari database"}), 500
+
     # Proses data agar siap dikirim sebagai JSON
     if history_data:
         for item in history_data:
@@ -156,7 +546,9 @@ def history_api():
             # Buat URL lengkap untuk gambar agar bisa diakses dari frontend
             if item.get('raw_image_path'):
                 item['raw_image_url'] = url_for('main.serve_upload', filepath_in_uploads_dir=item['raw_image_path'])
+                item['thumbnail_url'] = thumbnail_url(item['raw_image_path'])
             else:
                 item['raw_image_url'] = None
+                item['thumbnail_url'] = None
             
-    return jsonify(history_data or [])
\ No newline at end of file
+    return jsonify({"items": history_data, "next_cursor": next_cursor, "limit": limit})
\ No newline at end of file
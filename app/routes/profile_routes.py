@@ -15,7 +15,9 @@ from flask import (
 from werkzeug.security import generate_password_hash
 
 # --- Impor Modul Internal (Gunakan Impor Relatif) ---
-from ..utils.db import query_db, execute_db
+from ..utils.db import execute_db
+from ..utils.thumbnails import generate_thumbnails
+from ..utils.user_cache import user_cache
 from .auth_routes import login_required # Impor decorator
 
 # --- Definisi Blueprint ---
@@ -27,21 +29,17 @@ profile_bp = Blueprint('profile', __name__)
 def profile_page():
     """Menampilkan halaman edit profil untuk pengguna yang sedang login."""
     user_id = session['user_id']
-    user_data = query_db(
-        "SELECT display_name, email, phone_number, profile_picture_path, date_of_birth, address FROM users WHERE id = %s",
-        (user_id,), 
-        one=True
-    )
+    user_data = user_cache.get_user(user_id)
 
     if not user_data:
         flash("Pengguna tidak ditemukan.", "danger")
         return redirect(url_for('main.index'))
 
     # Menentukan URL gambar profil
-    if user_data.get('profile_picture_path'):
-        user_data['profile_picture_url'] = url_for('main.serve_upload', filepath_in_uploads_dir=user_data['profile_picture_path'].replace('\\', '/'))
-    else:
-        user_data['profile_picture_url'] = url_for('static', filename='assets/default-avatar.png')
+    user_data['profile_picture_url'] = (
+        user_cache.avatar_url(user_id, current_app.config['THUMBNAIL_PROFILE_SIZE'])
+        or url_for('static', filename='assets/default-avatar.png')
+    )
 
     return render_template('public/profile.html', user=user_data)
 
@@ -89,6 +87,8 @@ def update_profile():
             save_path = os.path.join(current_app.config['UPLOAD_FOLDER_PROFILE'], unique_filename)
             db_path = os.path.join('profile_pics', unique_filename).replace('\\', '/')
             file.save(save_path)
+            if current_app.config.get('THUMBNAIL_AT_INGEST'):
+                generate_thumbnails(db_path)
             query_parts.append("profile_picture_path = %s")
             params.append(db_path)
 
@@ -100,7 +100,9 @@ def update_profile():
     query_str = f"UPDATE users SET {', '.join(query_parts)}, updated_at = NOW() WHERE id = %s"
     params.append(user_id)
 
-    if execute_db(query_str, tuple(params)):
+    success = execute_db(query_str, tuple(params))
+    user_cache.invalidate(user_id)
+    if success:
         session['user_name'] = display_name
         flash("Profil berhasil diperbarui!", "success")
     else:
@@ -1,30 +1,82 @@
 document.addEventListener('DOMContentLoaded', function() {
     const tableBody = document.getElementById('logTableBody');
     const alertContainer = document.getElementById('alert-container');
+    const filterForm = document.getElementById('log-filters');
+    const loadMoreBtn = document.getElementById('loadMoreLogs');
 
+    // State paginasi: cursor halaman berikutnya dan jumlah baris yang sudah tampil
+    let nextCursor = null;
+    let rowCount = 0;
 
     /**
-     * Mengambil data log dari API backend dan mengisi tabel.
+     * Mengambil ringkasan (total per hasil dan hari ini) dari /admin/stats.
      */
-    async function fetchData() {
-        tableBody.innerHTML = '<tr><td colspan="7" class="no-data">Memuat data...</td></tr>';
+    async function fetchStats() {
+        const summary = document.getElementById('stats-summary');
+        try {
+            const response = await fetch('/admin/stats?days=1');
+            if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+            const stats = await response.json();
+            const today = stats.daily.length ? stats.daily[stats.daily.length - 1].counts : {};
+            const todayTotal = Object.values(today).reduce((a, b) => a + b, 0);
+
+            const cards = [['Total Deteksi', stats.total_detections], ['Hari Ini', todayTotal]];
+            Object.entries(stats.by_result).forEach(([result, count]) => cards.push([result, count]));
+            summary.innerHTML = cards.map(([label, value]) => `
+                <div class="stats-card">
+                    <span class="stats-value">${value.toLocaleString('id-ID')}</span>
+                    <span class="stats-label">${label}</span>
+                </div>
+            `).join('');
+        } catch (error) {
+            console.error('Gagal mengambil statistik:', error);
+            summary.innerHTML = '';
+        }
+    }
+
+    /**
+     * Membangun query string dari form filter (field kosong diabaikan).
+     */
+    function buildQuery(cursor) {
+        const params = new URLSearchParams();
+        new FormData(filterForm).forEach((value, key) => {
+            if (value !== '') params.append(key, value);
+        });
+        if (cursor) params.append('cursor', cursor);
+        return params.toString();
+    }
+
+    /**
+     * Mengambil satu halaman log dari API backend dan mengisi tabel.
+     * @param {boolean} append - true untuk menambahkan halaman berikutnya ke tabel.
+     */
+    async function fetchData(append = false) {
+        if (!append) {
+            nextCursor = null;
+            rowCount = 0;
+            tableBody.innerHTML = '<tr><td colspan="7" class="no-data">Memuat data...</td></tr>';
+        }
 
         try {
-            const response = await fetch('/admin/logs');
+            const response = await fetch(`/admin/logs?${buildQuery(append ? nextCursor : null)}`);
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
             
-            const logs = await response.json();
+            const page = await response.json();
+            const logs = page.items;
+            nextCursor = page.next_cursor;
+            loadMoreBtn.style.display = nextCursor ? 'block' : 'none';
 
-            tableBody.innerHTML = ''; // Kosongkan tabel sebelum diisi
-            if (logs.length === 0) {
+            if (!append) tableBody.innerHTML = ''; // Kosongkan tabel sebelum diisi
+            if (!append && logs.length === 0) {
                 tableBody.innerHTML = '<tr><td colspan="7" class="no-data">Tidak ada data log yang tersedia.</td></tr>';
                 return;
             }
 
-            logs.forEach((log, index) => {
+            logs.forEach((log) => {
                 const row = tableBody.insertRow();
+                rowCount += 1;
                 const confidence = (log.confidence * 100).toFixed(2);
                 const date = new Date(log.detection_date).toLocaleString('id-ID', {
                     year: 'numeric', month: 'short', day: 'numeric', hour: '2-digit', minute: '2-digit'
@@ -32,11 +84,11 @@ document.addEventListener('DOMContentLoaded', function() {
 
                 // Cek jika URL gambar ada. Jika tidak, tampilkan teks.
                 const imageCellHtml = log.raw_image_url 
-                    ? `<img src="${log.raw_image_url}" alt="Gambar Deteksi" style="width: 60px; height: 60px; object-fit: cover; border-radius: 4px;">`
+                    ? `<img src="${log.thumbnail_url || log.raw_image_url}" loading="lazy" alt="Gambar Deteksi" style="width: 60px; height: 60px; object-fit: cover; border-radius: 4px;">`
                     : '<span>Tidak Ada Gambar</span>';
 
                 row.innerHTML = `
-                    <td>${index + 1}</td>
+                    <td>${rowCount}</td>
                     <td>${date}</td>
                     <td>${log.user_name || 'N/A'}</td>
                     <td>${log.result}</td>
@@ -67,6 +119,7 @@ document.addEventListener('DOMContentLoaded', function() {
             if (!response.ok) throw new Error(result.error || 'Gagal menghapus log.');
 
             showAlert(result.message || 'Log berhasil dihapus!');
+            fetchStats();
             fetchData(); // Muat ulang data tabel setelah berhasil dihapus
         } catch (error) {
             console.error('Error saat menghapus log:', error);
@@ -83,6 +136,77 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
+    /**
+     * Memantau job penghapusan di background sampai selesai, lalu memuat ulang tabel.
+     * @param {object} result - Respons 202 dari endpoint purge (berisi status_url).
+     */
+    async function followPurge(result) {
+        if (!result.status_url) {
+            // Antrean purge nonaktif: penghapusan sudah selesai saat respons diterima
+            showAlert(result.message, 'success');
+            fetchStats();
+            fetchData();
+            return;
+        }
+        showAlert(result.message, 'info');
+        while (true) {
+            await new Promise((resolve) => setTimeout(resolve, 1500));
+            let job;
+            try {
+                const response = await fetch(result.status_url);
+                job = await response.json();
+                if (!response.ok) throw new Error(job.error || 'Gagal memuat progres penghapusan.');
+            } catch (error) {
+                console.error('Error saat memantau penghapusan:', error);
+                showAlert(error.message, 'danger');
+                return;
+            }
+            const progress = job.progress || {};
+            if (job.status === 'failed') {
+                showAlert(`Penghapusan gagal: ${job.error}`, 'danger');
+                return;
+            }
+            if (job.status === 'done') {
+                let message = `Penghapusan selesai. ${progress.detections_deleted || 0} log deteksi dan ` +
+                    `${progress.raw_images_deleted || 0} data gambar dihapus dari database. ` +
+                    `${progress.files_removed || 0} file gambar berhasil dihapus dari server.`;
+                if (progress.files_failed) message += ` ${progress.files_failed} file gagal dihapus.`;
+                showAlert(message, progress.files_failed ? 'info' : 'success');
+                fetchStats();
+                fetchData();
+                return;
+            }
+            if (progress.phase === 'reaping') {
+                const processed = (progress.files_removed || 0) + (progress.files_missing || 0) + (progress.files_failed || 0);
+                showAlert(`Menghapus file gambar: ${processed.toLocaleString('id-ID')} / ${(progress.files_total || 0).toLocaleString('id-ID')}`, 'info');
+            }
+        }
+    }
+
+    // Menghapus semua log yang cocok dengan filter aktif (di background)
+    filterForm.querySelector('.purge-btn').addEventListener('click', async () => {
+        const query = buildQuery(null);
+        if (!query) {
+            showAlert('Isi minimal satu filter untuk menghapus sesuai filter.', 'info');
+            return;
+        }
+        if (!confirm('Hapus SEMUA log dan gambar yang cocok dengan filter ini? Tindakan ini tidak dapat diurungkan.')) return;
+
+        try {
+            const response = await fetch('/admin/logs/purge', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(Object.fromEntries(new URLSearchParams(query))),
+            });
+            const result = await response.json();
+            if (!response.ok) throw new Error(result.error || 'Gagal menghapus log.');
+            followPurge(result);
+        } catch (error) {
+            console.error('Error saat menghapus log sesuai filter:', error);
+            showAlert(error.message, 'danger');
+        }
+    });
+
     // Membuat fungsi hapus semua menjadi global agar bisa dipanggil dari atribut onclick di HTML
     window.confirmDeleteAll = async function() {
         if (!confirm('PERINGATAN: Apakah Anda benar-benar yakin ingin menghapus SEMUA data log? Tindakan ini akan menghapus semua catatan dan gambar terkait secara permanen.')) return;
@@ -98,16 +222,29 @@ document.addEventListener('DOMContentLoaded', function() {
             const response = await fetch('/admin/logs/delete_all', { method: 'DELETE' });
             const result = await response.json();
             if (!response.ok) throw new Error(result.error || 'Gagal menghapus semua log.');
-            
-            showAlert(result.message, 'success');
-            fetchData(); // Muat ulang data tabel setelah berhasil
-            
+
+            followPurge(result); // Tabel dimuat ulang setelah job penghapusan selesai
         } catch (error) {
             console.error('Error saat menghapus semua log:', error);
             showAlert(error.message, 'danger');
         }
     };
 
+    filterForm.addEventListener('submit', function(event) {
+        event.preventDefault();
+        fetchData();
+    });
+
+    loadMoreBtn.addEventListener('click', () => fetchData(true));
+
+    // Ekspor memakai filter yang sedang aktif; file diunduh langsung oleh browser (gzip)
+    filterForm.querySelectorAll('.export-btn').forEach((button) => {
+        button.addEventListener('click', () => {
+            window.location.href = `/admin/logs/export?${buildQuery(null)}&format=${button.dataset.format}&compress=gzip`;
+        });
+    });
+
     // Panggil fungsi fetchData() saat halaman pertama kali dimuat
+    fetchStats();
     fetchData();
 });
\ No newline at end of file
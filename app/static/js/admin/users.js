@@ -127,8 +127,10 @@ document.addEventListener('DOMContentLoaded', function() {
             const response = await fetch(`/admin/users/delete/${userToDeleteId}`, { method: 'DELETE' });
             const result = await response.json();
             if (!response.ok) throw new Error(result.error || 'Gagal menghapus pengguna');
+            // Pengguna langsung dinonaktifkan; data dan file dihapus oleh job di background
             showAlert(result.message, 'success');
             fetchUsers();
+            if (response.status === 202) setTimeout(fetchUsers, 5000);
         } catch (error) {
             showAlert(error.message, 'error');
         } finally {
@@ -88,29 +88,43 @@ document.addEventListener("DOMContentLoaded", function () {
     }
 
     // --- Fungsi Logika & API ---
-    async function fetchAndDisplayHistory() {
+    // Riwayat dimuat per halaman; historyCursor menunjuk ke halaman berikutnya
+    let historyCursor = null;
+    let historyCount = 0;
+
+    async function fetchAndDisplayHistory(append = false) {
         if (!isUserLoggedIn) return;
         const historyTableBody = historySection.querySelector("tbody");
-        historyTableBody.innerHTML = '<tr><td colspan="4">Memuat riwayat...</td></tr>';
+        const loadMoreBtn = document.getElementById("history-load-more");
+        if (!append) {
+            historyCursor = null;
+            historyCount = 0;
+            historyTableBody.innerHTML = '<tr><td colspan="4">Memuat riwayat...</td></tr>';
+        }
         
         try {
-            const response = await fetch('/history');
+            const url = historyCursor ? `/history?cursor=${encodeURIComponent(historyCursor)}` : '/history';
+            const response = await fetch(url);
             if (!response.ok) throw new Error('Gagal memuat riwayat');
-            const historyData = await response.json();
+            const page = await response.json();
+            const historyData = page.items;
+            historyCursor = page.next_cursor;
+            if (loadMoreBtn) loadMoreBtn.style.display = historyCursor ? 'block' : 'none';
 
-            if (historyData.length === 0) {
+            if (!append && historyData.length === 0) {
                 historyTableBody.innerHTML = '<tr><td colspan="4">Tidak ada riwayat deteksi.</td></tr>';
                 return;
             }
             
-            historyTableBody.innerHTML = '';
-            historyData.forEach((item, index) => {
+            if (!append) historyTableBody.innerHTML = '';
+            historyData.forEach((item) => {
                 const row = historyTableBody.insertRow();
+                historyCount += 1;
                 row.innerHTML = `
-                    <td>${index + 1}</td>
+                    <td>${historyCount}</td>
                     <td>${new Date(item.detection_date).toLocaleDateString('id-ID')}</td>
                     <td>${item.result}</td>
-                    <td><img src="${item.raw_image_url}" alt="Riwayat Gambar" style="width: 50px; height: 50px; object-fit: cover;"></td>
+                    <td><img src="${item.thumbnail_url || item.raw_image_url}" loading="lazy" alt="Riwayat Gambar" style="width: 50px; height: 50px; object-fit: cover;"></td>
                 `;
             });
         } catch (error) {
@@ -119,18 +133,60 @@ document.addEventListener("DOMContentLoaded", function () {
         }
     }
     
+    function waitForJobResult(job) {
+        return new Promise((resolve, reject) => {
+            const finish = (status) => {
+                if (status.status === 'done') resolve(status.result);
+                else reject(new Error(status.error || 'Deteksi gagal diproses.'));
+            };
+
+            // Polling sebagai cadangan jika EventSource tidak tersedia atau terputus
+            const poll = async () => {
+                try {
+                    const response = await fetch(job.status_url);
+                    if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+                    const status = await response.json();
+                    if (status.status === 'done' || status.status === 'failed') finish(status);
+                    else setTimeout(poll, 1000);
+                } catch (error) {
+                    reject(error);
+                }
+            };
+
+            if (!window.EventSource) {
+                poll();
+                return;
+            }
+            const source = new EventSource(job.events_url);
+            source.addEventListener('status', (event) => {
+                const status = JSON.parse(event.data);
+                if (status.status === 'done' || status.status === 'failed') {
+                    source.close();
+                    finish(status);
+                }
+            });
+            source.onerror = () => {
+                source.close();
+                poll();
+            };
+        });
+    }
+
     async function sendImageToServer(file) {
         showScreen("loading-screen");
         const formData = new FormData();
         formData.append("file", file);
 
         try {
-            const response = await fetch("/upload", { method: "POST", body: formData });
+            const response = await fetch("/upload?mode=async", { method: "POST", body: formData });
             const data = await response.json();
             
             if (data.error) throw new Error(data.error);
+
+            // Mode asinkron: server mengembalikan job id, hasil ditunggu lewat SSE/polling
+            const result = data.job_id ? await waitForJobResult(data) : data.result;
             
-            displayResults(data.result, URL.createObjectURL(file));
+            displayResults(result, URL.createObjectURL(file));
             if (isUserLoggedIn) fetchAndDisplayHistory(); // Refresh riwayat setelah upload
             
         } catch (error) {
@@ -140,24 +196,85 @@ document.addEventListener("DOMContentLoaded", function () {
         }
     }
 
+    async function sendImagesBatchToServer(files) {
+        showScreen("loading-screen");
+        const loadingProgress = document.getElementById("loading-progress");
+        const defaultProgressText = loadingProgress.textContent;
+        const formData = new FormData();
+        Array.from(files).forEach(file => formData.append("files", file));
+
+        let processed = 0;
+        let healthy = 0;
+        let infected = 0;
+        let failed = 0;
+        const handleLine = (line) => {
+            if (!line.trim()) return;
+            const item = JSON.parse(line);
+            if (item.error) throw new Error(item.error);
+            if (!item.result) return;
+            processed++;
+            if (item.result.color === 'black') failed++;
+            else if (item.result.label.toLowerCase().includes('healthy')) healthy++;
+            else infected++;
+            loadingProgress.textContent = `${processed} dari ${files.length} gambar selesai dianalisis...`;
+        };
+
+        try {
+            const response = await fetch("/upload/batch", { method: "POST", body: formData });
+            if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+
+            // Hasil dikirim sebagai NDJSON; proses setiap baris begitu tiba
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split("\n");
+                buffer = lines.pop();
+                lines.forEach(handleLine);
+            }
+            handleLine(buffer);
+
+            alert(`Analisis selesai: ${healthy} sehat, ${infected} terinfeksi, ${failed} gagal diproses.`);
+            if (isUserLoggedIn) fetchAndDisplayHistory(); // Refresh riwayat setelah upload
+        } catch (error) {
+            console.error("Error:", error);
+            alert("Terjadi kesalahan: " + error.message);
+        } finally {
+            loadingProgress.textContent = defaultProgressText;
+            showScreen("home-screen");
+        }
+    }
+
+    function handleSelectedFiles(files) {
+        if (!files || files.length === 0) return;
+        if (files.length === 1) sendImageToServer(files[0]);
+        else sendImagesBatchToServer(files);
+    }
+
     // --- Event Listeners ---
     uploadBtn.addEventListener("click", () => {
         const input = document.createElement("input");
         input.type = "file";
         input.accept = "image/png, image/jpeg, image/jpg";
-        input.onchange = (event) => sendImageToServer(event.target.files[0]);
+        input.multiple = true;
+        input.onchange = (event) => handleSelectedFiles(event.target.files);
         input.click();
     });
 
     dropArea.addEventListener("dragover", (e) => e.preventDefault());
     dropArea.addEventListener("drop", (e) => {
         e.preventDefault();
-        if (e.dataTransfer.files.length > 0) {
-            sendImageToServer(e.dataTransfer.files[0]);
-        }
+        handleSelectedFiles(e.dataTransfer.files);
     });
 
     backBtn.addEventListener("click", () => showScreen("home-screen"));
+    const historyLoadMoreBtn = document.getElementById("history-load-more");
+    if (historyLoadMoreBtn) {
+        historyLoadMoreBtn.addEventListener('click', () => fetchAndDisplayHistory(true));
+    }
     showHistoryBtn.addEventListener('click', (e) => {
         e.preventDefault();
         showScreen('home-screen'); // Riwayat ditampilkan di home screen
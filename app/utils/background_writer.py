@@ -0,0 +1,111 @@
+# app/utils/background_writer.py
+import atexit
+import queue
+import threading
+
+
+class BackgroundWriter:
+    """
+    Menjalankan pekerjaan I/O (simpan file, insert DB) di luar thread request.
+    Antrean dibatasi; jika penuh, pekerjaan dijalankan langsung di thread
+    pemanggil sebagai backpressure. Antrean dikosongkan saat proses berhenti.
+    """
+
+    def __init__(self, max_queue_size=256, num_threads=1):
+        self.max_queue_size = max_queue_size
+        self.num_threads = num_threads
+        self.app = None
+        self.enabled = True
+        self._queue = None
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.completed = 0
+        self.failed = 0
+        self.ran_inline = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('UPLOAD_ASYNC_PERSIST', self.enabled)
+        self.max_queue_size = int(app.config.get('UPLOAD_WRITER_QUEUE_SIZE', self.max_queue_size))
+        self.num_threads = max(1, int(app.config.get('UPLOAD_WRITER_THREADS', self.num_threads)))
+        atexit.register(self.shutdown)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._queue is None:
+                self._queue = queue.Queue(maxsize=self.max_queue_size)
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.num_threads:
+                t = threading.Thread(target=self._run, name='upload-writer', daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, fn, *args, **kwargs):
+        """Menjadwalkan fn(*args, **kwargs) untuk dijalankan di dalam app context."""
+        if not self.enabled or self._stopped or self.app is None:
+            self._execute(fn, args, kwargs)
+            self.ran_inline += 1
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((fn, args, kwargs))
+        except queue.Full:
+            # Backpressure: antrean penuh, kerjakan langsung agar data tidak hilang
+            self._execute(fn, args, kwargs)
+            self.ran_inline += 1
+
+    def _execute(self, fn, args, kwargs):
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    fn(*args, **kwargs)
+            else:
+                fn(*args, **kwargs)
+            self.completed += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"Background writer error in {getattr(fn, '__name__', fn)}: {e}")
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                fn, args, kwargs = job
+                self._execute(fn, args, kwargs)
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Menunggu sampai semua pekerjaan di antrean selesai."""
+        if self._queue is not None:
+            self._queue.join()
+
+    def shutdown(self):
+        """Mengosongkan antrean lalu menghentikan thread writer."""
+        if self._stopped:
+            return
+        self._stopped = True
+        if self._queue is None:
+            return
+        self.flush()
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join(timeout=5)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "completed": self.completed,
+            "failed": self.failed,
+            "ran_inline": self.ran_inline,
+        }
+
+
+# Writer global untuk persistensi unggahan
+upload_writer = BackgroundWriter()
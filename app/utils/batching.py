@@ -0,0 +1,136 @@
+# app/utils/batching.py
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class _PendingItem:
+    """Satu permintaan prediksi yang menunggu untuk digabung ke dalam batch."""
+    __slots__ = ('tensor', 'enqueued_at', 'event', 'result', 'error')
+
+    def __init__(self, tensor):
+        self.tensor = tensor
+        self.enqueued_at = time.perf_counter()
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BatchScheduler:
+    """
+    Scheduler micro-batching untuk inferensi.
+    Permintaan yang datang bersamaan dikumpulkan menjadi satu tensor (dibatasi
+    oleh max_batch_size dan max_wait_ms), diprediksi sekali, lalu hasil tiap
+    baris dikembalikan ke pemanggilnya masing-masing.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5, enabled=True):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.enabled = enabled
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def init_app(self, app):
+        """Membaca konfigurasi batching dari app.config."""
+        self.enabled = app.config.get('INFERENCE_BATCHING_ENABLED', self.enabled)
+        self.max_batch_size = max(1, int(app.config.get('INFERENCE_MAX_BATCH_SIZE', self.max_batch_size)))
+        self.max_wait_ms = max(0.0, float(app.config.get('INFERENCE_MAX_WAIT_MS', self.max_wait_ms)))
+
+    def submit(self, tensor):
+        """
+        Mengirim satu tensor (tanpa dimensi batch) dan menunggu hasilnya.
+        Mengembalikan baris prediksi untuk tensor tersebut.
+        """
+        item = _PendingItem(tensor)
+        with self._cond:
+            self._ensure_worker()
+            self._queue.append(item)
+            self._cond.notify()
+        item.event.wait()
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+            self._thread.start()
+
+    def _collect_batch(self):
+        """Mengambil item dari antrean sampai batch penuh atau batas waktu tunggu habis."""
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            batch = [self._queue.popleft()]
+            deadline = batch[0].enqueued_at + self.max_wait_ms / 1000.0
+            while len(batch) < self.max_batch_size:
+                if self._queue:
+                    batch.append(self._queue.popleft())
+                    continue
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started_at = time.perf_counter()
+            try:
+                predictions = self.predict_fn(np.stack([item.tensor for item in batch]))
+                for item, row in zip(batch, predictions):
+                    item.result = row
+            except Exception as e:
+                print(f"Batch inference error: {e}")
+                for item in batch:
+                    item.error = e
+            finally:
+                self._record_batch(batch, started_at)
+                for item in batch:
+                    item.event.set()
+
+    # --- Statistik ---
+    def _reset_stats(self):
+        self._batches = 0
+        self._items = 0
+        self._batch_size_counts = {}
+        self._wait_total_ms = 0.0
+        self._wait_max_ms = 0.0
+
+    def _record_batch(self, batch, started_at):
+        waits = [(started_at - item.enqueued_at) * 1000.0 for item in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._batch_size_counts[len(batch)] = self._batch_size_counts.get(len(batch), 0) + 1
+            self._wait_total_ms += sum(waits)
+            self._wait_max_ms = max(self._wait_max_ms, max(waits))
+
+    def stats(self):
+        """Mengembalikan ringkasan ukuran batch dan waktu tunggu antrean."""
+        with self._stats_lock:
+            return {
+                "enabled": self.enabled,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "queue_depth": len(self._queue),
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": (self._items / self._batches) if self._batches else 0,
+                "batch_size_counts": dict(sorted(self._batch_size_counts.items())),
+                "avg_queue_wait_ms": (self._wait_total_ms / self._items) if self._items else 0,
+                "max_queue_wait_ms": self._wait_max_ms,
+            }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._reset_stats()
@@ -1,32 +1,94 @@
 # app/utils/db.py
+import time
+from functools import wraps
+
 import mysql.connector
-from flask import current_app
+from flask import g, has_app_context
+
+from .db_pool import db_pool, PoolTimeoutError
+from .metrics import metrics, normalize_statement
+
+
+def timed_query(fn):
+    """Mencatat latensi (termasuk waktu koneksi) setiap pemanggilan per statement SQL."""
+    @wraps(fn)
+    def wrapper(query, *args, **kwargs):
+        started = time.perf_counter()
+        ok = False
+        try:
+            rv = fn(query, *args, **kwargs)
+            ok = rv is not False
+            return rv
+        finally:
+            statement = normalize_statement(query)
+            metrics.observe('db_query_duration_seconds', time.perf_counter() - started, statement=statement)
+            if not ok:
+                metrics.inc('db_query_errors_total', statement=statement)
+    return wrapper
+
 
 def get_db_connection():
+    """
+    Mengambil koneksi dari pool. Pemanggil wajib memanggil conn.close(),
+    yang mengembalikan koneksi ke pool (bukan menutupnya).
+    """
     try:
-        conn = mysql.connector.connect(
-            host=current_app.config['DB_HOST'],
-            user=current_app.config['DB_USER'],
-            password=current_app.config['DB_PASSWORD'],
-            database=current_app.config['DB_NAME']
-        )
-        return conn
-    except mysql.connector.Error as err:
+        return db_pool.acquire()
+    except (mysql.connector.Error, PoolTimeoutError) as err:
         print(f"Database connection error: {err}")
+        metrics.inc('db_connection_errors_total')
         return None
 
+
+def _request_connection():
+    """
+    Satu koneksi per request/app context (disimpan di flask.g) yang dipakai
+    bersama oleh semua query_db/execute_db dalam request tersebut.
+    Dikembalikan ke pool oleh release_request_connection saat teardown.
+    """
+    if not has_app_context():
+        return get_db_connection()
+    conn = g.get('_db_conn')
+    if conn is None:
+        conn = get_db_connection()
+        if conn is not None:
+            g._db_conn = conn
+    return conn
+
+
+def _finish_connection(conn):
+    # Di luar app context koneksi tidak disimpan di g, jadi langsung dikembalikan
+    if not has_app_context() or g.get('_db_conn') is not conn:
+        conn.close()
+
+
+def release_request_connection(exc=None):
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        conn.close()
+
+
+def init_app(app):
+    """Mengonfigurasi pool koneksi dan mengembalikan koneksi request ke pool saat teardown."""
+    db_pool.init_app(app)
+    app.teardown_appcontext(release_request_connection)
+
+@timed_query
 def query_db(query, args=(), one=False):
-    conn = get_db_connection()
+    conn = _request_connection()
     if conn is None: return None
     cursor = conn.cursor(dictionary=True)
-    cursor.execute(query, args)
-    rv = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    try:
+        cursor.execute(query, args)
+        rv = cursor.fetchall()
+    finally:
+        cursor.close()
+        _finish_connection(conn)
     return (rv[0] if rv else None) if one else rv
 
+@timed_query
 def execute_db(query, args=(), fetch_lastrowid=False):
-    conn = get_db_connection()
+    conn = _request_connection()
     if conn is None: return None
     cursor = conn.cursor()
     try:
@@ -41,4 +103,22 @@ def execute_db(query, args=(), fetch_lastrowid=False):
         return False
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        _finish_connection(conn)
+
+@timed_query
+def execute_many_db(query, seq_of_args):
+    """Menjalankan satu query untuk banyak baris (bulk insert/update) dalam satu transaksi."""
+    conn = _request_connection()
+    if conn is None: return None
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(query, seq_of_args)
+        conn.commit()
+        return cursor.rowcount
+    except mysql.connector.Error as err:
+        print(f"Database execution error: {err}")
+        conn.rollback()
+        return False
+    finally:
+        cursor.close()
+        _finish_connection(conn)
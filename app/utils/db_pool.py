@@ -0,0 +1,238 @@
+# app/utils/db_pool.py
+import os
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+
+
+class PoolTimeoutError(Exception):
+    """Tidak ada koneksi yang bebas dalam DB_POOL_TIMEOUT detik."""
+
+
+class PooledConnection:
+    """
+    Pembungkus koneksi MySQL dari pool. Semua atribut diteruskan ke koneksi asli,
+    kecuali close() yang mengembalikan koneksi ke pool alih-alih menutupnya.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.release(self)
+
+    def discard(self):
+        """Menutup koneksi tanpa mengembalikannya ke pool (mis. state sesi tidak bisa dipulihkan)."""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.release(self, reusable=False)
+
+
+class ConnectionPool:
+    """
+    Pool koneksi MySQL dengan ukuran tetap + overflow.
+    - DB_POOL_SIZE koneksi disimpan saat idle; hingga DB_POOL_MAX_OVERFLOW koneksi
+      tambahan dibuat saat ramai dan ditutup begitu dikembalikan.
+    - Jika semua koneksi terpakai, checkout menunggu hingga DB_POOL_TIMEOUT detik.
+    - Koneksi diperiksa (ping) saat checkout dan didaur ulang setelah DB_POOL_RECYCLE detik.
+    - Setelah fork (prefork server), koneksi milik proses induk tidak dipakai ulang.
+    """
+
+    def __init__(self, size=5, max_overflow=10, timeout=10.0, recycle=3600, pre_ping=True, connect_timeout=10):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.connect_timeout = connect_timeout
+        self.enabled = True
+        self.connect_args = {}
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._open = 0
+        self._pid = os.getpid()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.checkouts = 0
+        self.created = 0
+        self.discarded = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('DB_POOL_ENABLED', self.enabled)
+        self.size = int(app.config.get('DB_POOL_SIZE', self.size))
+        self.max_overflow = int(app.config.get('DB_POOL_MAX_OVERFLOW', self.max_overflow))
+        self.timeout = float(app.config.get('DB_POOL_TIMEOUT', self.timeout))
+        self.recycle = app.config.get('DB_POOL_RECYCLE', self.recycle)
+        self.pre_ping = app.config.get('DB_POOL_PRE_PING', self.pre_ping)
+        self.connect_timeout = app.config.get('DB_CONNECT_TIMEOUT', self.connect_timeout)
+        connect_args = {
+            'host': app.config['DB_HOST'],
+            'user': app.config['DB_USER'],
+            'password': app.config['DB_PASSWORD'],
+            'database': app.config['DB_NAME'],
+        }
+        if connect_args != self.connect_args:
+            # Target database berubah: koneksi lama tidak boleh dipakai lagi
+            self.dispose()
+            self.connect_args = connect_args
+
+    def _connect(self):
+        kwargs = dict(self.connect_args)
+        if self.connect_timeout:
+            kwargs['connection_timeout'] = int(self.connect_timeout)
+        return mysql.connector.connect(**kwargs)
+
+    def _check_fork(self):
+        """Dipanggil dengan lock dipegang. Proses anak mulai dengan pool kosong."""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle.clear()
+            self._open = 0
+            self._reset_counters()
+
+    def _is_usable(self, pooled):
+        if self.recycle and time.monotonic() - pooled.created_at > self.recycle:
+            return False
+        if not self.pre_ping:
+            return True
+        try:
+            pooled._conn.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def _close_quietly(self, pooled):
+        try:
+            pooled._conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Mengambil koneksi dari pool. mysql.connector.Error jika gagal konek, PoolTimeoutError jika penuh."""
+        if not self.enabled:
+            return PooledConnection(self, self._connect())
+
+        deadline = None
+        while True:
+            with self._cond:
+                self._check_fork()
+                pooled = None
+                if self._idle:
+                    pooled = self._idle.pop()
+                elif self._open < self.size + self.max_overflow:
+                    self._open += 1
+                else:
+                    if deadline is None:
+                        deadline = time.monotonic() + self.timeout
+                        self.waits += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeoutError(f"No database connection available within {self.timeout}s")
+                    started = time.monotonic()
+                    self._cond.wait(remaining)
+                    self.wait_seconds += time.monotonic() - started
+                    continue
+
+            if pooled is not None:
+                # Health check di luar lock agar checkout lain tidak ikut menunggu
+                if self._is_usable(pooled):
+                    pooled._pool = self
+                    pooled.last_used = time.monotonic()
+                    with self._cond:
+                        self.checkouts += 1
+                    return pooled
+                self._close_quietly(pooled)
+                with self._cond:
+                    self._open -= 1
+                    self.discarded += 1
+                continue
+
+            try:
+                pooled = PooledConnection(self, self._connect())
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self.created += 1
+                self.checkouts += 1
+            return pooled
+
+    def release(self, pooled, reusable=True):
+        """
+        Mengembalikan koneksi; transaksi yang masih terbuka di-rollback lebih dulu.
+        reusable=False menutup koneksi alih-alih menyimpannya.
+        """
+        if not self.enabled:
+            self._close_quietly(pooled)
+            return
+
+        if reusable:
+            try:
+                # Mengakhiri transaksi/snapshot baca yang mungkin masih terbuka
+                pooled._conn.rollback()
+            except Exception:
+                reusable = False
+
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            if reusable and len(self._idle) < self.size:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+                pooled = None
+            else:
+                self._open -= 1
+            self._cond.notify()
+        if pooled is not None:
+            self._close_quietly(pooled)
+
+    def dispose(self):
+        """Menutup semua koneksi idle (mis. saat konfigurasi berubah)."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for pooled in idle:
+            self._close_quietly(pooled)
+
+    def stats(self):
+        with self._cond:
+            self._check_fork()
+            idle = len(self._idle)
+            return {
+                "enabled": self.enabled,
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "idle": idle,
+                "in_use": self._open - idle,
+                "utilization": (self._open - idle) / float(self.size + self.max_overflow or 1),
+                "checkouts": self.checkouts,
+                "created": self.created,
+                "discarded": self.discarded,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": (self.wait_seconds / self.waits * 1000.0) if self.waits else 0.0,
+            }
+
+
+# Pool global untuk koneksi database aplikasi
+db_pool = ConnectionPool()
@@ -0,0 +1,387 @@
+# app/utils/detection_buffer.py
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+
+class DetectionWriteBuffer:
+    """
+    Buffer write-behind untuk record deteksi.
+    Record dikumpulkan lalu ditulis oleh satu thread flusher dalam batch berisi
+    hingga DETECTION_BUFFER_BATCH_SIZE baris atau setiap DETECTION_BUFFER_FLUSH_MS,
+    masing-masing batch dalam satu transaksi (lihat detections.write_detections).
+    Memori dibatasi DETECTION_BUFFER_MAX_PENDING; jika DB tertinggal, pemanggil
+    menunggu (backpressure) lalu menulis langsung. Buffer di-flush saat proses berhenti.
+
+    Batch yang tetap gagal setelah semua percobaan ditulis ulang baris per baris agar
+    satu baris bermasalah tidak menggagalkan baris lain. Baris yang masih gagal
+    (atau seluruh batch saat database tidak dapat dihubungi) disimpan ke file SQLite
+    spill dan diputar ulang oleh thread flusher setiap DETECTION_BUFFER_REPLAY_INTERVAL detik.
+    """
+
+    def __init__(self, batch_size=100, flush_interval_ms=200, max_pending=5000,
+                 put_timeout=2.0, max_retries=3, retry_backoff=0.5, spill_path=None,
+                 replay_interval=60.0):
+        self.batch_size = batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.spill_path = spill_path
+        self.replay_interval = replay_interval
+        self.write_fn = None
+        self.app = None
+        self.enabled = True
+
+        self._pending = deque()  # (waktu_masuk, row)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self._flush_requested = False
+        self._inflight = 0
+        self._spill_lock = threading.Lock()
+        self._spill_pending = 0
+        self._last_replay = 0.0
+
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.retries = 0
+        self.backpressure_waits = 0
+        self.ran_inline = 0
+
+    def init_app(self, app, write_fn):
+        """write_fn(rows) menulis rows dalam satu transaksi dan melempar exception jika gagal."""
+        self.app = app
+        self.write_fn = write_fn
+        self.enabled = app.config.get('DETECTION_BUFFER_ENABLED', self.enabled)
+        self.batch_size = max(1, int(app.config.get('DETECTION_BUFFER_BATCH_SIZE', self.batch_size)))
+        self.flush_interval_ms = float(app.config.get('DETECTION_BUFFER_FLUSH_MS', self.flush_interval_ms))
+        self.max_pending = max(self.batch_size, int(app.config.get('DETECTION_BUFFER_MAX_PENDING', self.max_pending)))
+        self.put_timeout = float(app.config.get('DETECTION_BUFFER_PUT_TIMEOUT', self.put_timeout))
+        self.max_retries = int(app.config.get('DETECTION_BUFFER_MAX_RETRIES', self.max_retries))
+        self.spill_path = app.config.get('DETECTION_BUFFER_SPILL_DB', self.spill_path)
+        self.replay_interval = float(app.config.get('DETECTION_BUFFER_REPLAY_INTERVAL', self.replay_interval))
+        # Baris dari run sebelumnya diputar ulang setelah thread flusher berjalan
+        # (record pertama), atau manual lewat `flask detections replay-spill`
+        self._spill_pending = self._count_spilled()
+        atexit.register(self.shutdown)
+
+    def _ensure_started(self):
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='detection-flusher', daemon=True)
+                self._thread.start()
+
+    # --- Produsen ---
+    def add(self, row):
+        self.add_many([row])
+
+    def add_many(self, rows):
+        """Menambahkan rows ke buffer; jika buffer penuh melewati put_timeout, rows ditulis langsung."""
+        if not rows:
+            return
+        if not self.enabled or self._stopped or self.app is None:
+            self._write_inline(rows)
+            return
+        self._ensure_started()
+
+        now = time.monotonic()
+        deadline = now + self.put_timeout
+        with self._cond:
+            waited = False
+            # Batch yang lebih besar dari max_pending tetap diterima jika buffer kosong
+            while self._pending and len(self._pending) + len(rows) > self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stopped:
+                    break
+                if not waited:
+                    waited = True
+                    self.backpressure_waits += 1
+                self._cond.wait(remaining)
+            else:
+                self._pending.extend((now, row) for row in rows)
+                if len(self._pending) >= self.batch_size:
+                    self._cond.notify_all()
+                return
+
+        # Backpressure: DB tertinggal dan buffer penuh, tulis di thread pemanggil
+        self._write_inline(rows)
+
+    def _write_inline(self, rows):
+        self.ran_inline += 1
+        self._write_batch(rows, retry=False)
+
+    # --- Flusher ---
+    def _next_batch(self):
+        """Menunggu sampai ada batch penuh, batch tertua melewati flush interval, atau flush diminta."""
+        with self._cond:
+            while True:
+                if self._pending:
+                    age_ms = (time.monotonic() - self._pending[0][0]) * 1000.0
+                    if (len(self._pending) >= self.batch_size or age_ms >= self.flush_interval_ms
+                            or self._flush_requested or self._stopped):
+                        break
+                    self._cond.wait((self.flush_interval_ms - age_ms) / 1000.0)
+                elif self._stopped:
+                    return None
+                elif self._spill_pending and self._replay_due():
+                    return []
+                else:
+                    self._flush_requested = False
+                    self._cond.wait(self.replay_interval if self._spill_pending else None)
+
+            count = min(self.batch_size, len(self._pending))
+            batch = [self._pending.popleft()[1] for _ in range(count)]
+            self._inflight += count
+            # Ada ruang lagi untuk produsen yang menunggu
+            self._cond.notify_all()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if self._spill_pending and self._replay_due():
+                self.replay_spilled()
+            if not batch:
+                continue
+            try:
+                self._write_batch(batch, retry=True)
+            finally:
+                with self._cond:
+                    self._inflight -= len(batch)
+                    if not self._pending and not self._inflight:
+                        self._flush_requested = False
+                    self._cond.notify_all()
+
+    def _write_rows(self, rows):
+        if self.app is not None:
+            with self.app.app_context():
+                self.write_fn(rows)
+        else:
+            self.write_fn(rows)
+
+    def _write_batch(self, rows, retry):
+        attempts = (self.max_retries + 1) if retry else 1
+        for attempt in range(attempts):
+            try:
+                self._write_rows(rows)
+                self.written += len(rows)
+                self.batches += 1
+                return True
+            except Exception as e:
+                print(f"Database error during result saving ({len(rows)} rows, attempt {attempt + 1}): {e}")
+                if attempt + 1 < attempts and not self._stopped:
+                    self.retries += 1
+                    time.sleep(self.retry_backoff * (2 ** attempt))
+        failed_rows = self._write_rows_individually(rows) if len(rows) > 1 else [(rows[0], 'batch failed')]
+        self.written += len(rows) - len(failed_rows)
+        self._spill(failed_rows)
+        return not failed_rows
+
+    def _write_rows_individually(self, rows):
+        """
+        Menulis rows satu per satu (satu transaksi per baris) untuk mengisolasi baris
+        yang bermasalah. Mengembalikan daftar (row, error) yang tetap gagal; jika
+        database tidak dapat dihubungi, sisa baris langsung dikembalikan tanpa dicoba.
+        """
+        failed_rows = []
+        for index, row in enumerate(rows):
+            try:
+                self._write_rows([row])
+            except ConnectionError as e:
+                failed_rows.extend((pending, str(e)) for pending in rows[index:])
+                break
+            except Exception as e:
+                print(f"Database error during result saving (row {row[1]}): {e}")
+                failed_rows.append((row, str(e)))
+        return failed_rows
+
+    # --- Spill (baris yang gagal ditulis) ---
+    def _spill_conn(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+        conn = sqlite3.connect(self.spill_path, timeout=30, isolation_level=None)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS spilled_rows ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, row TEXT NOT NULL, created_at REAL NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT)"
+        )
+        return conn
+
+    def _count_spilled(self):
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return 0
+        try:
+            with self._spill_lock:
+                conn = self._spill_conn()
+                try:
+                    return conn.execute("SELECT COUNT(*) FROM spilled_rows").fetchone()[0]
+                finally:
+                    conn.close()
+        except sqlite3.Error as e:
+            print(f"Detection spill error: {e}")
+            return 0
+
+    def _spill(self, failed_rows):
+        """Menyimpan (row, error) ke file spill agar tidak hilang; dihitung failed jika itu pun gagal."""
+        if not failed_rows:
+            return
+        if not self.spill_path:
+            self.failed += len(failed_rows)
+            return
+        try:
+            with self._spill_lock:
+                conn = self._spill_conn()
+                try:
+                    now = time.time()
+                    conn.executemany(
+                        "INSERT INTO spilled_rows (row, created_at, attempts, last_error) VALUES (?, ?, 1, ?)",
+                        [(json.dumps(list(row)), now, error[:500]) for row, error in failed_rows]
+                    )
+                finally:
+                    conn.close()
+        except sqlite3.Error as e:
+            print(f"Detection spill error, {len(failed_rows)} rows lost: {e}")
+            self.failed += len(failed_rows)
+            return
+        self.spilled += len(failed_rows)
+        with self._cond:
+            self._spill_pending += len(failed_rows)
+            self._cond.notify_all()
+        print(f"{len(failed_rows)} detection rows spilled to {self.spill_path} for replay.")
+
+    def _replay_due(self):
+        return time.monotonic() - self._last_replay >= self.replay_interval
+
+    def replay_spilled(self, limit=None):
+        """
+        Menulis ulang baris di file spill (per batch, lalu per baris jika batch gagal).
+        Baris yang berhasil dihapus dari file; yang gagal tetap disimpan untuk percobaan
+        berikutnya. BEGIN IMMEDIATE mencegah dua proses memutar ulang baris yang sama.
+        Mengembalikan jumlah baris yang berhasil ditulis.
+        """
+        self._last_replay = time.monotonic()
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return 0
+        replayed = 0
+        try:
+            with self._spill_lock:
+                conn = self._spill_conn()
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        records = conn.execute(
+                            "SELECT id, row FROM spilled_rows ORDER BY id LIMIT ?", (limit or -1,)
+                        ).fetchall()
+                        for start in range(0, len(records), self.batch_size):
+                            chunk = records[start:start + self.batch_size]
+                            rows = [tuple(json.loads(row)) for _, row in chunk]
+                            try:
+                                self._write_rows(rows)
+                                failed = {}
+                            except ConnectionError:
+                                # Database masih tidak dapat dihubungi: coba lagi di putaran berikutnya
+                                break
+                            except Exception:
+                                failed = {tuple(row): error for row, error in self._write_rows_individually(rows)}
+                            done_ids = [record_id for (record_id, _), row in zip(chunk, rows) if row not in failed]
+                            conn.executemany("DELETE FROM spilled_rows WHERE id = ?", [(i,) for i in done_ids])
+                            conn.executemany(
+                                "UPDATE spilled_rows SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                                [(failed[row][:500], record_id) for (record_id, _), row in zip(chunk, rows) if row in failed]
+                            )
+                            replayed += len(done_ids)
+                        conn.execute("COMMIT")
+                    except BaseException:
+                        conn.execute("ROLLBACK")
+                        raise
+                    remaining = conn.execute("SELECT COUNT(*) FROM spilled_rows").fetchone()[0]
+                finally:
+                    conn.close()
+        except sqlite3.Error as e:
+            print(f"Detection spill replay error: {e}")
+            return replayed
+        self.replayed += replayed
+        self.written += replayed
+        with self._cond:
+            self._spill_pending = remaining
+        if replayed:
+            print(f"Replayed {replayed} spilled detection rows ({remaining} remaining).")
+        return replayed
+
+    def flush(self, timeout=None):
+        """Meminta flush segera dan menunggu sampai semua record tertulis."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._pending or self._inflight:
+                if self._thread is None or not self._thread.is_alive():
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        # Thread flusher tidak berjalan: tulis sisa buffer langsung
+        leftover = self._drain()
+        if leftover:
+            self._write_batch(leftover, retry=True)
+        return True
+
+    def _drain(self):
+        with self._cond:
+            rows = [row for _, row in self._pending]
+            self._pending.clear()
+            return rows
+
+    def shutdown(self):
+        """Menulis semua record yang tersisa lalu menghentikan thread flusher."""
+        if self._stopped:
+            return
+        self.flush()
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        leftover = self._drain()
+        if leftover:
+            self._write_batch(leftover, retry=False)
+
+    def stats(self):
+        with self._cond:
+            pending = len(self._pending)
+            oldest = self._pending[0][0] if self._pending else None
+            inflight = self._inflight
+        return {
+            "enabled": self.enabled,
+            "pending": pending,
+            "inflight": inflight,
+            "oldest_pending_age_ms": (time.monotonic() - oldest) * 1000.0 if oldest else 0.0,
+            "max_pending": self.max_pending,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": self.flush_interval_ms,
+            "written": self.written,
+            "batches": self.batches,
+            "avg_batch_size": (self.written / self.batches) if self.batches else 0.0,
+            "failed": self.failed,
+            "spilled": self.spilled,
+            "spill_pending": self._spill_pending,
+            "replayed": self.replayed,
+            "retries": self.retries,
+            "backpressure_waits": self.backpressure_waits,
+            "ran_inline": self.ran_inline,
+        }
+
+
+# Buffer global untuk record deteksi
+detection_buffer = DetectionWriteBuffer()
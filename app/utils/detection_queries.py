@@ -0,0 +1,154 @@
+# app/utils/detection_queries.py
+import base64
+import binascii
+from datetime import datetime, timedelta
+
+from .db import query_db
+
+# Urutan tetap untuk semua daftar deteksi; didukung indeks (..., detection_date, id)
+ORDER_BY = "ORDER BY d.detection_date DESC, d.id DESC"
+
+# Riwayat deteksi milik satu pengguna (/history)
+HISTORY_SELECT = """
+    SELECT
+        d.id,
+        d.detection_date,
+        d.result,
+        d.confidence,
+        r.image_path AS raw_image_path
+    FROM
+        fusarium_new_detections d
+    JOIN
+        fusarium_new_raw_images r ON d.raw_image_id = r.id
+"""
+
+# Log deteksi semua pengguna (/admin/logs)
+ADMIN_LOGS_SELECT = """
+    SELECT
+        d.id, d.detection_date, d.result, d.confidence,
+        r.image_path AS raw_image_path,
+        u.display_name AS user_name,
+        u.phone_number AS user_phone
+    FROM fusarium_new_detections d
+    JOIN users u ON d.user_id = u.id
+    LEFT JOIN fusarium_new_raw_images r ON d.raw_image_id = r.id
+"""
+
+
+class FilterError(ValueError):
+    """Parameter filter atau cursor paginasi tidak valid."""
+
+
+def encode_cursor(detection_date, detection_id):
+    """Cursor keyset buram berisi (detection_date, id) baris terakhir di halaman."""
+    raw = f"{detection_date.isoformat()}|{detection_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        date_part, id_part = raw.rsplit('|', 1)
+        return datetime.fromisoformat(date_part), int(id_part)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise FilterError("Cursor tidak valid.")
+
+
+def _parse_date(value, name, end=False):
+    """Menerima YYYY-MM-DD atau ISO 8601. Untuk batas akhir berupa tanggal saja, seluruh hari ikut."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise FilterError(f"Format {name} tidak valid (gunakan YYYY-MM-DD).")
+    if end and len(value) <= 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def _parse_fraction(value, name, maximum):
+    try:
+        number = float(value)
+    except ValueError:
+        raise FilterError(f"{name} harus berupa angka.")
+    if not 0 <= number <= maximum:
+        raise FilterError(f"{name} harus di antara 0 dan {maximum:g}.")
+    return number
+
+
+def parse_detection_filters(args, allow_user_filter=False):
+    """
+    Membaca filter dari query string: result, date_from, date_to, min_confidence
+    (0-1) atau min_confidence_pct (0-100), dan user_id (khusus admin). Melempar FilterError jika ada nilai yang tidak valid.
+    """
+    filters = {}
+    if args.get('result'):
+        filters['result'] = args['result']
+    if args.get('date_from'):
+        filters['date_from'] = _parse_date(args['date_from'], 'date_from')
+    if args.get('date_to'):
+        filters['date_to'] = _parse_date(args['date_to'], 'date_to', end=True)
+    # min_confidence berupa pecahan 0-1; form dashboard mengirim persen lewat min_confidence_pct
+    if args.get('min_confidence'):
+        filters['min_confidence'] = _parse_fraction(args['min_confidence'], 'min_confidence', 1.0)
+    elif args.get('min_confidence_pct'):
+        filters['min_confidence'] = _parse_fraction(args['min_confidence_pct'], 'min_confidence_pct', 100.0) / 100.0
+    if allow_user_filter and args.get('user_id'):
+        try:
+            filters['user_id'] = int(args['user_id'])
+        except ValueError:
+            raise FilterError("user_id harus berupa angka.")
+    return filters
+
+
+def parse_page_args(args, default_size, max_size):
+    """Membaca limit dan cursor dari query string."""
+    try:
+        limit = int(args.get('limit', default_size))
+    except ValueError:
+        raise FilterError("limit harus berupa angka.")
+    limit = max(1, min(limit, max_size))
+    cursor = decode_cursor(args['cursor']) if args.get('cursor') else None
+    return limit, cursor
+
+
+def detection_where(filters, cursor=None):
+    """Membangun klausa WHERE (dengan alias d untuk fusarium_new_detections) beserta parameternya."""
+    conditions, params = [], []
+    if filters.get('user_id') is not None:
+        conditions.append("d.user_id = %s")
+        params.append(filters['user_id'])
+    if filters.get('result'):
+        conditions.append("d.result = %s")
+        params.append(filters['result'])
+    if filters.get('date_from'):
+        conditions.append("d.detection_date >= %s")
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        conditions.append("d.detection_date < %s")
+        params.append(filters['date_to'])
+    if filters.get('min_confidence') is not None:
+        conditions.append("d.confidence >= %s")
+        params.append(filters['min_confidence'])
+    if cursor is not None:
+        # Bentuk OR eksplisit agar MySQL memakai range scan pada indeks (detection_date, id)
+        last_date, last_id = cursor
+        conditions.append("(d.detection_date < %s OR (d.detection_date = %s AND d.id < %s))")
+        params += [last_date, last_date, last_id]
+    return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+
+def fetch_detection_page(select_from, filters, cursor, limit):
+    """
+    Menjalankan `select_from` (SELECT ... FROM fusarium_new_detections d ...) dengan filter
+    dan paginasi keyset. Kolom d.id dan d.detection_date wajib ikut dipilih sebagai
+    `id` dan `detection_date`. Mengembalikan (rows, next_cursor) atau (None, None) jika gagal.
+    """
+    where, params = detection_where(filters, cursor)
+    rows = query_db(f"{select_from} {where} {ORDER_BY} LIMIT %s", (*params, limit + 1))
+    if rows is None:
+        return None, None
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['detection_date'], rows[-1]['id'])
+    return rows, next_cursor
@@ -0,0 +1,129 @@
+# app/utils/detection_stats.py
+from collections import Counter
+
+from .db import get_db_connection, query_db
+
+
+def count_deltas(rows, sign=1):
+    """
+    Mengelompokkan rows (user_id, stat_date, result) menjadi perubahan hitungan
+    per (tanggal, hasil) dan per (pengguna, hasil). sign=-1 untuk penghapusan.
+    """
+    daily, per_user = Counter(), Counter()
+    for user_id, stat_date, result in rows:
+        daily[(stat_date, result)] += sign
+        per_user[(user_id, result)] += sign
+    return daily, per_user
+
+
+def apply_deltas(cursor, daily, per_user):
+    """
+    Menerapkan perubahan hitungan ke tabel ringkasan dan users.total_uploads.
+    Harus dipanggil di dalam transaksi yang sama dengan perubahan tabel deteksi.
+    """
+    daily_rows = [(stat_date, result, n) for (stat_date, result), n in daily.items() if n]
+    if daily_rows:
+        cursor.executemany(
+            "INSERT INTO detection_daily_stats (stat_date, result, detections) VALUES (%s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE detections = detections + VALUES(detections)",
+            daily_rows
+        )
+    user_rows = [(user_id, result, n) for (user_id, result), n in per_user.items() if n]
+    if user_rows:
+        cursor.executemany(
+            "INSERT INTO user_detection_stats (user_id, result, detections) VALUES (%s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE detections = detections + VALUES(detections)",
+            user_rows
+        )
+        totals = Counter()
+        for user_id, _, n in user_rows:
+            totals[user_id] += n
+        cursor.executemany(
+            "UPDATE users SET total_uploads = GREATEST(CAST(total_uploads AS SIGNED) + %s, 0) WHERE id = %s",
+            [(n, user_id) for user_id, n in totals.items() if n]
+        )
+
+
+def rebuild_stats(conn=None):
+    """
+    Menghitung ulang semua tabel ringkasan dan users.total_uploads dari tabel deteksi
+    dalam satu transaksi (rekonsiliasi). Mengembalikan jumlah baris ringkasan.
+    conn opsional (mis. koneksi langsung dari skrip seed); default dari pool aplikasi.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+        if conn is None:
+            raise ConnectionError("Database connection failed")
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        cursor.execute("DELETE FROM detection_daily_stats")
+        cursor.execute(
+            "INSERT INTO detection_daily_stats (stat_date, result, detections) "
+            "SELECT DATE(detection_date), result, COUNT(*) FROM fusarium_new_detections "
+            "GROUP BY DATE(detection_date), result"
+        )
+        daily_rows = cursor.rowcount
+        cursor.execute("DELETE FROM user_detection_stats")
+        cursor.execute(
+            "INSERT INTO user_detection_stats (user_id, result, detections) "
+            "SELECT user_id, result, COUNT(*) FROM fusarium_new_detections GROUP BY user_id, result"
+        )
+        user_rows = cursor.rowcount
+        cursor.execute(
+            "UPDATE users u LEFT JOIN ("
+            " SELECT user_id, SUM(detections) AS total FROM user_detection_stats GROUP BY user_id"
+            ") s ON s.user_id = u.id "
+            "SET u.total_uploads = COALESCE(s.total, 0)"
+        )
+        conn.commit()
+        return {"daily_rows": daily_rows, "user_rows": user_rows}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.close()
+
+
+def reset_stats(cursor):
+    """Mengosongkan semua ringkasan (dipakai saat seluruh log deteksi dihapus)."""
+    cursor.execute("DELETE FROM detection_daily_stats")
+    cursor.execute("DELETE FROM user_detection_stats")
+    cursor.execute("UPDATE users SET total_uploads = 0 WHERE total_uploads <> 0")
+
+
+def get_dashboard_stats(days=30, top_users=10):
+    """
+    Ringkasan untuk /admin/stats, hanya dari tabel ringkasan (tidak memindai tabel deteksi):
+    total per hasil, deret harian `days` hari terakhir, dan pengguna dengan unggahan terbanyak.
+    """
+    totals = query_db(
+        "SELECT result, SUM(detections) AS detections FROM detection_daily_stats GROUP BY result"
+    )
+    daily = query_db(
+        "SELECT stat_date, result, detections FROM detection_daily_stats "
+        "WHERE stat_date >= CURDATE() - INTERVAL %s DAY ORDER BY stat_date",
+        (days - 1,)
+    )
+    users = query_db(
+        "SELECT id, display_name, total_uploads FROM users WHERE total_uploads > 0 "
+        "ORDER BY total_uploads DESC LIMIT %s",
+        (top_users,)
+    )
+    if totals is None or daily is None or users is None:
+        return None
+
+    by_result = {row['result']: int(row['detections'] or 0) for row in totals}
+    series = {}
+    for row in daily:
+        day = row['stat_date'].isoformat()
+        series.setdefault(day, {})[row['result']] = int(row['detections'])
+    return {
+        "total_detections": sum(by_result.values()),
+        "by_result": by_result,
+        "daily": [{"date": day, "counts": counts} for day, counts in series.items()],
+        "top_users": users,
+    }
@@ -0,0 +1,190 @@
+# app/utils/detections.py
+import mysql.connector
+
+from .db import get_db_connection
+from .detection_buffer import detection_buffer
+from .detection_stats import count_deltas, apply_deltas
+
+
+def write_detections(rows):
+    """
+    Menulis banyak record deteksi dalam SATU transaksi.
+    rows: daftar (user_id, raw_image_path_for_db, label, confidence).
+    Gambar mentah, hasil deteksi dan tabel ringkasan di-commit bersama sehingga
+    tidak ada baris gambar mentah yatim jika insert kedua gagal. Melempar exception jika gagal.
+    Aman diulang (retry buffer, replay spill, job yang diulang): gambar yang sudah
+    tercatat dilewati, termasuk jika commit percobaan sebelumnya ternyata berhasil.
+    Mengembalikan jumlah record yang benar-benar ditulis.
+    """
+    if not rows:
+        return 0
+    conn = get_db_connection()
+    if conn is None:
+        raise ConnectionError("Database connection failed")
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        # Satu waktu server untuk seluruh batch, dipakai juga untuk ringkasan harian
+        cursor.execute("SELECT NOW()")
+        detection_date = cursor.fetchone()[0]
+
+        # 1. Lewati gambar yang sudah tercatat (dikunci agar percobaan paralel tidak menulis dua kali)
+        paths = [path for _, path, _, _ in rows]
+        cursor.execute(
+            f"SELECT image_path FROM fusarium_new_raw_images WHERE image_path IN ({', '.join(['%s'] * len(paths))}) "
+            f"FOR UPDATE",
+            paths
+        )
+        existing = {path for (path,) in cursor.fetchall()}
+        pending = []
+        for row in rows:
+            if row[1] not in existing:
+                existing.add(row[1])
+                pending.append(row)
+        if not pending:
+            conn.commit()
+            return 0
+
+        # 2. Insert gambar mentah satu per satu; id diambil dari lastrowid, bukan dicari lewat image_path
+        detections = []
+        for user_id, path, label, confidence in pending:
+            cursor.execute(
+                "INSERT INTO fusarium_new_raw_images (user_id, image_path) VALUES (%s, %s)",
+                (user_id, path)
+            )
+            detections.append((user_id, cursor.lastrowid, label, confidence, path, detection_date))
+
+        # 3. Bulk insert hasil deteksi, satu baris riwayat per gambar
+        cursor.executemany(
+            "INSERT INTO fusarium_new_detections (user_id, raw_image_id, result, confidence, image_path, detection_date) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            detections
+        )
+
+        # 4. Perbarui ringkasan (harian, per pengguna, users.total_uploads)
+        apply_deltas(cursor, *count_deltas(
+            (user_id, detection_date.date(), label) for user_id, _, label, _ in pending
+        ))
+        conn.commit()
+        return len(detections)
+    except Exception:
+        try:
+            conn.rollback()
+        except mysql.connector.Error:
+            pass
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def save_detection(user_id, raw_image_path_for_db, result):
+    """
+    Mencatat satu gambar mentah beserta hasil deteksinya untuk pengguna yang login.
+    Record masuk ke detection_buffer dan ditulis bersama record lain dalam satu transaksi.
+    """
+    detection_buffer.add((user_id, raw_image_path_for_db, result['label'], result['confidence']))
+
+
+def record_detection(user_id, raw_image_path_for_db, result):
+    """
+    Versi sinkron dari save_detection untuk job antrean: record langsung ditulis
+    dan exception dilempar jika gagal, sehingga job diulang alih-alih dianggap selesai.
+    Aman diulang karena write_detections melewati gambar yang sudah tercatat.
+    """
+    write_detections([(user_id, raw_image_path_for_db, result['label'], result['confidence'])])
+
+
+def save_detections_bulk(user_id, saved):
+    """
+    Versi bulk dari save_detection. saved: daftar (raw_image_path_for_db, result).
+    """
+    detection_buffer.add_many([
+        (user_id, path, result['label'], result['confidence']) for path, result in saved
+    ])
+
+
+def delete_detections(where, params=(), delete_raw_images=True):
+    """
+    Menghapus deteksi yang cocok dengan `where` (klausa SQL dengan alias d) beserta
+    gambar mentahnya dalam satu transaksi, dan mengurangi tabel ringkasan.
+    Mengembalikan dict berisi jumlah baris terhapus dan daftar image_path, atau None jika gagal.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        # Kunci baris yang akan dihapus agar ringkasan dikurangi tepat sekali
+        cursor.execute(
+            f"SELECT d.id, d.user_id, DATE(d.detection_date), d.result, d.raw_image_id, r.image_path "
+            f"FROM fusarium_new_detections d LEFT JOIN fusarium_new_raw_images r ON d.raw_image_id = r.id "
+            f"WHERE {where} FOR UPDATE",
+            params
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            conn.commit()
+            return {"detections": 0, "raw_images": 0, "image_paths": []}
+
+        detection_ids = [row[0] for row in rows]
+        raw_image_ids = sorted({row[4] for row in rows if row[4]})
+        for start in range(0, len(detection_ids), 1000):
+            chunk = detection_ids[start:start + 1000]
+            cursor.execute(
+                f"DELETE FROM fusarium_new_detections WHERE id IN ({', '.join(['%s'] * len(chunk))})", chunk
+            )
+        raw_deleted = 0
+        if delete_raw_images:
+            for start in range(0, len(raw_image_ids), 1000):
+                chunk = raw_image_ids[start:start + 1000]
+                cursor.execute(
+                    f"DELETE FROM fusarium_new_raw_images WHERE id IN ({', '.join(['%s'] * len(chunk))})", chunk
+                )
+                raw_deleted += cursor.rowcount
+
+        apply_deltas(cursor, *count_deltas(((row[1], row[2], row[3]) for row in rows), sign=-1))
+        conn.commit()
+        return {
+            "detections": len(detection_ids),
+            "raw_images": raw_deleted,
+            "image_paths": [row[5] for row in rows if row[5]] if delete_raw_images else [],
+        }
+    except Exception as e:
+        print(f"Database error during detection delete: {e}")
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def update_detection_results(updates, changes):
+    """
+    Menulis hasil prediksi ulang. updates: daftar (result, confidence, detection_id);
+    changes: daftar (user_id, stat_date, old_result, new_result) untuk deteksi yang labelnya berubah.
+    Update dan koreksi ringkasan harian di-commit bersama. Mengembalikan False jika gagal.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return False
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        cursor.executemany("UPDATE fusarium_new_detections SET result = %s, confidence = %s WHERE id = %s", updates)
+        daily, per_user = count_deltas((user_id, stat_date, new) for user_id, stat_date, _, new in changes)
+        old_daily, old_per_user = count_deltas(((user_id, stat_date, old) for user_id, stat_date, old, _ in changes), sign=-1)
+        # Counter.update menjumlahkan (termasuk nilai negatif), berbeda dengan operator +
+        daily.update(old_daily)
+        per_user.update(old_per_user)
+        apply_deltas(cursor, daily, per_user)
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Database execution error: {e}")
+        conn.rollback()
+        return False
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,128 @@
+# app/utils/exports.py
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+import mysql.connector
+
+from .db import get_db_connection
+from .detection_queries import ADMIN_LOGS_SELECT, ORDER_BY, detection_where
+
+# Kolom hasil ADMIN_LOGS_SELECT, sesuai urutan SELECT
+EXPORT_COLUMNS = ('id', 'detection_date', 'result', 'confidence', 'raw_image_path', 'user_name', 'user_phone')
+
+
+def iter_detection_rows(filters, fetch_size=1000, net_write_timeout=None):
+    """
+    Menjalankan query log deteksi dan mengembalikan generator baris (tuple) yang
+    dibaca dari cursor tanpa buffer, sehingga memori tetap konstan berapa pun
+    jumlah barisnya. Query dijalankan sebelum response dimulai agar kegagalan
+    koneksi/query masih bisa dilaporkan sebagai error; mengembalikan None jika gagal.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    # Cursor biasa mysql.connector tidak di-buffer: baris dibaca dari socket saat di-fetch
+    cursor = conn.cursor(buffered=False)
+    try:
+        if net_write_timeout:
+            # Klien lambat tidak boleh membuat server memutus koneksi di tengah ekspor
+            cursor.execute("SET SESSION net_write_timeout = %s", (int(net_write_timeout),))
+        where, params = detection_where(filters)
+        cursor.execute(f"{ADMIN_LOGS_SELECT} {where} {ORDER_BY}", params)
+    except mysql.connector.Error as err:
+        print(f"Database execution error: {err}")
+        cursor.close()
+        if net_write_timeout:
+            _restore_net_write_timeout(conn)
+        else:
+            conn.close()
+        return None
+    return _iter_cursor(conn, cursor, fetch_size, restore_timeout=bool(net_write_timeout))
+
+
+def _restore_net_write_timeout(conn):
+    """
+    Mengembalikan net_write_timeout sesi ke nilai global. Pengaturan SESSION menempel
+    pada koneksi pool (release hanya rollback), jadi koneksi yang tidak bisa
+    dipulihkan dibuang. Koneksi selalu dilepas.
+    """
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SET SESSION net_write_timeout = @@GLOBAL.net_write_timeout")
+        finally:
+            cursor.close()
+    except mysql.connector.Error as err:
+        print(f"Failed to restore net_write_timeout: {err}")
+        conn.discard()
+        return
+    conn.close()
+
+
+def _iter_cursor(conn, cursor, fetch_size, restore_timeout=False):
+    """Koneksi dipegang selama iterasi dan dikembalikan ke pool saat generator selesai atau ditutup."""
+    try:
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        try:
+            cursor.close()
+        except mysql.connector.Error:
+            # Ekspor dihentikan di tengah (klien putus): masih ada hasil yang belum dibaca.
+            # Koneksi dibuang alih-alih membaca sisa hasil dan memulihkan state sesinya.
+            conn.discard()
+        else:
+            if restore_timeout:
+                _restore_net_write_timeout(conn)
+            else:
+                conn.close()
+
+
+def _serialize(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def iter_csv(rows, columns=EXPORT_COLUMNS, chunk_bytes=64 * 1024):
+    """Mengubah baris menjadi potongan teks CSV berukuran ~chunk_bytes."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_serialize(value) for value in row])
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(rows, columns=EXPORT_COLUMNS, chunk_bytes=64 * 1024):
+    """Mengubah baris menjadi potongan NDJSON (satu objek JSON per baris)."""
+    chunk = []
+    size = 0
+    for row in rows:
+        line = json.dumps({column: _serialize(value) for column, value in zip(columns, row)}) + '\n'
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield ''.join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def gzip_stream(chunks, level=6):
+    """Mengompres aliran potongan teks menjadi satu file gzip secara bertahap."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,54 @@
+# app/utils/http_cache.py
+import mimetypes
+import os
+import re
+
+from flask import current_app, send_from_directory, make_response, abort
+from werkzeug.security import safe_join
+
+# Nama file unggahan yang isinya tidak pernah berubah:
+# UUID hex (raw_images) atau user_<id>_<8 hex> (profile_pics)
+IMMUTABLE_NAME_RE = re.compile(r'(^|/)([0-9a-f]{32}|user_\d+_[0-9a-f]{8})\.[A-Za-z0-9]+(\.[A-Za-z0-9]+)?$')
+
+
+def is_immutable_upload(relpath):
+    return bool(IMMUTABLE_NAME_RE.search(relpath.replace('\\', '/')))
+
+
+def _apply_cache_headers(response, relpath):
+    if is_immutable_upload(relpath):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = int(current_app.config.get('UPLOAD_CACHE_MAX_AGE', 31536000))
+        response.cache_control.immutable = True
+    else:
+        # File lain tetap divalidasi ulang lewat ETag/Last-Modified
+        response.cache_control.no_cache = True
+    return response
+
+
+def send_upload_file(directory, relpath, internal_prefix):
+    """
+    Mengirim file dari folder uploads dengan validator (ETag, Last-Modified),
+    dukungan 304 dan Range (206), serta Cache-Control immutable untuk nama
+    file berbasis UUID.
+
+    UPLOAD_SEND_MODE:
+      'python'     - isi file dikirim oleh Flask (default)
+      'x-accel'    - header X-Accel-Redirect ke internal_prefix (nginx)
+      'x-sendfile' - header X-Sendfile (Apache/lighttpd)
+    """
+    mode = current_app.config.get('UPLOAD_SEND_MODE', 'python')
+
+    if mode == 'x-accel':
+        full_path = safe_join(directory, relpath)
+        if full_path is None or not os.path.isfile(full_path):
+            abort(404)
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = f"{internal_prefix.rstrip('/')}/{relpath.replace(os.sep, '/')}"
+        response.mimetype = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        return _apply_cache_headers(response, relpath)
+
+    # Mode 'x-sendfile' ditangani oleh USE_X_SENDFILE di send_file
+    response = send_from_directory(directory, relpath, conditional=True, etag=True, max_age=0)
+    return _apply_cache_headers(response, relpath)
@@ -0,0 +1,118 @@
+# app/utils/inference_backends.py
+import os
+import threading
+
+import numpy as np
+
+# Akhiran file artefak untuk tiap backend, relatif terhadap file model .h5
+ARTIFACT_SUFFIXES = {
+    'keras': '.h5',
+    'tflite_fp16': '.fp16.tflite',
+    'tflite_int8': '.int8.tflite',
+    'onnx': '.onnx',
+}
+
+
+def artifact_path(model_path, backend_name):
+    """Mengembalikan path artefak model untuk backend tertentu (mis. model_Tes2.fp16.tflite)."""
+    if backend_name not in ARTIFACT_SUFFIXES:
+        raise ValueError(f"Unknown inference backend: {backend_name}")
+    if backend_name == 'keras':
+        return model_path
+    base, _ = os.path.splitext(model_path)
+    return base + ARTIFACT_SUFFIXES[backend_name]
+
+
+class InferenceBackend:
+    """Antarmuka backend: predict(batch) menerima float32 (N, 224, 224, 3) dan mengembalikan (N, num_classes)."""
+    name = None
+
+    def __init__(self, path, num_threads=None):
+        self.path = path
+        self.num_threads = num_threads
+
+    def predict(self, batch):
+        raise NotImplementedError
+
+
+class KerasBackend(InferenceBackend):
+    name = 'keras'
+
+    def __init__(self, path, num_threads=None):
+        super().__init__(path, num_threads)
+        if num_threads:
+            import tensorflow as tf
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+            except RuntimeError as e:
+                # Runtime TensorFlow sudah terinisialisasi; jumlah thread tidak bisa diubah lagi
+                print(f"Could not set TensorFlow intra-op threads: {e}")
+        from .model_provider import load_keras_model
+        self.model = load_keras_model(path)
+
+    def predict(self, batch):
+        return np.asarray(self.model.predict_on_batch(batch))
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    Backend TFLite (float16 atau int8 dynamic-range). Memakai tflite_runtime
+    jika terpasang, jika tidak memakai tf.lite dari TensorFlow.
+    """
+    name = 'tflite'
+
+    def __init__(self, path, num_threads=None):
+        super().__init__(path, num_threads)
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite.python.interpreter import Interpreter
+        self.interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input_index = self.interpreter.get_input_details()[0]['index']
+        self._output_index = self.interpreter.get_output_details()[0]['index']
+        self._batch_size = self.interpreter.get_input_details()[0]['shape'][0]
+        # Interpreter TFLite tidak thread-safe
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input_index, batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self.interpreter.set_tensor(self._input_index, batch)
+            self.interpreter.invoke()
+            return np.array(self.interpreter.get_tensor(self._output_index))
+
+
+class OnnxBackend(InferenceBackend):
+    name = 'onnx'
+
+    def __init__(self, path, num_threads=None):
+        super().__init__(path, num_threads)
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self._input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+
+BACKENDS = {
+    'keras': KerasBackend,
+    'tflite_fp16': TFLiteBackend,
+    'tflite_int8': TFLiteBackend,
+    'onnx': OnnxBackend,
+}
+
+
+def create_backend(backend_name, model_path, num_threads=None):
+    """Membuat backend inferensi berdasarkan nama (lihat BACKENDS) dari file model .h5."""
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend_name}")
+    return BACKENDS[backend_name](artifact_path(model_path, backend_name), num_threads=num_threads)
@@ -0,0 +1,310 @@
+# app/utils/inference_pool.py
+import ipaddress
+import os
+import queue
+import signal
+import threading
+import time
+from multiprocessing import get_context, resource_tracker
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+INPUT_SHAPE = (224, 224, 3)
+TENSOR_BYTES = int(np.prod(INPUT_SHAPE)) * np.dtype(np.float32).itemsize
+
+
+def _attach_shared_memory(name):
+    """
+    Menempel ke shared memory milik klien. Segmen dilepas dari resource_tracker
+    proses ini agar tidak ikut di-unlink saat worker berhenti.
+    """
+    shm = SharedMemory(name=name)
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+
+# ====================================================================
+# SISI SERVER (proses master + worker pemilik model)
+# ====================================================================
+
+def _serve_connection(conn, backend, worker_index):
+    """Melayani satu koneksi klien: baca tensor dari shared memory, kirim hasil prediksi."""
+    attached = {}
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            command = message[0]
+            if command == 'predict':
+                _, shm_name, count = message
+                shm = attached.get(shm_name)
+                if shm is None:
+                    shm = attached[shm_name] = _attach_shared_memory(shm_name)
+                batch = np.ndarray((count,) + INPUT_SHAPE, dtype=np.float32, buffer=shm.buf)
+                try:
+                    conn.send(('ok', np.asarray(backend.predict(batch))))
+                except Exception as e:
+                    conn.send(('error', str(e)))
+                del batch
+            elif command == 'ping':
+                conn.send(('ok', {"pid": os.getpid(), "worker": worker_index}))
+    finally:
+        for shm in attached.values():
+            shm.close()
+        conn.close()
+
+
+def _worker_main(listener, worker_index, backend_factory, cpus):
+    """Proses worker: memuat model sendiri lalu menerima koneksi dari listener bersama."""
+    signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    backend = backend_factory()
+    print(f"Inference worker {worker_index} (pid {os.getpid()}) ready.")
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception as e:
+            print(f"Inference worker {worker_index} accept error: {e}")
+            continue
+        threading.Thread(target=_serve_connection, args=(conn, backend, worker_index), daemon=True).start()
+
+
+class InferencePoolServer:
+    """
+    Pool proses inferensi. Proses master membuka listener lalu mem-fork
+    num_workers worker; setiap worker memuat model sendiri dan menerima
+    koneksi dari listener yang sama. Worker yang mati dideteksi dan di-spawn ulang.
+    Master tidak memuat TensorFlow sehingga fork tetap aman.
+    """
+
+    def __init__(self, address, authkey, backend_factory, num_workers=2, cpu_affinity=None):
+        self.address = address
+        self.authkey = authkey
+        self.backend_factory = backend_factory
+        self.num_workers = num_workers
+        self.cpu_affinity = cpu_affinity or []
+        self.respawns = 0
+        self._ctx = get_context('fork')
+        self._workers = {}
+        self._running = False
+
+    def _cpus_for(self, index):
+        if not self.cpu_affinity:
+            return None
+        # cpu_affinity: daftar set CPU, dibagikan bergiliran ke worker
+        return self.cpu_affinity[index % len(self.cpu_affinity)]
+
+    def _spawn(self, index):
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(self._listener, index, self.backend_factory, self._cpus_for(index)),
+            name=f'inference-worker-{index}',
+            daemon=True
+        )
+        proc.start()
+        self._workers[index] = proc
+
+    def serve_forever(self, check_interval=1.0):
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+        self._listener = Listener(self.address, authkey=self.authkey)
+        self._running = True
+        signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        signal.signal(signal.SIGINT, lambda *_: self.stop())
+
+        for index in range(self.num_workers):
+            self._spawn(index)
+        print(f"Inference pool listening on {self.address} with {self.num_workers} workers.")
+
+        try:
+            while self._running:
+                time.sleep(check_interval)
+                for index, proc in list(self._workers.items()):
+                    if not proc.is_alive() and self._running:
+                        print(f"Inference worker {index} (pid {proc.pid}) died with exit code {proc.exitcode}; respawning.")
+                        self.respawns += 1
+                        self._spawn(index)
+        finally:
+            self._shutdown_workers()
+
+    def stop(self):
+        self._running = False
+
+    def _shutdown_workers(self):
+        for proc in self._workers.values():
+            if proc.is_alive():
+                proc.terminate()
+        for proc in self._workers.values():
+            proc.join(timeout=5)
+        self._listener.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+
+# ====================================================================
+# SISI KLIEN (dipakai proses web sebagai backend inferensi)
+# ====================================================================
+
+class _Slot:
+    """Satu koneksi ke pool beserta segmen shared memory miliknya."""
+
+    def __init__(self, address, authkey, max_batch_size):
+        self.shm = SharedMemory(create=True, size=max_batch_size * TENSOR_BYTES)
+        self.address = address
+        self.authkey = authkey
+        self.conn = None
+
+    def connect(self):
+        if self.conn is None:
+            self.conn = Client(self.address, authkey=self.authkey)
+        return self.conn
+
+    def reset(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except OSError:
+                pass
+        self.conn = None
+
+    def close(self):
+        self.reset()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class InferencePoolClient:
+    """
+    Backend inferensi yang meneruskan batch ke InferencePoolServer.
+    Tensor disalin ke shared memory (bukan di-pickle); hanya nama segmen dan
+    jumlah baris yang dikirim lewat koneksi, hasilnya berupa array kecil.
+    """
+    name = 'pool'
+
+    def __init__(self, address, authkey, num_slots=4, max_batch_size=16, retries=1):
+        self.address = address
+        self.authkey = authkey
+        self.max_batch_size = max_batch_size
+        self.retries = retries
+        self._slots = queue.Queue()
+        self._all_slots = []
+        for _ in range(num_slots):
+            slot = _Slot(address, authkey, max_batch_size)
+            self._all_slots.append(slot)
+            self._slots.put(slot)
+        self.requests = 0
+        self.reconnects = 0
+        # Pastikan pool dapat dihubungi saat dimuat oleh ModelProvider
+        self.ping()
+
+    def ping(self):
+        slot = self._slots.get()
+        try:
+            conn = slot.connect()
+            conn.send(('ping',))
+            return conn.recv()[1]
+        finally:
+            self._slots.put(slot)
+
+    def _predict_chunk(self, slot, chunk):
+        count = chunk.shape[0]
+        view = np.ndarray((count,) + INPUT_SHAPE, dtype=np.float32, buffer=slot.shm.buf)
+        view[...] = chunk
+        del view
+        for attempt in range(self.retries + 1):
+            try:
+                conn = slot.connect()
+                conn.send(('predict', slot.shm.name, count))
+                status, payload = conn.recv()
+                break
+            except (EOFError, OSError, ConnectionError):
+                # Worker mati (crash) di tengah permintaan; sambung ulang ke worker lain
+                slot.reset()
+                self.reconnects += 1
+                if attempt == self.retries:
+                    raise
+        if status != 'ok':
+            raise RuntimeError(f"Inference pool error: {payload}")
+        return payload
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        slot = self._slots.get()
+        try:
+            self.requests += 1
+            outputs = [
+                self._predict_chunk(slot, batch[start:start + self.max_batch_size])
+                for start in range(0, batch.shape[0], self.max_batch_size)
+            ]
+        finally:
+            self._slots.put(slot)
+        return np.concatenate(outputs, axis=0)
+
+    def close(self):
+        for slot in self._all_slots:
+            slot.close()
+
+    def stats(self):
+        return {
+            "address": str(self.address),
+            "slots": len(self._all_slots),
+            "free_slots": self._slots.qsize(),
+            "requests": self.requests,
+            "reconnects": self.reconnects,
+        }
+
+
+def parse_address(address):
+    """
+    'host:port' menjadi tuple (host, port); selain itu dianggap path unix socket.
+    Alamat TCP harus loopback: tensor dikirim lewat shared memory (hanya satu host)
+    dan koneksi multiprocessing meng-unpickle data yang diterimanya.
+    """
+    if isinstance(address, str) and ':' in address and not address.startswith('/'):
+        host, port = address.rsplit(':', 1)
+        host = host.strip('[]')
+        if host != 'localhost':
+            try:
+                loopback = ipaddress.ip_address(host).is_loopback
+            except ValueError:
+                loopback = False
+            if not loopback:
+                raise ValueError(f"INFERENCE_POOL_ADDRESS harus alamat loopback atau unix socket, bukan {address!r}.")
+        return host, int(port)
+    return address
+
+
+def pool_settings(config):
+    """
+    (alamat, authkey) pool inferensi dari konfigurasi. ValueError jika alamat tidak
+    valid atau INFERENCE_POOL_AUTHKEY tidak diisi lewat environment.
+    """
+    authkey = config.get('INFERENCE_POOL_AUTHKEY')
+    if not authkey:
+        raise ValueError("INFERENCE_POOL_AUTHKEY wajib diisi jika INFERENCE_POOL_ADDRESS dikonfigurasi.")
+    if isinstance(authkey, str):
+        authkey = authkey.encode()
+    return parse_address(config['INFERENCE_POOL_ADDRESS']), authkey
+
+
+def parse_cpu_affinity(spec):
+    """'0-1,2-3' menjadi [{0, 1}, {2, 3}] (satu set CPU per worker)."""
+    if not spec:
+        return []
+    groups = []
+    for group in str(spec).split(','):
+        group = group.strip()
+        if '-' in group:
+            start, end = group.split('-', 1)
+            groups.append(set(range(int(start), int(end) + 1)))
+        elif group:
+            groups.append({int(group)})
+    return groups
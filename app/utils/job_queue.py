@@ -0,0 +1,285 @@
+# app/utils/job_queue.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Status job deteksi
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class QueueFullError(Exception):
+    """Antrean job sudah mencapai batas kedalaman (JOB_QUEUE_MAX_DEPTH)."""
+
+
+class DetectionJobQueue:
+    """
+    Antrean job deteksi yang tahan restart (SQLite di disk).
+    /upload menyimpan gambar lalu mendaftarkan job; thread worker mengambil
+    job, menjalankan handler (prediksi + simpan hasil), dan mencatat hasilnya.
+    Job yang gagal diulang dengan backoff sampai JOB_MAX_RETRIES.
+    Klaim job memakai transaksi BEGIN IMMEDIATE sehingga aman dipakai
+    beberapa proses web sekaligus. Kelas yang sama dipakai untuk antrean lain
+    (mis. penghapusan massal) dengan file SQLite dan awalan konfigurasi sendiri.
+    """
+
+    def __init__(self, db_path=None, num_workers=2, max_depth=1000, max_retries=3,
+                 retry_backoff=2.0, running_timeout=300, result_ttl=86400, name='detection-job'):
+        self.name = name
+        self.db_path = db_path
+        self.num_workers = num_workers
+        self.max_depth = max_depth
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.running_timeout = running_timeout
+        self.result_ttl = result_ttl
+        self.handler = None
+        self.app = None
+        self.enabled = False
+
+        self._local = threading.local()
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._start_lock = threading.Lock()
+        self._stopped = False
+
+    def init_app(self, app, handler, config_prefix=None):
+        """
+        handler(payload) -> dict hasil; dijalankan di dalam app context.
+        config_prefix: awalan kunci konfigurasi antrean selain antrean deteksi
+        (mis. 'PURGE_JOB' -> PURGE_JOB_ENABLED, PURGE_JOB_DB, PURGE_JOB_WORKERS, ...).
+        """
+        def setting(name, default_key, default):
+            return app.config.get(f'{config_prefix}_{name}' if config_prefix else default_key, default)
+
+        self.app = app
+        self.handler = handler
+        self.enabled = setting('ENABLED', 'JOB_QUEUE_ENABLED', self.enabled)
+        self.db_path = setting('DB', 'JOB_QUEUE_DB', self.db_path)
+        self.num_workers = int(setting('WORKERS', 'JOB_QUEUE_WORKERS', self.num_workers))
+        self.max_depth = int(setting('MAX_DEPTH', 'JOB_QUEUE_MAX_DEPTH', self.max_depth))
+        self.max_retries = int(setting('MAX_RETRIES', 'JOB_MAX_RETRIES', self.max_retries))
+        self.retry_backoff = float(setting('RETRY_BACKOFF', 'JOB_RETRY_BACKOFF', self.retry_backoff))
+        self.result_ttl = int(setting('RESULT_TTL', 'JOB_RESULT_TTL', self.result_ttl))
+        self.running_timeout = int(setting('RUNNING_TIMEOUT', 'JOB_RUNNING_TIMEOUT', self.running_timeout))
+
+    # --- Koneksi SQLite (satu per thread) ---
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT,"
+                " created_at REAL NOT NULL, updated_at REAL NOT NULL, available_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, available_at)")
+            try:
+                # Kolom progres ditambahkan belakangan; file antrean lama belum memilikinya
+                conn.execute("ALTER TABLE jobs ADD COLUMN progress TEXT")
+            except sqlite3.OperationalError:
+                pass
+            self._local.conn = conn
+        return conn
+
+    # --- Produsen ---
+    def enqueue(self, payload):
+        """Mendaftarkan job baru dan mengembalikan job id. QueueFullError jika antrean penuh."""
+        conn = self._conn()
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            depth = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (JOB_QUEUED, JOB_RUNNING)).fetchone()[0]
+            if depth >= self.max_depth:
+                raise QueueFullError()
+            conn.execute(
+                "INSERT INTO jobs (id, status, payload, created_at, updated_at, available_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, json.dumps(payload), now, now, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if self._threads:
+            # Hanya proses yang menjalankan worker (server) yang menghidupkan ulang thread yang mati;
+            # proses lain (perintah CLI) cukup mendaftarkan job untuk diambil server
+            self.start()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['progress'] = json.loads(job['progress']) if job['progress'] else None
+        return job
+
+    def set_progress(self, progress):
+        """Dipanggil dari dalam handler untuk mencatat progres job yang sedang berjalan."""
+        job_id = getattr(self._local, 'job_id', None)
+        if job_id is None:
+            return
+        # updated_at ikut diperbarui agar job yang masih maju tidak dianggap macet oleh _maintenance
+        self._conn().execute(
+            "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+            (json.dumps(progress), time.time(), job_id)
+        )
+
+    def get_progress(self):
+        """Progres terakhir job yang sedang berjalan (mis. dari percobaan sebelumnya), atau None."""
+        job_id = getattr(self._local, 'job_id', None)
+        if job_id is None:
+            return None
+        row = self._conn().execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row['progress']) if row and row['progress'] else None
+
+    # --- Konsumen ---
+    def start(self):
+        """
+        Menjalankan thread worker (sekaligus melanjutkan job tertunda dari proses sebelumnya).
+        Dipanggil hanya dari entry point server (run.py, post_fork serve.py) atau jika
+        JOB_QUEUE_START_WORKERS aktif, bukan dari init_app: perintah CLI tidak boleh mengambil job.
+        """
+        if not self.enabled or self._stopped:
+            return
+        with self._start_lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            if not self._threads:
+                self._maintenance()
+            while len(self._threads) < self.num_workers:
+                t = threading.Thread(target=self._run, name=f'{self.name}-worker', daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def stop(self, timeout=None):
+        """Menghentikan thread worker; jika timeout diisi, tunggu job yang sedang berjalan selesai."""
+        self._stopped = True
+        self._wakeup.set()
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+            for t in self._threads:
+                t.join(max(0.0, deadline - time.monotonic()))
+
+    def after_fork(self):
+        """
+        Dipanggil di proses anak setelah fork (server prefork): koneksi SQLite dan
+        thread milik proses induk tidak boleh dipakai, jadi dibuat ulang.
+        """
+        self._local = threading.local()
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._start_lock = threading.Lock()
+        self._stopped = False
+
+    def _maintenance(self):
+        """
+        Job 'running' yang terlalu lama (mis. proses mati) dikembalikan ke antrean,
+        dan job yang sudah selesai lebih lama dari JOB_RESULT_TTL dihapus.
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+            (JOB_QUEUED, now, JOB_RUNNING, now - self.running_timeout)
+        )
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (JOB_DONE, JOB_FAILED, now - self.result_ttl)
+        )
+
+    def _claim(self):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, payload, attempts FROM jobs WHERE status = ? AND available_at <= ? ORDER BY created_at LIMIT 1",
+                (JOB_QUEUED, now)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (JOB_RUNNING, now, row['id'])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def _finish(self, job_id, status, result=None, error=None, available_at=None):
+        now = time.time()
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, available_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, now, available_at or now, job_id)
+        )
+
+    def _run(self):
+        last_maintenance = time.time()
+        while not self._stopped:
+            if time.time() - last_maintenance > 60:
+                last_maintenance = time.time()
+                try:
+                    self._maintenance()
+                except sqlite3.Error as e:
+                    print(f"Job queue maintenance error: {e}")
+            try:
+                row = self._claim()
+            except sqlite3.Error as e:
+                print(f"Job queue claim error: {e}")
+                row = None
+            if row is None:
+                self._wakeup.wait(1.0)
+                self._wakeup.clear()
+                continue
+
+            attempts = row['attempts'] + 1
+            self._local.job_id = row['id']
+            try:
+                with self.app.app_context():
+                    result = self.handler(json.loads(row['payload']))
+                self._finish(row['id'], JOB_DONE, result=result)
+            except Exception as e:
+                print(f"Job {self.name} {row['id']} failed (attempt {attempts}): {e}")
+                if attempts <= self.max_retries:
+                    delay = self.retry_backoff * (2 ** (attempts - 1))
+                    self._finish(row['id'], JOB_QUEUED, error=str(e), available_at=time.time() + delay)
+                else:
+                    self._finish(row['id'], JOB_FAILED, error=str(e))
+            finally:
+                self._local.job_id = None
+
+    # --- Metrik ---
+    def stats(self):
+        if not self.db_path:
+            return {"enabled": self.enabled}
+        conn = self._conn()
+        counts = {row['status']: row['n'] for row in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+        oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = ?", (JOB_QUEUED,)).fetchone()[0]
+        return {
+            "enabled": self.enabled,
+            "queue_length": counts.get(JOB_QUEUED, 0),
+            "running": counts.get(JOB_RUNNING, 0),
+            "done": counts.get(JOB_DONE, 0),
+            "failed": counts.get(JOB_FAILED, 0),
+            "oldest_queued_age_seconds": (time.time() - oldest) if oldest else 0,
+            "max_depth": self.max_depth,
+            "workers": len([t for t in self._threads if t.is_alive()]),
+        }
+
+
+# Antrean global untuk job deteksi asinkron
+detection_jobs = DetectionJobQueue()
@@ -1,13 +1,117 @@
 # app/utils/mailer.py
-from flask import url_for
-from flask_mail import Message
+import smtplib
+import threading
+import time
+
+from datetime import datetime
+
+from flask import current_app, request, url_for
+from flask_mail import Connection, Message
 from app import mail # Impor objek mail dari __init__.py
+from .db import query_db
+from .job_queue import DetectionJobQueue, QueueFullError
+
+# Jenis payload antrean untuk email reset password (isi pesan dibuat di worker)
+MAIL_PASSWORD_RESET = 'password_reset'
+
+
+class _SMTPConnection(Connection):
+    """Connection Flask-Mail dengan timeout socket (bawaan smtplib menunggu tanpa batas)."""
+
+    def __init__(self, mail, timeout):
+        super().__init__(mail)
+        self.timeout = timeout
+
+    def configure_host(self):
+        if self.mail.use_ssl:
+            host = smtplib.SMTP_SSL(self.mail.server, self.mail.port, timeout=self.timeout)
+        else:
+            host = smtplib.SMTP(self.mail.server, self.mail.port, timeout=self.timeout)
+        host.set_debuglevel(int(self.mail.debug))
+        if self.mail.use_tls:
+            host.starttls()
+        if self.mail.username and self.mail.password:
+            host.login(self.mail.username, self.mail.password)
+        return host
+
+
+class SMTPSender:
+    """
+    Mengirim email lewat koneksi SMTP yang dipakai ulang antar pengiriman (satu per
+    thread worker antrean), sehingga handshake TCP + STARTTLS + AUTH tidak diulang
+    untuk setiap email. Koneksi yang menganggur lebih lama dari idle_timeout ditutup
+    dan dibuka ulang; koneksi yang diputus server dibuka ulang satu kali lalu dikirim ulang.
+    """
+
+    def __init__(self, timeout=30, idle_timeout=60):
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.sent = 0
+
+    def init_app(self, app):
+        self.timeout = float(app.config.get('MAIL_SMTP_TIMEOUT', self.timeout))
+        self.idle_timeout = float(app.config.get('MAIL_SMTP_IDLE_TIMEOUT', self.idle_timeout))
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and time.monotonic() - self._local.last_used > self.idle_timeout:
+            self.close()
+            conn = None
+        if conn is None:
+            conn = _SMTPConnection(current_app.extensions['mail'], self.timeout).__enter__()
+            self._local.conn = conn
+            self._local.last_used = time.monotonic()
+            with self._lock:
+                self.connects += 1
+        return conn
+
+    def send(self, msg):
+        try:
+            self._connection().send(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # Server menutup koneksi yang dipakai ulang: buka koneksi baru dan coba sekali lagi
+            self.close()
+            self._connection().send(msg)
+        self._local.last_used = time.monotonic()
+        with self._lock:
+            self.sent += 1
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None and conn.host is not None:
+            try:
+                conn.host.quit()
+            except (smtplib.SMTPException, OSError):
+                conn.host.close()
+
+    def stats(self):
+        return {"connects": self.connects, "sent": self.sent}
+
 
-def send_reset_email(user, token):
-    reset_url = url_for('auth.reset_password_token', token=token, _external=True)
-    msg_title = "Reset Password Akun Anda"
-    msg_body = (
-        f"Halo {user['display_name']},\n\n"
+def build_reset_message(payload):
+    """
+    Membuat email reset password dari token_id + user_id. Link reset hanya disusun
+    di sini, jadi tidak pernah tersimpan di antrean. Mengembalikan None jika token
+    sudah dipakai, diganti, atau kedaluwarsa. Melempar ConnectionError jika database gagal.
+    """
+    rows = query_db(
+        "SELECT t.token, t.expires_at, u.display_name, u.email FROM password_reset_tokens t "
+        "JOIN users u ON u.id = t.user_id WHERE t.id = %s AND t.user_id = %s",
+        (payload['token_id'], payload['user_id'])
+    )
+    if rows is None:
+        raise ConnectionError("Database connection failed")
+    if not rows or datetime.utcnow() > rows[0]['expires_at']:
+        return None
+    row = rows[0]
+    with current_app.test_request_context(base_url=payload['base_url']):
+        reset_url = url_for('auth.reset_password_token', token=row['token'], _external=True)
+    body = (
+        f"Halo {row['display_name']},\n\n"
         "Seseorang (semoga Anda) telah meminta untuk mereset password akun Anda.\n"
         "Silakan klik link di bawah ini untuk melanjutkan:\n"
         f"{reset_url}\n\n"
@@ -15,11 +119,93 @@ def send_reset_email(user, token):
         "Jika Anda tidak merasa meminta ini, abaikan saja email ini.\n\n"
         "Terima kasih."
     )
-    msg = Message(subject=msg_title, recipients=[user['email']], body=msg_body)
+    return Message(subject="Reset Password Akun Anda", recipients=[row['email']], body=body)
+
+
+def build_message(payload):
+    """Message dari payload antrean, atau None jika email tidak perlu dikirim lagi."""
+    if payload.get('kind') == MAIL_PASSWORD_RESET:
+        return build_reset_message(payload)
+    return Message(subject=payload['subject'], recipients=payload['recipients'], body=payload['body'])
+
+
+def send_mail_job(payload):
+    """
+    Handler antrean email. Error sementara (koneksi, 4xx) dilempar agar job diulang
+    dengan backoff; penolakan permanen (5xx) dicatat tanpa diulang. Koneksi SMTP
+    thread ini ditutup setiap kali pengiriman gagal, sehingga percobaan berikutnya
+    tidak memakai sesi yang statusnya tidak jelas.
+    """
+    msg = build_message(payload)
+    if msg is None:
+        print("Email reset password tidak dikirim: token sudah tidak berlaku.")
+        return {"sent": False, "error": "reset token no longer valid"}
+    try:
+        smtp_sender.send(msg)
+    except smtplib.SMTPRecipientsRefused as e:
+        print(f"Email ke {', '.join(msg.recipients)} ditolak server: {e}")
+        return {"sent": False, "error": "recipients refused"}
+    except smtplib.SMTPResponseException as e:
+        smtp_sender.close()
+        if e.smtp_code < 500 or isinstance(e, smtplib.SMTPAuthenticationError):
+            # Kredensial salah bisa diperbaiki tanpa kehilangan email yang sudah diantrekan
+            raise
+        print(f"Email ke {', '.join(msg.recipients)} ditolak server ({e.smtp_code}): {e.smtp_error!r}")
+        return {"sent": False, "error": f"smtp {e.smtp_code}"}
+    except (smtplib.SMTPException, OSError):
+        smtp_sender.close()
+        raise
+    print(f"Email '{msg.subject}' berhasil dikirim ke {', '.join(msg.recipients)}")
+    return {"sent": True}
+
+
+def _queue_payload(payload, recipients):
+    """
+    Mendaftarkan payload ke antrean durable dan langsung kembali. Jika antrean
+    dinonaktifkan, email dikirim sinkron. Mengembalikan False jika gagal.
+    """
+    if not mail_jobs.enabled:
+        try:
+            msg = build_message(payload)
+            if msg is None:
+                return False
+            mail.send(msg)
+            return True
+        except Exception as e:
+            print(f"Gagal mengirim email ke {recipients}: {e}")
+            return False
     try:
-        mail.send(msg)
-        print(f"Email reset password berhasil dikirim ke {user['email']}")
+        mail_jobs.enqueue(payload)
         return True
+    except QueueFullError:
+        print(f"Antrean email penuh; email ke {recipients} tidak dikirim.")
     except Exception as e:
-        print(f"Gagal mengirim email ke {user['email']}: {e}")
-        return False
\ No newline at end of file
+        print(f"Gagal mendaftarkan email ke {recipients}: {e}")
+    return False
+
+
+def queue_mail(subject, recipients, body):
+    """Mengantrekan email biasa (isi pesan disimpan di antrean). Mengembalikan False jika gagal."""
+    payload = {"subject": subject, "recipients": recipients, "body": body}
+    return _queue_payload(payload, ', '.join(recipients))
+
+
+def send_reset_email(user, token_id):
+    """
+    Mengantrekan email reset password. Antrean hanya menyimpan token_id, user_id, dan
+    base URL situs; token dan link reset dibaca dari database oleh worker. Butuh request context.
+    """
+    payload = {"kind": MAIL_PASSWORD_RESET, "token_id": token_id, "user_id": user['id'],
+               "base_url": request.url_root}
+    return _queue_payload(payload, user['email'])
+
+
+# Pengirim SMTP dan antrean email global
+smtp_sender = SMTPSender()
+mail_jobs = DetectionJobQueue(num_workers=1, max_depth=10000, max_retries=6, retry_backoff=30.0,
+                              running_timeout=300, result_ttl=3600, name='mail-job')
+
+
+def init_app(app):
+    smtp_sender.init_app(app)
+    mail_jobs.init_app(app, send_mail_job, config_prefix='MAIL_QUEUE')
@@ -0,0 +1,172 @@
+# app/utils/metrics.py
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Batas bucket histogram latensi (detik)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class _Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, num_buckets):
+        self.counts = [0] * (num_buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """
+    Registry metrik ringan (counter dan histogram) dengan format ekspor Prometheus.
+    Setiap observasi hanya berupa bisect + beberapa penjumlahan di bawah satu lock,
+    sehingga cukup murah untuk selalu aktif di produksi.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._collectors = {}
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(len(self.buckets))
+            hist.counts[index] += 1
+            hist.sum += seconds
+            hist.count += 1
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Mengukur durasi blok kode ke histogram `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def register_collector(self, key, fn):
+        """
+        fn() -> daftar (nama, dict_label, nilai) yang diekspor sebagai gauge, atau
+        (nama, dict_label, nilai, 'counter') untuk nilai yang hanya bertambah
+        (nama sebaiknya berakhiran _total). Kunci yang sama menimpa.
+        """
+        self._collectors[key] = fn
+
+    def render(self):
+        """Menghasilkan teks dalam format eksposisi Prometheus."""
+        with self._lock:
+            histograms = {k: (list(v.counts), v.sum, v.count) for k, v in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter')
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), (counts, total, count) in sorted(histograms.items()):
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for collector in list(self._collectors.values()):
+            try:
+                samples = collector()
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+                continue
+            for name, labels, value, *kind in samples:
+                if value is None:
+                    continue
+                header(name, kind[0] if kind else 'gauge')
+                lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {float(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_IN_LIST_RE = re.compile(r'\((\s*%s\s*,)+\s*%s\s*\)')
+
+
+@lru_cache(maxsize=1024)
+def normalize_statement(query, max_length=160):
+    """Meringkas teks SQL menjadi label berkardinalitas rendah (IN (%s, %s, ...) -> IN (...))."""
+    statement = _WHITESPACE_RE.sub(' ', query).strip()
+    statement = _IN_LIST_RE.sub('(...)', statement)
+    return statement[:max_length]
+
+
+def init_app(app):
+    """Mencatat latensi dan jumlah request per rute untuk setiap request."""
+    from flask import request, g
+
+    metrics.enabled = app.config.get('METRICS_ENABLED', True)
+
+    @app.before_request
+    def _start_request_timer():
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('_request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.observe('http_request_duration_seconds', time.perf_counter() - started,
+                            route=route, method=request.method)
+            metrics.inc('http_requests_total', route=route, method=request.method, status=response.status_code)
+        return response
+
+
+# Registry global aplikasi
+metrics = MetricsRegistry()
+metrics.describe('http_request_duration_seconds', 'Latensi request HTTP per rute.')
+metrics.describe('http_requests_total', 'Jumlah request HTTP per rute dan status.')
+metrics.describe('stage_duration_seconds', 'Latensi tiap tahap pemrosesan unggahan.')
+metrics.describe('db_query_duration_seconds', 'Latensi query database per statement.')
+metrics.describe('db_query_errors_total', 'Jumlah query database yang gagal per statement.')
@@ -0,0 +1,101 @@
+# app/utils/migrations.py
+import os
+
+import mysql.connector
+
+# Folder berisi file NNNN_nama.sql, dijalankan berurutan berdasarkan nama file
+MIGRATIONS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'migrations'))
+
+# Error yang berarti perubahan sudah ada (mis. indeks dibuat manual sebelumnya)
+_ALREADY_APPLIED_ERRNOS = {
+    1050,  # ER_TABLE_EXISTS_ERROR
+    1060,  # ER_DUP_FIELDNAME
+    1061,  # ER_DUP_KEYNAME
+    1091,  # ER_CANT_DROP_FIELD_OR_KEY
+}
+
+
+def _split_statements(sql):
+    """Memecah isi file SQL menjadi statement (dipisah ';' di akhir baris, komentar '--' diabaikan)."""
+    statements, current = [], []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('--'):
+            continue
+        current.append(line)
+        if stripped.endswith(';'):
+            statements.append('\n'.join(current).rstrip().rstrip(';'))
+            current = []
+    if current:
+        statements.append('\n'.join(current))
+    return statements
+
+
+def list_migrations(directory=MIGRATIONS_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[:-4] for name in os.listdir(directory) if name.endswith('.sql'))
+
+
+def applied_migrations(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version VARCHAR(255) NOT NULL PRIMARY KEY,"
+            " applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        )
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def apply_migrations(conn, directory=MIGRATIONS_DIR, progress=print):
+    """Menjalankan migrasi yang belum tercatat di schema_migrations. Mengembalikan daftar versi yang dijalankan."""
+    done = applied_migrations(conn)
+    applied = []
+    for version in list_migrations(directory):
+        if version in done:
+            continue
+        with open(os.path.join(directory, version + '.sql')) as f:
+            statements = _split_statements(f.read())
+        cursor = conn.cursor()
+        try:
+            for statement in statements:
+                try:
+                    cursor.execute(statement)
+                except mysql.connector.Error as err:
+                    if err.errno not in _ALREADY_APPLIED_ERRNOS:
+                        raise
+                    progress(f"  {version}: dilewati ({err.msg})")
+            cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+            conn.commit()
+        finally:
+            cursor.close()
+        progress(f"Applied {version}")
+        applied.append(version)
+    return applied
+
+
+def explain(conn, query, params=()):
+    """Menjalankan EXPLAIN dan mengembalikan baris rencana sebagai dict."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("EXPLAIN " + query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def plan_problems(plan):
+    """Daftar masalah pada rencana EXPLAIN: full table scan atau filesort pada tabel deteksi."""
+    problems = []
+    for row in plan:
+        table = row.get('table') or ''
+        extra = row.get('Extra') or ''
+        if row.get('type') == 'ALL':
+            problems.append(f"{table}: full table scan")
+        if 'Using filesort' in extra:
+            problems.append(f"{table}: filesort")
+    return problems
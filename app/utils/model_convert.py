@@ -0,0 +1,112 @@
+# app/utils/model_convert.py
+import os
+import time
+
+import cv2
+import numpy as np
+
+from .inference_backends import artifact_path, create_backend
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def convert_tflite(model_path, quantization):
+    """
+    Mengonversi model Keras ke TFLite.
+    quantization: 'fp16' (bobot float16) atau 'int8' (dynamic-range int8).
+    """
+    import tensorflow as tf
+    from .model_provider import load_keras_model
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(load_keras_model(model_path))
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'fp16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization != 'int8':
+        raise ValueError(f"Unknown quantization: {quantization}")
+
+    out_path = artifact_path(model_path, f"tflite_{quantization}")
+    with open(out_path, 'wb') as f:
+        f.write(converter.convert())
+    return out_path
+
+
+def convert_onnx(model_path, opset=13):
+    """Mengonversi model Keras ke ONNX memakai tf2onnx."""
+    import tensorflow as tf
+    import tf2onnx
+    from .model_provider import load_keras_model
+
+    model = load_keras_model(model_path)
+    spec = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name='input'),)
+    out_path = artifact_path(model_path, 'onnx')
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=out_path)
+    return out_path
+
+
+def iter_sample_images(folder, limit=None):
+    """Menghasilkan path gambar di dalam folder (tidak rekursif)."""
+    count = 0
+    for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+        if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            yield entry.path
+            count += 1
+            if limit and count >= limit:
+                return
+
+
+def _timed_predict(backend, batch):
+    started = time.perf_counter()
+    predictions = backend.predict(batch)
+    return predictions, time.perf_counter() - started
+
+
+def check_parity(model_path, backend_name, sample_folder, tolerance=0.02, limit=None, num_threads=None):
+    """
+    Membandingkan backend kandidat dengan backend Keras pada folder contoh.
+    Label (argmax) harus sama dan selisih confidence tidak boleh melebihi tolerance.
+    Mengembalikan dict ringkasan beserta daftar gambar yang tidak cocok.
+    """
+    from .prediction import preprocess_image, readable_labels
+
+    reference = create_backend('keras', model_path, num_threads=num_threads)
+    candidate = create_backend(backend_name, model_path, num_threads=num_threads)
+
+    mismatches = []
+    checked = 0
+    max_diff = 0.0
+    ref_seconds = 0.0
+    cand_seconds = 0.0
+    for path in iter_sample_images(sample_folder, limit):
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        batch = np.expand_dims(preprocess_image(image), axis=0)
+        ref_pred, ref_t = _timed_predict(reference, batch)
+        cand_pred, cand_t = _timed_predict(candidate, batch)
+        ref_seconds += ref_t
+        cand_seconds += cand_t
+        checked += 1
+
+        ref_idx = int(np.argmax(ref_pred[0]))
+        cand_idx = int(np.argmax(cand_pred[0]))
+        diff = abs(float(ref_pred[0][ref_idx]) - float(cand_pred[0][ref_idx]))
+        max_diff = max(max_diff, diff)
+        if ref_idx != cand_idx or diff > tolerance:
+            mismatches.append({
+                "image": os.path.basename(path),
+                "reference_label": readable_labels[ref_idx],
+                "candidate_label": readable_labels[cand_idx],
+                "confidence_diff": diff,
+            })
+
+    return {
+        "backend": backend_name,
+        "checked": checked,
+        "mismatches": mismatches,
+        "max_confidence_diff": max_diff,
+        "tolerance": tolerance,
+        "reference_ms_per_image": (ref_seconds / checked * 1000) if checked else None,
+        "candidate_ms_per_image": (cand_seconds / checked * 1000) if checked else None,
+        "passed": checked > 0 and not mismatches,
+    }
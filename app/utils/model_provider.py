@@ -0,0 +1,178 @@
+# app/utils/model_provider.py
+import threading
+import time
+
+import numpy as np
+
+from .prediction_cache import file_digest
+
+# Status kesiapan model
+STATE_NOT_LOADED = 'not_loaded'
+STATE_LOADING = 'loading'
+STATE_WARMING_UP = 'warming_up'
+STATE_READY = 'ready'
+STATE_FAILED = 'failed'
+
+
+def load_keras_model(model_path):
+    """Memuat model Keras. TensorFlow baru diimpor di sini, bukan saat modul diimpor."""
+    from tensorflow.keras.models import load_model
+    return load_model(model_path)
+
+
+class ModelProvider:
+    """
+    Memuat model secara lazy (saat pertama dipakai) atau di background thread,
+    menjalankan batch warmup, dan menyediakan status kesiapan untuk health check.
+    """
+
+    def __init__(self, model_path, loader=load_keras_model, input_shape=(224, 224, 3)):
+        self.model_path = model_path
+        self.artifact_path = None  # File yang dimuat backend (default: model_path)
+        self.model_id = None       # Digest artefak yang dimuat, diambil saat pemuatan
+        self.on_loaded = None      # on_loaded(model_id) setelah model berhasil dimuat
+        self.loader = loader
+        self.backend_name = None
+        self.input_shape = input_shape
+        self.warmup_batch_size = 1
+        self.predict_fn = None
+        self.retry_backoff = 5.0
+        self.retry_backoff_max = 300.0
+
+        self._model = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self.state = STATE_NOT_LOADED
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.failures = 0
+        self._retry_at = None
+
+    def init_app(self, app, predict_fn):
+        """
+        Membaca konfigurasi model. predict_fn(model, batch) dipakai untuk warmup.
+        Jika MODEL_PRELOAD aktif, model dimuat di background thread (kecuali di server prefork).
+        """
+        self.model_path = app.config.get('MODEL_PATH', self.model_path)
+        self.warmup_batch_size = max(0, int(app.config.get('MODEL_WARMUP_BATCH_SIZE', self.warmup_batch_size)))
+        self.predict_fn = predict_fn
+        self.retry_backoff = float(app.config.get('MODEL_LOAD_RETRY_BACKOFF', self.retry_backoff))
+        self.retry_backoff_max = float(app.config.get('MODEL_LOAD_RETRY_BACKOFF_MAX', self.retry_backoff_max))
+        # Server prefork (serve.py) memuat model sendiri; thread tidak boleh berjalan sebelum fork
+        if app.config.get('MODEL_PRELOAD', False) and not app.config.get('SERVER_PREFORK', False):
+            self.preload()
+
+    def preload(self):
+        """Memulai pemuatan model di background thread (tidak memblokir)."""
+        with self._lock:
+            if self.state != STATE_NOT_LOADED or self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.get, name='model-preload', daemon=True)
+            self._thread.start()
+
+    def load(self, warmup=True):
+        """
+        Memuat model secara sinkron. warmup=False dipakai proses master server prefork:
+        bobot dimuat sebelum fork (dibagi copy-on-write), warmup dijalankan tiap worker.
+        """
+        with self._lock:
+            if self.state == STATE_NOT_LOADED:
+                self._load_locked(warmup=warmup)
+            return self._model
+
+    def warmup(self):
+        """Menjalankan warmup untuk model yang sudah dimuat (mis. di worker setelah fork)."""
+        with self._lock:
+            if self._model is not None:
+                self._warmup_locked()
+
+    def join_preload(self, timeout=None):
+        """Menunggu thread preload selesai (berhasil maupun gagal)."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def get(self):
+        """
+        Mengembalikan model, memuatnya terlebih dahulu jika belum. None jika gagal;
+        pemuatan yang gagal dicoba lagi setelah jeda backoff berlalu.
+        """
+        if self._ready.is_set():
+            return self._model
+        with self._lock:
+            if self.state == STATE_READY:
+                return self._model
+            if self.state == STATE_FAILED and time.monotonic() < self._retry_at:
+                return None
+            self._load_locked()
+            return self._model
+
+    def _load_locked(self, warmup=True):
+        self.state = STATE_LOADING
+        started = time.perf_counter()
+        try:
+            # Digest dihitung dari file yang akan dimuat, bukan dibaca ulang dari disk belakangan
+            model_id = file_digest(self.artifact_path or self.model_path)
+        except OSError as e:
+            print(f"Model digest error: {e}")
+            model_id = None
+        try:
+            self._model = self.loader(self.model_path)
+            self.load_seconds = time.perf_counter() - started
+            print(f"Model loaded successfully in {self.load_seconds:.2f}s.")
+            self.model_id = model_id
+            if self.on_loaded is not None:
+                self.on_loaded(model_id)
+        except Exception as e:
+            print(f"Error loading model: {e}")
+            self._model = None
+            self.error = str(e)
+            self.failures += 1
+            backoff = min(self.retry_backoff_max, self.retry_backoff * 2 ** (self.failures - 1))
+            self._retry_at = time.monotonic() + backoff
+            self.state = STATE_FAILED
+            return
+
+        self.failures = 0
+        self.error = None
+
+        if warmup:
+            self.state = STATE_WARMING_UP
+            self._warmup_locked()
+        self.state = STATE_READY
+        self._ready.set()
+
+    def _warmup_locked(self):
+        """Menjalankan prediksi dummy agar graph sudah ter-trace sebelum request pertama."""
+        if not self.warmup_batch_size or self.predict_fn is None:
+            return
+        started = time.perf_counter()
+        try:
+            for size in sorted({1, self.warmup_batch_size}):
+                self.predict_fn(self._model, np.zeros((size,) + tuple(self.input_shape), dtype=np.float32))
+            self.warmup_seconds = time.perf_counter() - started
+        except Exception as e:
+            # Warmup gagal tidak fatal; model tetap dipakai
+            print(f"Model warmup error: {e}")
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def status(self):
+        return {
+            "state": self.state,
+            "ready": self.is_ready(),
+            "model_path": self.model_path,
+            "backend": self.backend_name,
+            "model_id": self.model_id,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.error,
+            "failures": self.failures,
+            "retry_in_seconds": (max(0.0, round(self._retry_at - time.monotonic(), 1))
+                                 if self.state == STATE_FAILED else None),
+        }
@@ -1,47 +1,202 @@
 # app/utils/prediction.py
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.image import img_to_array
+from functools import partial
+
 import numpy as np
 import cv2
 
-try:
-    model = load_model("model_Tes2.h5")
-    print("Model loaded successfully.")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
+from .batching import BatchScheduler
+from .inference_backends import artifact_path, create_backend
+from .metrics import metrics
+from .model_provider import ModelProvider
+from .prediction_cache import PredictionCache
+
+MODEL_PATH = "model_Tes2.h5"
+
+# Model dimuat secara lazy lewat backend inferensi (default Keras);
+# TensorFlow tidak diimpor saat modul ini diimpor
+model_provider = ModelProvider(MODEL_PATH, loader=partial(create_backend, 'keras'))
 
 # Informasi Class
 class_names = ['Tomato___Tomato_Yellow_Leaf_Curl_Virus', 'Tomato___healthy']
 readable_labels = ['Infected (TYLCV)', 'Healthy']
 colors = ['red', 'green']
 
-def predict_image(image_path):
-    if model is None:
+IMAGE_SIZE = (224, 224)
+
+
+def preprocess_image(image):
+    """Mengubah gambar BGR hasil cv2 menjadi tensor ternormalisasi (224, 224, 3)."""
+    with metrics.span('stage_duration_seconds', stage='preprocess'):
+        image_resized = cv2.resize(image, IMAGE_SIZE)
+        return image_resized.astype(np.float32) / 255.0
+
+
+def _run_model(backend, batch):
+    return np.asarray(backend.predict(batch))
+
+
+def predict_batch(batch):
+    """Menjalankan model pada satu batch tensor berbentuk (N, 224, 224, 3)."""
+    with metrics.span('stage_duration_seconds', stage='inference'):
+        return _run_model(model_provider.get(), batch)
+
+
+# Scheduler yang menggabungkan permintaan bersamaan menjadi satu batch
+batcher = BatchScheduler(predict_batch)
+
+# Cache hasil prediksi berdasarkan isi gambar (invalidasi saat model lain dimuat)
+prediction_cache = PredictionCache()
+model_provider.on_loaded = prediction_cache.bind_model
+
+
+def _create_pool_client(config):
+    from .inference_pool import InferencePoolClient, pool_settings
+    address, authkey = pool_settings(config)
+    return InferencePoolClient(
+        address,
+        authkey,
+        num_slots=int(config.get('INFERENCE_POOL_SLOTS', 4)),
+        max_batch_size=int(config.get('INFERENCE_MAX_BATCH_SIZE', 16))
+    )
+
+
+def init_app(app):
+    """Menerapkan konfigurasi inferensi dari aplikasi Flask."""
+    backend_name = app.config.get('INFERENCE_BACKEND', 'keras')
+    if app.config.get('INFERENCE_POOL_ADDRESS'):
+        # Model dimiliki oleh pool proses inferensi terpisah; proses web hanya menjadi klien.
+        # Alamat dan authkey divalidasi saat startup, bukan saat model pertama kali dipakai.
+        from .inference_pool import pool_settings
+        pool_settings(app.config)
+        model_provider.backend_name = f"pool:{backend_name}"
+        model_provider.loader = lambda _path: _create_pool_client(app.config)
+    else:
+        model_provider.backend_name = backend_name
+        model_provider.loader = partial(create_backend, backend_name, num_threads=app.config.get('INFERENCE_NUM_THREADS'))
+    # Identitas cache mengikuti artefak yang benar-benar dimuat backend
+    model_provider.artifact_path = artifact_path(app.config.get('MODEL_PATH', model_provider.model_path), backend_name)
+    prediction_cache.init_app(app)
+    model_provider.init_app(app, _run_model)
+    batcher.init_app(app)
+
+
+def format_prediction(predictions):
+    """Mengubah satu baris output model menjadi dict hasil untuk API."""
+    predicted_index = int(np.argmax(predictions))
+    confidence = float(predictions[predicted_index])
+    return {
+        "label": readable_labels[predicted_index],
+        "color": colors[predicted_index],
+        "confidence": confidence
+    }
+
+
+def decode_image_bytes(image_bytes):
+    """
+    Mendekode gambar langsung dari memori tanpa menulis ke disk.
+    np.frombuffer membungkus buffer yang ada tanpa menyalinnya.
+    """
+    buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    with metrics.span('stage_duration_seconds', stage='decode'):
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def _predict_decoded(image):
+    """Menjalankan prediksi pada gambar BGR yang sudah didekode."""
+    if model_provider.get() is None:
         return {"label": "Model not loaded.", "color": "black", "confidence": 0}
     try:
-        image = cv2.imread(image_path)
         if image is None:
             return {"label": "Invalid image file.", "color": "black", "confidence": 0}
 
-        image_resized = cv2.resize(image, (224, 224))
-        image_array = img_to_array(image_resized)
-        image_array_expanded = np.expand_dims(image_array, axis=0)
-        image_normalized = image_array_expanded / 255.0
+        image_normalized = preprocess_image(image)
 
-        predictions = model.predict(image_normalized)[0]
-        predicted_index = np.argmax(predictions)
-        confidence = float(predictions[predicted_index])
+        if batcher.enabled:
+            predictions = batcher.submit(image_normalized)
+        else:
+            predictions = predict_batch(np.expand_dims(image_normalized, axis=0))[0]
 
-        predicted_label_str = readable_labels[predicted_index]
-        predicted_color = colors[predicted_index]
-
-        return {
-            "label": predicted_label_str,
-            "color": predicted_color,
-            "confidence": confidence
-        }
+        return format_prediction(predictions)
     except Exception as e:
         print("Prediction error:", str(e))
-        return {"label": "Prediction failed.", "color": "black", "confidence": 0}
\ No newline at end of file
+        return {"label": "Prediction failed.", "color": "black", "confidence": 0}
+
+
+def predict_image(image_path):
+    if model_provider.get() is None:
+        return {"label": "Model not loaded.", "color": "black", "confidence": 0}
+    with metrics.span('stage_duration_seconds', stage='decode'):
+        image = cv2.imread(image_path)
+    return _predict_decoded(image)
+
+
+def predict_image_bytes(image_bytes):
+    """
+    Prediksi dari isi file di memori (tanpa file.save + cv2.imread).
+    Hasil diambil dari cache jika gambar yang sama pernah diprediksi;
+    hanya prediksi yang berhasil yang disimpan ke cache.
+    """
+    # Model dimuat lebih dulu: kunci cache memuat digest model, jadi request selama
+    # lazy load juga dicari dan dihitung sebagai hit/miss
+    if model_provider.get() is None:
+        return {"label": "Model not loaded.", "color": "black", "confidence": 0}
+    with metrics.span('stage_duration_seconds', stage='cache_lookup'):
+        cache_key = prediction_cache.make_key(image_bytes)
+        result = prediction_cache.get(cache_key)
+    if result is not None:
+        return result
+
+    try:
+        image = decode_image_bytes(image_bytes)
+    except Exception as e:
+        print("Image decode error:", str(e))
+        image = None
+    result = _predict_decoded(image)
+    if result.get('color') != 'black':
+        prediction_cache.set(cache_key, result)
+    return result
+
+
+def predict_images_bytes(images_bytes):
+    """
+    Prediksi banyak gambar sekaligus. Gambar yang ada di cache dilewati,
+    sisanya didekode lalu diprediksi dalam satu panggilan predict_batch.
+    Mengembalikan daftar hasil dengan urutan yang sama dengan input.
+    """
+    results = [None] * len(images_bytes)
+    if model_provider.get() is None:
+        return [{"label": "Model not loaded.", "color": "black", "confidence": 0} for _ in images_bytes]
+    cache_keys = [prediction_cache.make_key(data) for data in images_bytes]
+    pending_indices = []
+    pending_tensors = []
+
+    for i, data in enumerate(images_bytes):
+        cached = prediction_cache.get(cache_keys[i])
+        if cached is not None:
+            results[i] = cached
+            continue
+        try:
+            image = decode_image_bytes(data)
+        except Exception as e:
+            print("Image decode error:", str(e))
+            image = None
+        if image is None:
+            results[i] = {"label": "Invalid image file.", "color": "black", "confidence": 0}
+            continue
+        pending_indices.append(i)
+        pending_tensors.append(preprocess_image(image))
+
+    if pending_indices:
+        try:
+            predictions = predict_batch(np.stack(pending_tensors))
+            for i, row in zip(pending_indices, predictions):
+                results[i] = format_prediction(row)
+                prediction_cache.set(cache_keys[i], results[i])
+        except Exception as e:
+            print("Prediction error:", str(e))
+            for i in pending_indices:
+                results[i] = {"label": "Prediction failed.", "color": "black", "confidence": 0}
+
+    return results
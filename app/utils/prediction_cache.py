@@ -0,0 +1,165 @@
+# app/utils/prediction_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Menghitung SHA-256 dari isi file secara bertahap."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class PredictionCache:
+    """
+    Cache hasil prediksi berdasarkan digest isi gambar + identitas model.
+    Lapisan pertama adalah LRU di memori (terbatas), lapisan kedua adalah
+    SQLite di disk agar hasil tetap ada setelah restart. Identitas model adalah
+    digest artefak yang benar-benar dimuat (diset lewat bind_model saat model
+    dimuat); entri dari model lain dibuang saat identitas berubah.
+    """
+
+    def __init__(self, db_path=None, capacity=1024, enabled=True):
+        self.db_path = db_path
+        self.capacity = capacity
+        self.enabled = enabled
+
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._model_id = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        """Membaca konfigurasi cache dari app.config."""
+        self.enabled = app.config.get('PREDICTION_CACHE_ENABLED', self.enabled)
+        self.capacity = max(1, int(app.config.get('PREDICTION_CACHE_SIZE', self.capacity)))
+        self.db_path = app.config.get('PREDICTION_CACHE_DB', self.db_path)
+
+    # --- Identitas model ---
+    def bind_model(self, model_id):
+        """
+        Dipanggil setelah model dimuat dengan digest artefak yang dimuat. File model
+        yang diganti di disk tidak mengubah identitas sampai model benar-benar dimuat ulang.
+        """
+        with self._lock:
+            if model_id is not None and model_id != self._model_id:
+                # Saat pertama kali diset, entri dari model lama di disk juga dibuang
+                self._invalidate_locked(model_id, count=self._model_id is not None)
+            self._model_id = model_id
+
+    def model_id(self):
+        """Digest artefak model yang sedang dipakai, atau None jika model belum dimuat."""
+        return self._model_id
+
+    def make_key(self, image_bytes):
+        """Membuat kunci cache dari isi gambar dan identitas model saat ini."""
+        model_id = self.model_id()
+        if model_id is None:
+            return None
+        return f"{model_id[:16]}:{hashlib.sha256(image_bytes).hexdigest()}"
+
+    # --- Penyimpanan di disk ---
+    def _get_conn(self):
+        if self._conn is None and self.db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                " cache_key TEXT PRIMARY KEY, model_id TEXT NOT NULL, result TEXT NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _invalidate_locked(self, current_model_id, count=True):
+        self._lru.clear()
+        if count:
+            self.invalidations += 1
+        try:
+            conn = self._get_conn()
+            if conn is not None:
+                conn.execute("DELETE FROM predictions WHERE model_id != ?", (current_model_id[:16],))
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Prediction cache invalidation error: {e}")
+
+    # --- API utama ---
+    def get(self, key):
+        if not self.enabled or key is None:
+            return None
+        with self._lock:
+            result = self._lru.get(key)
+            if result is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return dict(result)
+
+            try:
+                conn = self._get_conn()
+                row = conn.execute("SELECT result FROM predictions WHERE cache_key = ?", (key,)).fetchone() if conn else None
+            except sqlite3.Error as e:
+                print(f"Prediction cache read error: {e}")
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+
+            result = json.loads(row[0])
+            self._put_lru_locked(key, result)
+            self.hits += 1
+            self.disk_hits += 1
+            return dict(result)
+
+    def set(self, key, result):
+        if not self.enabled or key is None:
+            return
+        with self._lock:
+            self._put_lru_locked(key, dict(result))
+            try:
+                conn = self._get_conn()
+                if conn is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO predictions (cache_key, model_id, result) VALUES (?, ?, ?)",
+                        (key, key.split(':', 1)[0], json.dumps(result))
+                    )
+                    conn.commit()
+            except sqlite3.Error as e:
+                print(f"Prediction cache write error: {e}")
+
+    def _put_lru_locked(self, key, result):
+        self._lru[key] = result
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            conn = self._get_conn()
+            if conn is not None:
+                conn.execute("DELETE FROM predictions")
+                conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._lru),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0,
+            "invalidations": self.invalidations,
+            "model_id": self._model_id,
+        }
@@ -0,0 +1,338 @@
+# app/utils/prefork.py
+import gc
+import json
+import os
+import random
+import signal
+import socket
+import threading
+import time
+
+from werkzeug.serving import make_server
+from werkzeug.wsgi import ClosingIterator
+
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def worker_threads(num_workers, cpus=None):
+    """Jumlah thread intra-op per worker agar total thread inferensi semua worker ~ jumlah CPU."""
+    return max(1, (cpus or available_cpus()) // max(1, num_workers))
+
+
+def process_memory(pid=None):
+    """
+    Pemakaian memori proses (MB) dari /proc: rss, pss (halaman bersama dibagi rata
+    antarproses), shared, dan private. Bobot model yang masih dibagi copy-on-write
+    dengan master terhitung di shared, bukan private. None jika tidak tersedia.
+    """
+    pid = pid or os.getpid()
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        # Kernel lama tanpa smaps_rollup: hanya RSS
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        fields['Rss'] = int(line.split()[1])
+        except OSError:
+            return None
+
+    def mb(*keys):
+        return round(sum(fields.get(key, 0) for key in keys) / 1024.0, 1)
+
+    detailed = 'Pss' in fields
+    return {
+        "rss_mb": mb('Rss'),
+        "pss_mb": mb('Pss') if detailed else None,
+        "shared_mb": mb('Shared_Clean', 'Shared_Dirty') if detailed else None,
+        "private_mb": mb('Private_Clean', 'Private_Dirty') if detailed else None,
+    }
+
+
+def read_status(path):
+    """Status server prefork (ditulis master) beserta memori terkini tiap proses, atau None."""
+    try:
+        with open(path) as f:
+            status = json.load(f)
+    except (OSError, ValueError):
+        return None
+    status['master']['memory'] = process_memory(status['master']['pid'])
+    for worker in status['workers']:
+        worker['memory'] = process_memory(worker['pid'])
+    return status
+
+
+class _WorkerApp:
+    """
+    Middleware WSGI di setiap worker: menghitung request selesai dan yang sedang
+    berjalan (termasuk response streaming), lalu meminta daur ulang worker saat
+    batas request atau batas memori tercapai.
+    """
+
+    def __init__(self, app, max_requests, max_memory_mb, on_limit, memory_check_every=20):
+        self.app = app
+        self.max_requests = max_requests
+        self.max_memory_mb = max_memory_mb
+        self.on_limit = on_limit
+        self.memory_check_every = memory_check_every
+        self.requests = 0
+        self.inflight = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.inflight += 1
+        try:
+            return ClosingIterator(self.app(environ, start_response), self._finished)
+        except BaseException:
+            self._finished()
+            raise
+
+    def _finished(self):
+        with self._lock:
+            self.inflight -= 1
+            self.requests += 1
+            requests = self.requests
+            self._idle.notify_all()
+        if self.max_requests and requests >= self.max_requests:
+            self.on_limit(f"max requests ({requests})")
+        elif self.max_memory_mb and requests % self.memory_check_every == 0:
+            memory = process_memory()
+            used = memory and (memory['private_mb'] if memory['private_mb'] is not None else memory['rss_mb'])
+            if used and used > self.max_memory_mb:
+                self.on_limit(f"memory {used:.0f} MB > {self.max_memory_mb} MB")
+
+    def wait_idle(self, timeout):
+        """Menunggu semua request yang sedang berjalan selesai. False jika timeout."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self.inflight > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+
+class PreforkServer:
+    """
+    Server HTTP produksi dengan model prefork. Master membuat aplikasi (dan memuat
+    model) satu kali, membuka socket, lalu mem-fork num_workers worker; setiap worker
+    menjalankan server WSGI ber-thread pada socket yang sama. Halaman memori master
+    (termasuk bobot model) dibagi copy-on-write oleh semua worker.
+
+    - Worker didaur ulang dengan halus setelah max_requests (+ jitter acak) atau jika
+      memori privatnya melewati max_worker_memory_mb: berhenti menerima koneksi,
+      menunggu request berjalan selesai, lalu keluar dan di-fork ulang oleh master.
+    - SIGHUP: semua worker didaur ulang bergiliran (satu per satu, tanpa downtime).
+      Kode aplikasi tidak dimuat ulang; untuk itu restart master.
+    - SIGTERM/SIGINT: semua worker dihentikan dengan halus lalu master keluar.
+    - Status worker (pid, waktu mulai, daur ulang) ditulis ke status_file untuk /admin/server/stats.
+    """
+
+    def __init__(self, app, host='0.0.0.0', port=8000, num_workers=2, max_requests=0,
+                 max_requests_jitter=0, max_worker_memory_mb=0, graceful_timeout=30,
+                 status_file=None, report_interval=60, post_fork=None, worker_exit=None):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.num_workers = num_workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_worker_memory_mb = max_worker_memory_mb
+        self.graceful_timeout = graceful_timeout
+        self.status_file = status_file
+        self.report_interval = report_interval
+        self.post_fork = post_fork      # post_fork(index) di worker sebelum melayani request
+        self.worker_exit = worker_exit  # worker_exit() di worker sebelum keluar (flush buffer, dll.)
+
+        self.recycled = 0
+        self.crashed = 0
+        self._socket = None
+        self._workers = {}   # pid -> {"index", "started_at"}
+        self._running = False
+        self._reload_pending = []
+        self._retiring = None
+
+    # --- Master ---
+    def serve_forever(self):
+        self._socket = socket.create_server((self.host, self.port), backlog=2048)
+        self._socket.set_inheritable(True)
+        self._running = True
+        signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        signal.signal(signal.SIGINT, lambda *_: self.stop())
+        signal.signal(signal.SIGHUP, lambda *_: self.reload())
+
+        # Objek yang sudah ada (aplikasi, model) dikeluarkan dari pelacakan GC agar
+        # siklus GC di worker tidak menulis ke halaman bersama dan memicu salinan
+        gc.collect()
+        gc.freeze()
+
+        for index in range(self.num_workers):
+            self._spawn(index)
+        print(f"Prefork server listening on {self.host}:{self.port} with {self.num_workers} workers "
+              f"(master pid {os.getpid()}).")
+
+        last_report = time.monotonic()
+        try:
+            while self._running:
+                time.sleep(0.5)
+                self._reap()
+                self._continue_reload()
+                if self.report_interval and time.monotonic() - last_report >= self.report_interval:
+                    last_report = time.monotonic()
+                    self._report_memory()
+        finally:
+            self._shutdown_workers()
+            self._socket.close()
+            if self.status_file and os.path.exists(self.status_file):
+                os.remove(self.status_file)
+
+    def stop(self):
+        self._running = False
+
+    def reload(self):
+        """Menjadwalkan daur ulang bergiliran semua worker yang ada saat ini."""
+        self._reload_pending = list(self._workers)
+
+    def _spawn(self, index):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._worker_main(index)
+            except BaseException as e:
+                print(f"Worker {index} (pid {os.getpid()}) error: {e}")
+                code = 1
+            finally:
+                # Jangan pernah kembali ke loop master dari proses anak
+                os._exit(code)
+        self._workers[pid] = {"index": index, "started_at": time.time()}
+        self._write_status()
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self._workers.pop(pid, None)
+            if worker is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if pid == self._retiring:
+                self._retiring = None
+            if code == 0:
+                self.recycled += 1
+            else:
+                self.crashed += 1
+                print(f"Worker {worker['index']} (pid {pid}) exited with code {code}.")
+                # Hindari fork berulang-ulang jika worker langsung gagal saat start
+                if time.time() - worker['started_at'] < 1.0:
+                    time.sleep(1.0)
+            if self._running:
+                self._spawn(worker['index'])
+            else:
+                self._write_status()
+
+    def _continue_reload(self):
+        if self._retiring is not None:
+            return
+        while self._reload_pending:
+            pid = self._reload_pending.pop(0)
+            if pid in self._workers:
+                self._retiring = pid
+                os.kill(pid, signal.SIGTERM)
+                return
+
+    def _shutdown_workers(self):
+        for pid in list(self._workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self._workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self._workers):
+            print(f"Worker {self._workers[pid]['index']} (pid {pid}) did not stop in time; killing.")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self._workers.clear()
+
+    def _write_status(self):
+        if not self.status_file:
+            return
+        status = {
+            "master": {"pid": os.getpid()},
+            "workers": [
+                {"index": info['index'], "pid": pid, "started_at": info['started_at']}
+                for pid, info in sorted(self._workers.items(), key=lambda item: item[1]['index'])
+            ],
+            "recycled": self.recycled,
+            "crashed": self.crashed,
+            "max_requests": self.max_requests,
+            "max_worker_memory_mb": self.max_worker_memory_mb,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.status_file)), exist_ok=True)
+        tmp_path = f"{self.status_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(status, f)
+        os.replace(tmp_path, self.status_file)
+
+    def _report_memory(self):
+        for pid, info in sorted(self._workers.items(), key=lambda item: item[1]['index']):
+            memory = process_memory(pid)
+            if memory:
+                print(f"Worker {info['index']} (pid {pid}): rss {memory['rss_mb']} MB, "
+                      f"pss {memory['pss_mb']} MB, private {memory['private_mb']} MB")
+
+    # --- Worker ---
+    def _worker_main(self, index):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C ditangani master
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        random.seed()
+        if self.post_fork:
+            self.post_fork(index)
+
+        server = None
+        stopping = threading.Event()
+
+        def begin_shutdown(reason):
+            if stopping.is_set():
+                return
+            stopping.set()
+            print(f"Worker {index} (pid {os.getpid()}) stopping: {reason}.")
+            # shutdown() memblokir sampai serve_forever berhenti, jadi dipanggil dari thread lain
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        max_requests = self.max_requests
+        if max_requests and self.max_requests_jitter:
+            # Jitter mencegah semua worker didaur ulang pada saat yang sama
+            max_requests += random.randint(0, self.max_requests_jitter)
+        worker_app = _WorkerApp(self.app, max_requests, self.max_worker_memory_mb, begin_shutdown)
+        server = make_server(self.host, self.port, worker_app, threaded=True, fd=self._socket.fileno())
+        signal.signal(signal.SIGTERM, lambda *_: begin_shutdown("SIGTERM"))
+
+        server.serve_forever(poll_interval=0.5)
+        if not worker_app.wait_idle(self.graceful_timeout):
+            print(f"Worker {index} (pid {os.getpid()}): {worker_app.inflight} request(s) still running at exit.")
+        if self.worker_exit:
+            self.worker_exit()
@@ -0,0 +1,290 @@
+# app/utils/purge.py
+import os
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+from flask import current_app
+from werkzeug.security import safe_join
+
+from .db import get_db_connection, query_db, execute_db
+from .detection_queries import detection_where, parse_detection_filters
+from .detection_stats import apply_deltas, reset_stats
+from .job_queue import DetectionJobQueue
+from .thumbnails import thumbnail_relpath
+from .user_cache import user_cache
+
+# Cakupan penghapusan
+PURGE_ALL = 'all'        # Semua log deteksi dan gambar mentah
+PURGE_FILTER = 'filter'  # Log deteksi yang cocok dengan filter (result, tanggal, confidence, user_id)
+PURGE_USER = 'user'      # Pengguna beserta semua gambar, log, dan foto profilnya
+PURGE_SCOPES = (PURGE_ALL, PURGE_FILTER, PURGE_USER)
+
+
+def tombstone_detections(purge_id, scope, filters=None, user_id=None):
+    """
+    Menghapus baris database dalam SATU transaksi dan mencatat file fisiknya di
+    file_tombstones (job_id = purge_id) untuk dihapus belakangan oleh reap_tombstones.
+    Tabel ringkasan ikut dikurangi. Untuk scope 'filter', gambar mentah hanya dihapus
+    jika semua deteksinya cocok dengan filter; gambar mentah tanpa image_path ikut dihapus
+    tetapi tidak dicatat sebagai tombstone. Penyelesaian dicatat di purge_runs dalam
+    transaksi yang sama: jika purge_id sudah tercatat, tidak ada yang dihapus lagi dan
+    hitungan yang tersimpan dikembalikan. Mengembalikan dict jumlah baris, atau None jika
+    pengguna (scope 'user') tidak ditemukan. Melempar exception jika gagal.
+    """
+    if scope == PURGE_ALL:
+        where, params = "", []
+        raw_filter, raw_params = "1 = 1", []
+    elif scope == PURGE_USER:
+        where, params = detection_where({'user_id': user_id})
+        raw_filter, raw_params = "r.user_id = %s", [user_id]
+    else:
+        where, params = detection_where(filters or {})
+        # Kandidat: gambar mentah dari deteksi yang cocok. Setelah deteksi dihapus,
+        # gambar yang masih dipakai deteksi lain dikeluarkan lagi dari tombstone.
+        raw_filter = f"r.id IN (SELECT d.raw_image_id FROM fusarium_new_detections d {where})"
+        raw_params = params
+
+    conn = get_db_connection()
+    if conn is None:
+        raise ConnectionError("Database connection failed")
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        # Job yang diulang setelah tahap 1 commit: baris yang masuk sesudahnya tidak boleh ikut terhapus
+        cursor.execute(
+            "SELECT detections_deleted, raw_images_deleted, files_total FROM purge_runs WHERE purge_id = %s",
+            (purge_id,)
+        )
+        done = cursor.fetchone()
+        if done is not None:
+            conn.commit()
+            return {"detections_deleted": done[0], "raw_images_deleted": done[1], "files_total": done[2]}
+
+        profile_picture = None
+        if scope == PURGE_USER:
+            cursor.execute("SELECT profile_picture_path FROM users WHERE id = %s FOR UPDATE", (user_id,))
+            user = cursor.fetchone()
+            if user is None:
+                conn.commit()
+                return None
+            profile_picture = user[0]
+
+        # Kunci baris yang cocok (sekaligus mencegah insert baru ke rentang yang sama)
+        # dan hitung pengurangan ringkasan tanpa memuat semua baris ke memori
+        groups = []
+        if scope != PURGE_ALL:
+            cursor.execute(
+                f"SELECT d.user_id, DATE(d.detection_date), d.result, COUNT(*) FROM fusarium_new_detections d {where} "
+                f"GROUP BY d.user_id, DATE(d.detection_date), d.result FOR UPDATE",
+                params
+            )
+            groups = cursor.fetchall()
+
+        cursor.execute(
+            f"INSERT INTO file_tombstones (job_id, raw_image_id, file_path) SELECT %s, r.id, r.image_path "
+            f"FROM fusarium_new_raw_images r WHERE {raw_filter} AND r.image_path IS NOT NULL",
+            [purge_id, *raw_params]
+        )
+        files_total = cursor.rowcount
+        # Gambar mentah tanpa file tidak bisa masuk tombstone (file_path NOT NULL);
+        # id-nya dicatat sebelum deteksi dihapus agar tetap bisa dihapus di transaksi ini
+        cursor.execute(
+            f"SELECT r.id FROM fusarium_new_raw_images r WHERE {raw_filter} AND r.image_path IS NULL FOR UPDATE",
+            raw_params
+        )
+        pathless_ids = [row[0] for row in cursor.fetchall()]
+        if profile_picture:
+            cursor.execute(
+                "INSERT INTO file_tombstones (job_id, raw_image_id, file_path) VALUES (%s, NULL, %s)",
+                (purge_id, profile_picture)
+            )
+            files_total += 1
+
+        cursor.execute(f"DELETE d FROM fusarium_new_detections d {where}", params)
+        detections_deleted = cursor.rowcount
+        if scope == PURGE_FILTER:
+            # Gambar mentah yang masih punya deteksi tidak cocok filter tetap disimpan
+            cursor.execute(
+                "DELETE t FROM file_tombstones t WHERE t.job_id = %s AND t.raw_image_id IS NOT NULL "
+                "AND EXISTS (SELECT 1 FROM fusarium_new_detections d WHERE d.raw_image_id = t.raw_image_id)",
+                (purge_id,)
+            )
+            files_total -= cursor.rowcount
+        cursor.execute(
+            "DELETE r FROM fusarium_new_raw_images r JOIN file_tombstones t ON t.raw_image_id = r.id WHERE t.job_id = %s",
+            (purge_id,)
+        )
+        raw_images_deleted = cursor.rowcount
+        for start in range(0, len(pathless_ids), 1000):
+            chunk = pathless_ids[start:start + 1000]
+            cursor.execute(
+                f"DELETE r FROM fusarium_new_raw_images r WHERE r.id IN ({', '.join(['%s'] * len(chunk))}) "
+                f"AND NOT EXISTS (SELECT 1 FROM fusarium_new_detections d WHERE d.raw_image_id = r.id)",
+                chunk
+            )
+            raw_images_deleted += cursor.rowcount
+
+        if scope == PURGE_ALL:
+            reset_stats(cursor)
+        else:
+            daily, per_user = Counter(), Counter()
+            for row_user_id, stat_date, result, count in groups:
+                daily[(stat_date, result)] -= count
+                per_user[(row_user_id, result)] -= count
+            apply_deltas(cursor, daily, per_user)
+
+        if scope == PURGE_USER:
+            cursor.execute("DELETE FROM user_detection_stats WHERE user_id = %s", (user_id,))
+            cursor.execute("DELETE FROM password_reset_tokens WHERE user_id = %s", (user_id,))
+            cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+        cursor.execute(
+            "INSERT INTO purge_runs (purge_id, scope, detections_deleted, raw_images_deleted, files_total) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            (purge_id, scope, detections_deleted, raw_images_deleted, files_total)
+        )
+        conn.commit()
+        return {
+            "detections_deleted": detections_deleted,
+            "raw_images_deleted": raw_images_deleted,
+            "files_total": files_total,
+        }
+    except Exception:
+        try:
+            conn.rollback()
+        except mysql.connector.Error:
+            pass
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def removal_targets(rel_paths):
+    """
+    Path absolut untuk setiap path relatif di folder uploads: [file_utama, thumbnail...].
+    file_utama None jika path keluar dari folder uploads. Butuh app context.
+    """
+    uploads_dir = os.path.normpath(os.path.join(current_app.root_path, '..', current_app.config['UPLOAD_FOLDER_BASE']))
+    thumbnails_dir = os.path.normpath(os.path.join(current_app.root_path, '..', current_app.config['THUMBNAIL_FOLDER']))
+    sizes = current_app.config.get('THUMBNAIL_SIZES', ())
+    targets = []
+    for rel_path in rel_paths:
+        rel_path = rel_path.replace('\\', '/')
+        targets.append(
+            [safe_join(uploads_dir, rel_path)]
+            + [path for path in (safe_join(thumbnails_dir, thumbnail_relpath(rel_path, size)) for size in sizes) if path]
+        )
+    return targets
+
+
+def remove_files(paths):
+    """
+    Menghapus file utama (paths[0]) dan turunannya (thumbnail, best-effort).
+    Mengembalikan 'removed', 'missing', atau 'failed' untuk file utama.
+    """
+    main_path, derived = paths[0], paths[1:]
+    for path in derived:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    if main_path is None:
+        return 'missing'
+    try:
+        os.remove(main_path)
+        return 'removed'
+    except FileNotFoundError:
+        return 'missing'
+    except OSError as e:
+        print(f"Gagal menghapus file {main_path}: {e}")
+        return 'failed'
+
+
+def reap_tombstones(purge_id, threads=8, batch_size=500, on_progress=None):
+    """
+    Menghapus file fisik dari tombstone milik purge_id secara paralel (thread pool),
+    per batch. Tombstone dihapus setelah filenya hilang; yang gagal tetap tersimpan
+    agar bisa dicoba lagi. on_progress(counts) dipanggil setelah setiap batch.
+    Mengembalikan Counter {'removed', 'missing', 'failed'}.
+    """
+    counts = Counter()
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix='file-reaper') as pool:
+        while True:
+            rows = query_db(
+                "SELECT id, file_path FROM file_tombstones WHERE job_id = %s AND id > %s ORDER BY id LIMIT %s",
+                (purge_id, last_id, batch_size)
+            )
+            if rows is None:
+                raise ConnectionError("Database connection failed")
+            if not rows:
+                break
+
+            # Path dihitung di thread ini (butuh app context), thread pool hanya melakukan I/O
+            targets = removal_targets([row['file_path'] for row in rows])
+            outcomes = list(pool.map(remove_files, targets))
+            counts.update(outcomes)
+
+            done = [row['id'] for row, outcome in zip(rows, outcomes) if outcome != 'failed']
+            if done and not execute_db(
+                f"DELETE FROM file_tombstones WHERE id IN ({', '.join(['%s'] * len(done))})", tuple(done)
+            ):
+                raise ConnectionError("Failed to delete file tombstones")
+            last_id = rows[-1]['id']
+            if on_progress:
+                on_progress(counts)
+    return counts
+
+
+def run_purge_job(payload):
+    """
+    Handler job purge (dijalankan oleh worker purge_jobs, atau langsung jika antrean nonaktif).
+    Tahap 1: transaksi penghapusan + tombstone. Tahap 2: penghapusan file paralel.
+    Jika job diulang setelah tahap 1 commit, tombstone_detections mengenali purge_id dari
+    tabel purge_runs dan tidak menghapus apa pun lagi, sehingga baris yang masuk setelah
+    purge dimulai tidak ikut terhapus. Progres 'reaping' di SQLite hanya penghemat kueri.
+    """
+    progress = purge_jobs.get_progress() or {}
+    if progress.get('phase') != 'reaping':
+        purge_jobs.set_progress({"phase": "deleting"})
+        filters = parse_detection_filters(payload.get('filters') or {}, allow_user_filter=True)
+        deleted = tombstone_detections(payload['purge_id'], payload['scope'], filters, payload.get('user_id'))
+        if payload['scope'] == PURGE_USER:
+            user_cache.invalidate(payload.get('user_id'))
+        if deleted is None:
+            return {"phase": "done", "user_found": False}
+        progress = {"phase": "reaping", **deleted, "files_removed": 0, "files_missing": 0, "files_failed": 0}
+        purge_jobs.set_progress(progress)
+
+    # Hitungan dari percobaan sebelumnya (tombstone yang sudah selesai tidak dibaca lagi)
+    previous = {key: progress.get(key, 0) for key in ('files_removed', 'files_missing', 'files_failed')}
+
+    def report(counts):
+        progress.update({
+            "files_removed": previous['files_removed'] + counts['removed'],
+            "files_missing": previous['files_missing'] + counts['missing'],
+            "files_failed": previous['files_failed'] + counts['failed'],
+        })
+        purge_jobs.set_progress(progress)
+
+    counts = reap_tombstones(
+        payload['purge_id'],
+        threads=int(current_app.config.get('PURGE_REAPER_THREADS', 8)),
+        batch_size=int(current_app.config.get('PURGE_REAPER_BATCH_SIZE', 500)),
+        on_progress=report
+    )
+    report(counts)
+    progress['phase'] = 'done'
+    purge_jobs.set_progress(progress)
+    return progress
+
+
+def new_purge_payload(scope, filters=None, user_id=None):
+    """Payload job purge. filters berupa argumen mentah (string) yang sudah divalidasi pemanggil."""
+    return {"purge_id": uuid.uuid4().hex, "scope": scope, "filters": dict(filters or {}), "user_id": user_id}
+
+
+# Antrean global untuk job penghapusan massal
+purge_jobs = DetectionJobQueue(num_workers=1, max_depth=100, running_timeout=3600, name='purge-job')
@@ -0,0 +1,235 @@
+# app/utils/rate_limit.py
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, jsonify, request, session
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+from .metrics import metrics
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket per kunci (mis. 'auth.login:ip:1.2.3.4') di memori proses.
+    Setiap bucket berisi maksimal `capacity` token dan terisi `rate` token per detik.
+    Jumlah bucket dibatasi (LRU) agar banyak IP berbeda tidak menghabiskan memori;
+    bucket yang terbuang sama dengan bucket penuh, jadi tidak pernah lebih ketat.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def _refill_locked(self, key, capacity, rate, now):
+        tokens, updated_at = self._buckets.pop(key, (capacity, now))
+        return min(capacity, tokens + (now - updated_at) * rate)
+
+    def _store_locked(self, key, tokens, now):
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def consume(self, key, capacity, rate, cost=1.0):
+        """
+        Mengambil `cost` token. Mengembalikan 0 jika diizinkan, atau jumlah detik
+        sampai token cukup (untuk header Retry-After) jika ditolak.
+        """
+        return self.consume_many([(key, capacity, rate, cost)])[0]
+
+    def consume_many(self, checks):
+        """
+        checks: daftar (key, kapasitas, rate, cost). Semua bucket diperiksa di bawah satu
+        lock; token hanya diambil jika SEMUA bucket mengizinkan, jadi request yang ditolak
+        satu bucket tidak ikut menghabiskan bucket lain. cost 0 hanya memeriksa bahwa
+        bucket masih punya satu token. Mengembalikan (wait_terbesar, indeks_penolak|None).
+        """
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            wait, rejected_by = 0.0, None
+            for index, (key, capacity, rate, cost) in enumerate(checks):
+                tokens = self._refill_locked(key, capacity, rate, now)
+                levels.append(tokens)
+                needed = max(cost, 1.0)
+                if tokens < needed:
+                    check_wait = (needed - tokens) / rate if rate > 0 else float('inf')
+                    if rejected_by is None or check_wait > wait:
+                        wait, rejected_by = check_wait, index
+            for (key, _, _, cost), tokens in zip(checks, levels):
+                self._store_locked(key, tokens - cost if rejected_by is None else tokens, now)
+        return wait, rejected_by
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class InferenceAdmission:
+    """
+    Batas global jumlah request inferensi yang berjalan bersamaan (per proses).
+    Request yang tidak mendapat slot dalam max_wait_ms langsung ditolak (503)
+    alih-alih ikut mengantre tanpa batas di depan model.
+    """
+
+    def __init__(self, max_inflight=32, max_wait_ms=0, retry_after=1):
+        self.max_inflight = max_inflight
+        self.max_wait_ms = max_wait_ms
+        self.retry_after = retry_after
+        self._semaphore = threading.BoundedSemaphore(max_inflight)
+        self._lock = threading.Lock()
+        self.inflight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def init_app(self, app):
+        self.max_inflight = max(1, int(app.config.get('INFERENCE_MAX_INFLIGHT', self.max_inflight)))
+        self.max_wait_ms = max(0.0, float(app.config.get('INFERENCE_ADMISSION_WAIT_MS', self.max_wait_ms)))
+        self.retry_after = int(app.config.get('INFERENCE_ADMISSION_RETRY_AFTER', self.retry_after))
+        self._semaphore = threading.BoundedSemaphore(self.max_inflight)
+
+    def try_acquire(self):
+        """Mengembalikan fungsi release (aman dipanggil berkali-kali), atau None jika ditolak."""
+        acquired = self._semaphore.acquire(timeout=self.max_wait_ms / 1000.0) if self.max_wait_ms \
+            else self._semaphore.acquire(blocking=False)
+        with self._lock:
+            if not acquired:
+                self.rejected += 1
+                return None
+            self.inflight += 1
+            self.admitted += 1
+
+        released = threading.Event()
+
+        def release():
+            with self._lock:
+                if released.is_set():
+                    return
+                released.set()
+                self.inflight -= 1
+            self._semaphore.release()
+        return release
+
+    def reject(self, endpoint):
+        """Response 503 dengan Retry-After untuk request yang tidak mendapat slot."""
+        metrics.inc('admission_rejections_total', endpoint=endpoint)
+        return _error_response(
+            ServiceUnavailable,
+            "Server sedang sibuk memproses gambar lain. Coba lagi sebentar lagi.",
+            self.retry_after
+        )
+
+    def stats(self):
+        return {
+            "max_inflight": self.max_inflight,
+            "inflight": self.inflight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+def _error_response(exception_class, message, retry_after):
+    """429/503 dengan Retry-After: JSON untuk klien API (fetch), halaman error untuk browser."""
+    retry_after = max(1, int(math.ceil(retry_after)))
+    if request.accept_mimetypes.best_match(['application/json', 'text/html']) == 'text/html':
+        error = exception_class(message)
+        response = error.get_response()
+    else:
+        response = jsonify({"error": message, "retry_after": retry_after})
+        response.status_code = exception_class.code
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def _limit_key(kind):
+    """
+    Nilai kunci bucket untuk jenis 'ip', 'user', 'account', atau 'failed_login';
+    None jika tidak berlaku.
+    """
+    if kind == 'ip':
+        return request.remote_addr or 'unknown'
+    if kind == 'user':
+        user_id = session.get('user_id') or session.get('admin_id')
+        return str(user_id) if user_id else None
+    if kind in ('account', 'failed_login'):
+        # Identitas yang dicoba di form: membatasi permintaan ke satu akun dari banyak IP
+        identifier = (request.form.get('login_identifier') or request.form.get('username')
+                      or request.form.get('email'))
+        if not identifier:
+            return None
+        identifier = identifier.strip().lower()[:254]
+        if kind == 'failed_login':
+            # Per (akun, IP): penyerang dari IP lain tidak dapat mengunci pemilik akun
+            return f"{identifier}|{request.remote_addr or 'unknown'}"
+        return identifier
+    return None
+
+
+# Jenis kunci yang hanya dikenai biaya lewat record_failed_login() (dicek, tidak diambil, per request)
+CHARGE_ON_FAILURE = ('failed_login',)
+
+
+def record_failed_login():
+    """
+    Mengambil token dari bucket 'failed_login' endpoint saat ini. Dipanggil rute login
+    setelah kredensial ditolak, sehingga login yang berhasil tidak pernah dihitung.
+    """
+    app = current_app._get_current_object()
+    if not app.config.get('RATE_LIMIT_ENABLED', True):
+        return
+    endpoint_rules = app.config.get('RATE_LIMITS', {}).get(request.endpoint, {})
+    for kind in CHARGE_ON_FAILURE:
+        if kind not in endpoint_rules:
+            continue
+        key = _limit_key(kind)
+        if key is not None:
+            capacity, rate = endpoint_rules[kind]
+            rate_limiter.consume(f"{request.endpoint}:{kind}:{key}", capacity, rate)
+
+
+# Limiter dan admission control global
+rate_limiter = TokenBucketLimiter()
+inference_admission = InferenceAdmission()
+
+metrics.describe('rate_limit_rejections_total', 'Jumlah request yang ditolak rate limit (429) per rute dan jenis kunci.')
+metrics.describe('admission_rejections_total', 'Jumlah request inferensi yang ditolak karena batas konkurensi (503).')
+
+
+def init_app(app):
+    """
+    Memasang pengecekan RATE_LIMITS sebelum setiap request.
+    RATE_LIMITS: {endpoint: {jenis_kunci: (kapasitas, token_per_detik)}}; hanya metode
+    di RATE_LIMIT_METHODS yang dihitung. Bucket disimpan per proses worker.
+    Bucket 'failed_login' hanya diperiksa di sini dan diisi lewat record_failed_login().
+    """
+    inference_admission.init_app(app)
+    rate_limiter.max_keys = int(app.config.get('RATE_LIMIT_MAX_KEYS', rate_limiter.max_keys))
+    if not app.config.get('RATE_LIMIT_ENABLED', True):
+        return
+    rules = app.config.get('RATE_LIMITS', {})
+    methods = set(app.config.get('RATE_LIMIT_METHODS', ('POST',)))
+
+    @app.before_request
+    def _check_rate_limits():
+        endpoint_rules = rules.get(request.endpoint)
+        if not endpoint_rules or request.method not in methods:
+            return None
+        checks, kinds = [], []
+        for kind, (capacity, rate) in endpoint_rules.items():
+            key = _limit_key(kind)
+            if key is None:
+                continue
+            cost = 0 if kind in CHARGE_ON_FAILURE else 1
+            checks.append((f"{request.endpoint}:{kind}:{key}", capacity, rate, cost))
+            kinds.append(kind)
+        wait, rejected_index = rate_limiter.consume_many(checks)
+        if rejected_index is None:
+            return None
+        rejected_by = kinds[rejected_index]
+        metrics.inc('rate_limit_rejections_total', endpoint=request.endpoint, key=rejected_by)
+        return _error_response(TooManyRequests, "Terlalu banyak permintaan. Coba lagi nanti.", wait)
@@ -0,0 +1,170 @@
+# app/utils/rescoring.py
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from .db import query_db
+from .detections import update_detection_results
+from .prediction import preprocess_image, predict_batch, format_prediction, model_provider
+
+
+def load_and_preprocess(full_path):
+    """Dijalankan di proses worker: membaca dan memproses satu gambar. None jika gagal."""
+    image = cv2.imread(full_path)
+    if image is None:
+        return None
+    return preprocess_image(image)
+
+
+def _load_checkpoint(path, model_id):
+    """Id gambar mentah terakhir yang selesai; checkpoint dari model lain diabaikan."""
+    if path and os.path.exists(path):
+        with open(path) as f:
+            state = json.load(f)
+        if state.get('model_id') == model_id:
+            return state.get('last_raw_image_id', 0)
+    return 0
+
+
+def _save_checkpoint(path, last_raw_image_id, model_id):
+    if not path:
+        return
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({"last_raw_image_id": last_raw_image_id, "model_id": model_id, "updated_at": time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+def _clear_checkpoint(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def _fetch_page(after_id, page_size):
+    """
+    Mengambil satu halaman gambar mentah (keyset pagination pada id) beserta semua
+    deteksinya. Halaman dibatasi per gambar, jadi deteksi satu gambar tidak pernah
+    terbelah di dua halaman. Mengembalikan daftar (gambar, [deteksi]).
+    """
+    images = query_db(
+        """
+        SELECT id AS raw_image_id, image_path
+        FROM fusarium_new_raw_images
+        WHERE id > %s AND image_path IS NOT NULL
+        ORDER BY id
+        LIMIT %s
+        """,
+        (after_id, page_size)
+    )
+    if images is None:
+        raise ConnectionError("Database connection failed")
+    if not images:
+        return []
+    detections = query_db(
+        f"""
+        SELECT id AS detection_id, raw_image_id, user_id,
+               DATE(detection_date) AS stat_date, result, confidence
+        FROM fusarium_new_detections
+        WHERE raw_image_id IN ({', '.join(['%s'] * len(images))})
+        ORDER BY id
+        """,
+        tuple(image['raw_image_id'] for image in images)
+    )
+    if detections is None:
+        raise ConnectionError("Database connection failed")
+    by_image = {}
+    for detection in detections:
+        by_image.setdefault(detection['raw_image_id'], []).append(detection)
+    # Gambar tanpa deteksi tidak perlu diprediksi ulang, tetapi tetap memajukan checkpoint
+    return [(image, by_image.get(image['raw_image_id'], [])) for image in images]
+
+
+def rescore_images(upload_base_dir, batch_size=32, workers=None, checkpoint_path=None,
+                   dry_run=False, limit=None, progress=print):
+    """
+    Memprediksi ulang semua gambar yang tercatat di fusarium_new_raw_images.
+    Decode + preprocessing dilakukan paralel di process pool, inferensi dalam
+    batch, dan hasil ditulis kembali dengan executemany untuk semua deteksi gambar
+    tersebut (ringkasan harian ikut dikoreksi). Progres disimpan ke checkpoint
+    (per digest model) setelah setiap batch sehingga proses dapat dilanjutkan;
+    checkpoint dihapus setelah semua gambar selesai.
+    Mengembalikan ringkasan (jumlah, perubahan label, throughput).
+    """
+    # Pool dibuat dengan 'spawn' agar worker tidak mewarisi state TensorFlow dari proses induk
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    if model_provider.get() is None:
+        executor.shutdown()
+        raise RuntimeError("Model not loaded.")
+
+    model_id = model_provider.model_id
+    after_id = 0 if dry_run else _load_checkpoint(checkpoint_path, model_id)
+    summary = {"processed": 0, "missing": 0, "updated": 0, "changed": 0, "changes": [], "dry_run": dry_run}
+    started = time.perf_counter()
+    completed = False
+
+    try:
+        while True:
+            page_size = batch_size if limit is None else min(batch_size, limit - summary['processed'] - summary['missing'])
+            if page_size <= 0:
+                break
+            page = _fetch_page(after_id, page_size)
+            if not page:
+                completed = True
+                break
+
+            page_with_detections = [(image, detections) for image, detections in page if detections]
+            paths = [os.path.join(upload_base_dir, image['image_path'].replace('\\', '/'))
+                     for image, _ in page_with_detections]
+            tensors = list(executor.map(load_and_preprocess, paths))
+
+            valid = [(item, t) for item, t in zip(page_with_detections, tensors) if t is not None]
+            summary['missing'] += len(page_with_detections) - len(valid)
+            updates = []
+            label_changes = []
+            if valid:
+                predictions = predict_batch(np.stack([t for _, t in valid]))
+                for ((image, detections), _), pred in zip(valid, predictions):
+                    result = format_prediction(pred)
+                    for row in detections:
+                        updates.append((result['label'], result['confidence'], row['detection_id']))
+                        if result['label'] != row['result']:
+                            summary['changed'] += 1
+                            label_changes.append((row['user_id'], row['stat_date'], row['result'], result['label']))
+                            if len(summary['changes']) < 1000:
+                                summary['changes'].append({
+                                    "detection_id": row['detection_id'],
+                                    "image_path": image['image_path'],
+                                    "old": row['result'],
+                                    "new": result['label'],
+                                })
+                summary['processed'] += len(valid)
+
+            if updates and not dry_run:
+                if not update_detection_results(updates, label_changes):
+                    raise RuntimeError("Failed to write rescored results; stopping at checkpoint.")
+                summary['updated'] += len(updates)
+
+            after_id = page[-1][0]['raw_image_id']
+            if not dry_run:
+                _save_checkpoint(checkpoint_path, after_id, model_id)
+
+            elapsed = time.perf_counter() - started
+            progress(f"{summary['processed']} images, {summary['processed'] / elapsed:.1f} images/sec (last id {after_id})")
+    finally:
+        executor.shutdown()
+
+    if completed and not dry_run:
+        # Run berikutnya harus memulai dari awal, bukan melanjutkan checkpoint yang sudah selesai
+        _clear_checkpoint(checkpoint_path)
+
+    elapsed = time.perf_counter() - started
+    summary['elapsed_seconds'] = elapsed
+    summary['images_per_second'] = (summary['processed'] / elapsed) if elapsed else 0
+    summary['last_raw_image_id'] = after_id
+    summary['completed'] = completed
+    return summary
@@ -0,0 +1,211 @@
+# app/utils/retention.py
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import mysql.connector
+from flask import current_app
+
+from .db import get_db_connection, query_db
+from .purge import reap_tombstones, removal_targets, remove_files
+
+# Folder di bawah uploads beserta kolom database yang mereferensikan filenya.
+# Hanya folder di sini yang boleh diberi retensi (file di folder lain tidak pernah disentuh).
+REFERENCE_COLUMNS = {
+    'raw_images': ('fusarium_new_raw_images', 'image_path'),
+    'profile_pics': ('users', 'profile_picture_path'),
+}
+
+
+def _iter_old_files(folder, cutoff, counts):
+    """
+    Menghasilkan (path_relatif, ukuran) untuk file di folder uploads/<folder> yang
+    lebih tua dari cutoff. Direktori dibaca bertahap lewat os.scandir, jadi daftar
+    file tidak pernah dimuat seluruhnya ke memori.
+    """
+    uploads_dir = os.path.normpath(os.path.join(current_app.root_path, '..', current_app.config['UPLOAD_FOLDER_BASE']))
+    try:
+        entries = os.scandir(os.path.join(uploads_dir, folder))
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            counts['scanned'] += 1
+            if stat.st_mtime >= cutoff:
+                # Masih dalam masa retensi (termasuk unggahan yang record DB-nya belum ditulis buffer)
+                continue
+            yield f"{folder}/{entry.name}", stat.st_size
+
+
+def _referenced_paths(folder, rel_paths):
+    """
+    Path (huruf kecil, pemisah '/') dari rel_paths yang masih direferensikan database.
+    Perbandingan tidak peka huruf besar/kecil dan menerima path lama dengan '\\',
+    sehingga keraguan selalu berarti file dianggap masih dipakai.
+    """
+    table, column = REFERENCE_COLUMNS[folder]
+    candidates = set(rel_paths) | {path.replace('/', '\\') for path in rel_paths}
+    rows = query_db(
+        f"SELECT {column} AS path FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(candidates))})",
+        tuple(candidates)
+    )
+    if rows is None:
+        raise ConnectionError("Database connection failed")
+    return {row['path'].replace('\\', '/').lower() for row in rows}
+
+
+def reap_orphan_files(folder, retention_days, pool, batch_size=500, limit=None, dry_run=False):
+    """
+    Menghapus file di uploads/<folder> yang lebih tua dari retention_days dan tidak
+    direferensikan database (mis. unggahan anonim, sisa penghapusan yang gagal).
+    File dicek per batch; thumbnail ikut dihapus. Mengembalikan Counter
+    {'scanned', 'orphaned', 'removed', 'failed', 'bytes_reclaimed'}.
+    """
+    if folder not in REFERENCE_COLUMNS:
+        raise ValueError(f"Unknown retention folder: {folder!r}")
+    counts = Counter()
+    cutoff = time.time() - retention_days * 86400
+
+    def process(batch):
+        referenced = _referenced_paths(folder, [path for path, _ in batch])
+        orphans = [(path, size) for path, size in batch if path.lower() not in referenced]
+        if limit:
+            # Batch terakhir dipotong agar tidak melewati batas file per run
+            orphans = orphans[:max(0, limit - counts['orphaned'])]
+        counts['orphaned'] += len(orphans)
+        if dry_run:
+            counts['bytes_reclaimed'] += sum(size for _, size in orphans)
+            return
+        outcomes = pool.map(remove_files, removal_targets([path for path, _ in orphans]))
+        for (path, size), outcome in zip(orphans, outcomes):
+            counts[outcome] += 1
+            if outcome == 'removed':
+                counts['bytes_reclaimed'] += size
+
+    batch = []
+    for item in _iter_old_files(folder, cutoff, counts):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            process(batch)
+            batch = []
+        if limit and counts['orphaned'] >= limit:
+            break
+    if batch and not (limit and counts['orphaned'] >= limit):
+        process(batch)
+    return counts
+
+
+def delete_expired_reset_tokens(dry_run=False):
+    """Menghapus token reset password yang sudah kedaluwarsa. Mengembalikan jumlah baris."""
+    # Token ditulis dengan datetime.utcnow() di auth_routes.forgot_password
+    now = datetime.utcnow()
+    if dry_run:
+        row = query_db("SELECT COUNT(*) AS n FROM password_reset_tokens WHERE expires_at < %s", (now,), one=True)
+        if row is None:
+            raise ConnectionError("Database connection failed")
+        return row['n']
+
+    conn = get_db_connection()
+    if conn is None:
+        raise ConnectionError("Database connection failed")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM password_reset_tokens WHERE expires_at < %s", (now,))
+        deleted = cursor.rowcount
+        conn.commit()
+        return deleted
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def retry_stale_tombstones(max_age_hours, threads=8, batch_size=500):
+    """
+    Mencoba lagi tombstone yang tertinggal lebih dari max_age_hours (file yang gagal
+    dihapus job purge). Mengembalikan Counter {'removed', 'missing', 'failed'}.
+    """
+    rows = query_db(
+        "SELECT DISTINCT job_id FROM file_tombstones WHERE created_at < NOW() - INTERVAL %s HOUR",
+        (int(max_age_hours),)
+    )
+    if rows is None:
+        raise ConnectionError("Database connection failed")
+    counts = Counter()
+    for row in rows:
+        counts.update(reap_tombstones(row['job_id'], threads=threads, batch_size=batch_size))
+    return counts
+
+
+def run_retention(dry_run=False, limit=None, progress=print):
+    """
+    Rekonsiliasi folder uploads dengan database: file tanpa referensi yang melewati
+    RETENTION_DAYS dihapus, tombstone lama dicoba lagi, dan token reset password
+    kedaluwarsa dibersihkan. Laporan (termasuk byte yang dibebaskan) dikembalikan
+    dan ditulis ke RETENTION_REPORT_FILE untuk /admin/retention/stats.
+    """
+    config = current_app.config
+    started = time.time()
+    batch_size = int(config.get('RETENTION_SCAN_BATCH_SIZE', 500))
+    limit = limit if limit is not None else (config.get('RETENTION_MAX_FILES_PER_RUN') or None)
+    report = {"started_at": started, "dry_run": dry_run, "folders": {}}
+
+    with ThreadPoolExecutor(max_workers=max(1, int(config.get('RETENTION_REAPER_THREADS', 4))),
+                            thread_name_prefix='retention-reaper') as pool:
+        for folder, days in config.get('RETENTION_DAYS', {}).items():
+            counts = reap_orphan_files(folder, days, pool, batch_size=batch_size, limit=limit, dry_run=dry_run)
+            report['folders'][folder] = {"retention_days": days, **counts}
+            progress(f"{folder}: {counts['scanned']} file diperiksa, {counts['orphaned']} tanpa referensi, "
+                     f"{counts['bytes_reclaimed'] / 1024 / 1024:.1f} MB "
+                     f"{'dapat dibebaskan' if dry_run else 'dibebaskan'}.")
+
+    if not dry_run and config.get('RETENTION_TOMBSTONE_RETRY_HOURS'):
+        tombstones = retry_stale_tombstones(
+            config['RETENTION_TOMBSTONE_RETRY_HOURS'],
+            threads=int(config.get('PURGE_REAPER_THREADS', 8)),
+            batch_size=int(config.get('PURGE_REAPER_BATCH_SIZE', 500))
+        )
+        report['tombstones'] = dict(tombstones)
+        progress(f"Tombstone: {tombstones['removed']} file dihapus, {tombstones['failed']} masih gagal.")
+
+    report['reset_tokens_deleted'] = delete_expired_reset_tokens(dry_run=dry_run)
+    progress(f"{report['reset_tokens_deleted']} token reset password kedaluwarsa "
+             f"{'akan dihapus' if dry_run else 'dihapus'}.")
+
+    report['bytes_reclaimed'] = sum(folder.get('bytes_reclaimed', 0) for folder in report['folders'].values())
+    report['duration_seconds'] = round(time.time() - started, 2)
+    if not dry_run:
+        write_report(config.get('RETENTION_REPORT_FILE'), report)
+    return report
+
+
+def write_report(path, report):
+    if not path:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f)
+    os.replace(tmp_path, path)
+
+
+def read_report(path):
+    """Laporan run retensi terakhir, atau None jika belum pernah dijalankan."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError, TypeError):
+        return None
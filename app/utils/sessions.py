@@ -0,0 +1,274 @@
+# app/utils/sessions.py
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface, SessionInterface
+
+# Backend session yang tersedia (Config.SESSION_BACKEND)
+SESSION_BACKENDS = ('cookie', 'kv', 'filesystem')
+
+
+# ====================================================================
+# STORE KEY-VALUE
+# ====================================================================
+
+class SQLiteSessionStore:
+    """
+    Pengganti lokal untuk store key-value bersama: satu file SQLite (WAL) yang
+    dipakai bersama oleh semua proses worker di host yang sama. Untuk beberapa
+    node gunakan Redis (SESSION_REDIS_URL).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _conn(self):
+        # Koneksi per thread dan per proses (tidak dibawa melewati fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """Mengembalikan (value, expires_at) atau None jika tidak ada/kedaluwarsa."""
+        row = self._conn().execute("SELECT value, expires_at FROM sessions WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row
+
+    def set(self, key, value, ttl):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO sessions (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl)
+        )
+
+    def touch(self, key, ttl):
+        self._conn().execute("UPDATE sessions SET expires_at = ? WHERE key = ?", (time.time() + ttl, key))
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+    def gc(self):
+        """Menghapus entri kedaluwarsa. Mengembalikan jumlah entri yang dihapus."""
+        return self._conn().execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),)).rowcount
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class RedisSessionStore:
+    """Store key-value bersama di Redis. Kedaluwarsa ditangani Redis (EXPIRE), jadi gc() tidak perlu."""
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        pipe = self.client.pipeline()
+        pipe.get(key)
+        pipe.pttl(key)
+        value, pttl = pipe.execute()
+        if value is None:
+            return None
+        return value.decode('utf-8'), time.time() + max(pttl, 0) / 1000.0
+
+    def set(self, key, value, ttl):
+        self.client.set(key, value, ex=int(ttl))
+
+    def touch(self, key, ttl):
+        self.client.expire(key, int(ttl))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def gc(self):
+        return 0
+
+    def count(self):
+        return None
+
+
+# ====================================================================
+# SESSION INTERFACE
+# ====================================================================
+
+class KeyValueSession(SecureCookieSession):
+    """Session server-side; cookie hanya berisi session id acak."""
+
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.expires_at = expires_at
+
+
+class KeyValueSessionInterface(SessionInterface):
+    """
+    Session disimpan di store key-value dengan I/O minimal:
+    - Request tanpa cookie session tidak menyentuh store sama sekali.
+    - Store hanya ditulis jika session diubah; masa berlaku diperpanjang (touch)
+      hanya jika sisa TTL tinggal kurang dari setengahnya.
+    - Entri kedaluwarsa dibersihkan paling sering sekali per gc_interval detik.
+    """
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, ttl=86400, key_prefix='session:', gc_interval=300):
+        self.store = store
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self.gc_interval = gc_interval
+        self._next_gc = time.monotonic() + gc_interval
+        self._gc_lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+        self.touches = 0
+        self.deletes = 0
+        self.gc_removed = 0
+
+    def _session_ttl(self, app, session):
+        if session.permanent:
+            return app.permanent_session_lifetime.total_seconds()
+        return self.ttl
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid or len(sid) > 128:
+            return KeyValueSession()
+        self.reads += 1
+        try:
+            entry = self.store.get(self.key_prefix + sid)
+        except Exception as e:
+            print(f"Session store error: {e}")
+            return KeyValueSession()
+        if entry is None:
+            return KeyValueSession()
+        value, expires_at = entry
+        try:
+            data = self.serializer.loads(value)
+        except ValueError:
+            return KeyValueSession()
+        return KeyValueSession(data, sid=sid, expires_at=expires_at)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            # Session dikosongkan (mis. logout): hapus entri dan cookie-nya
+            if session.modified and session.sid:
+                self._store_call(self.store.delete, self.key_prefix + session.sid)
+                self.deletes += 1
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+            return
+
+        ttl = self._session_ttl(app, session)
+        if session.modified or session.sid is None:
+            sid = session.sid or secrets.token_urlsafe(32)
+            if self._store_call(self.store.set, self.key_prefix + sid, self.serializer.dumps(dict(session)), ttl):
+                self.writes += 1
+                response.set_cookie(name, sid, expires=self.get_expiration_time(app, session),
+                                    httponly=httponly, domain=domain, path=path, secure=secure, samesite=samesite)
+            self._maybe_gc()
+        elif session.expires_at is not None and session.expires_at - time.time() < ttl / 2:
+            if self._store_call(self.store.touch, self.key_prefix + session.sid, ttl):
+                self.touches += 1
+                if session.permanent:
+                    response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                                        httponly=httponly, domain=domain, path=path, secure=secure, samesite=samesite)
+
+    def _store_call(self, fn, *args):
+        try:
+            fn(*args)
+            return True
+        except Exception as e:
+            print(f"Session store error: {e}")
+            return False
+
+    def _maybe_gc(self):
+        if not self.gc_interval or time.monotonic() < self._next_gc:
+            return
+        if not self._gc_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_gc = time.monotonic() + self.gc_interval
+            self.gc()
+        finally:
+            self._gc_lock.release()
+
+    def gc(self):
+        try:
+            removed = self.store.gc()
+        except Exception as e:
+            print(f"Session GC error: {e}")
+            return 0
+        self.gc_removed += removed
+        return removed
+
+    def stats(self):
+        return {
+            "backend": "kv",
+            "store": type(self.store).__name__,
+            "reads": self.reads,
+            "writes": self.writes,
+            "touches": self.touches,
+            "deletes": self.deletes,
+            "gc_removed": self.gc_removed,
+        }
+
+
+def create_session_interface(config):
+    """Membuat session interface sesuai SESSION_BACKEND ('filesystem' ditangani Flask-Session)."""
+    backend = config.get('SESSION_BACKEND', 'cookie')
+    if backend == 'cookie':
+        # Cookie bertanda tangan (itsdangerous, dikompresi zlib jika lebih kecil); tanpa I/O di server
+        return SecureCookieSessionInterface()
+    if backend == 'kv':
+        if config.get('SESSION_REDIS_URL'):
+            store = RedisSessionStore(config['SESSION_REDIS_URL'])
+        else:
+            store = SQLiteSessionStore(config['SESSION_KV_DB'])
+        return KeyValueSessionInterface(
+            store,
+            ttl=int(config.get('SESSION_KV_TTL', 86400)),
+            gc_interval=int(config.get('SESSION_GC_INTERVAL', 300))
+        )
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend!r} (choose from {', '.join(SESSION_BACKENDS)})")
+
+
+def init_app(app):
+    """
+    Memasang backend session sesuai SESSION_BACKEND. Backend 'cookie' membutuhkan
+    SECRET_KEY yang sama di semua proses; tanpa SECRET_KEY hanya backend server-side
+    yang dapat dipakai dan kunci acak dibuat untuk proses ini.
+    """
+    if not app.config.get('SECRET_KEY'):
+        if app.config.get('SESSION_BACKEND', 'cookie') == 'cookie':
+            raise RuntimeError("SESSION_BACKEND 'cookie' membutuhkan SECRET_KEY di environment.")
+        app.config['SECRET_KEY'] = os.urandom(24)
+    if app.config.get('SESSION_BACKEND', 'cookie') == 'filesystem':
+        from flask_session import Session
+        Session(app)
+        return
+    app.session_interface = create_session_interface(app.config)
@@ -0,0 +1,84 @@
+# app/utils/thumbnails.py
+import os
+import uuid
+
+import cv2
+from flask import current_app, url_for
+from werkzeug.security import safe_join
+
+# Parameter encoder OpenCV untuk tiap format thumbnail
+_ENCODE_PARAMS = {
+    'webp': lambda quality: [cv2.IMWRITE_WEBP_QUALITY, quality],
+    'jpg': lambda quality: [cv2.IMWRITE_JPEG_QUALITY, quality],
+}
+
+
+def _uploads_dir():
+    return os.path.normpath(os.path.join(current_app.root_path, '..', current_app.config['UPLOAD_FOLDER_BASE']))
+
+
+def _thumbnails_dir():
+    return os.path.normpath(os.path.join(current_app.root_path, '..', current_app.config['THUMBNAIL_FOLDER']))
+
+
+def thumbnail_relpath(rel_path, size):
+    """Path relatif thumbnail di dalam folder cache, mis. '128/raw_images/abc.JPG.webp'."""
+    fmt = current_app.config.get('THUMBNAIL_FORMAT', 'webp')
+    return f"{size}/{rel_path.replace(chr(92), '/')}.{fmt}"
+
+
+def ensure_thumbnail(rel_path, size):
+    """
+    Memastikan thumbnail untuk file di folder uploads tersedia di cache disk.
+    Thumbnail dibuat ulang jika belum ada atau file aslinya lebih baru.
+    Mengembalikan path relatif thumbnail, atau None jika sumber tidak valid.
+    """
+    source = safe_join(_uploads_dir(), rel_path.replace('\\', '/'))
+    target = safe_join(_thumbnails_dir(), thumbnail_relpath(rel_path, size))
+    if source is None or target is None or not os.path.isfile(source):
+        return None
+
+    try:
+        if os.path.getmtime(target) >= os.path.getmtime(source):
+            return thumbnail_relpath(rel_path, size)
+    except OSError:
+        pass
+
+    image = cv2.imread(source)
+    if image is None:
+        return None
+    height, width = image.shape[:2]
+    scale = size / float(max(height, width))
+    if scale < 1:
+        image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+
+    fmt = current_app.config.get('THUMBNAIL_FORMAT', 'webp')
+    quality = int(current_app.config.get('THUMBNAIL_QUALITY', 80))
+    ok, encoded = cv2.imencode(f'.{fmt}', image, _ENCODE_PARAMS.get(fmt, lambda q: [])(quality))
+    if not ok:
+        return None
+
+    # Tulis ke file sementara lalu rename agar request paralel tidak membaca file setengah jadi
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(encoded.tobytes())
+    os.replace(tmp_path, target)
+    return thumbnail_relpath(rel_path, size)
+
+
+def generate_thumbnails(rel_path):
+    """Membuat thumbnail untuk semua ukuran yang dikonfigurasi (dipakai saat ingest)."""
+    for size in current_app.config.get('THUMBNAIL_SIZES', ()):
+        try:
+            ensure_thumbnail(rel_path, size)
+        except Exception as e:
+            print(f"Error generating thumbnail {size}px for {rel_path}: {e}")
+
+
+def thumbnail_url(rel_path, size=None):
+    """URL thumbnail untuk path relatif di folder uploads (dibuat lazy saat diminta)."""
+    if not rel_path:
+        return None
+    size = size or current_app.config.get('THUMBNAIL_DEFAULT_SIZE', 128)
+    return url_for('main.serve_thumbnail', size=size, filepath_in_uploads_dir=rel_path.replace('\\', '/'))
@@ -0,0 +1,126 @@
+# app/utils/user_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+from .db import query_db
+from .thumbnails import thumbnail_url
+
+# Kolom profil yang di-cache (tanpa password_hash dan kolom yang sering berubah seperti total_uploads)
+USER_COLUMNS = "id, display_name, email, phone_number, profile_picture_path, date_of_birth, address, is_active"
+
+
+class UserCache:
+    """
+    Cache read-through (TTL + LRU) untuk record pengguna dan URL avatar turunannya.
+    Entri dihapus secara eksplisit oleh jalur tulis (profil dan admin) lewat invalidate();
+    TTL membatasi umur entri di proses worker lain yang tidak menerima invalidasi tersebut.
+    """
+
+    def __init__(self, capacity=10000, ttl=60, enabled=True):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries = OrderedDict()  # user_id -> (expires_at, record, avatar_urls)
+        self._lock = threading.Lock()
+        self._version = 0  # Naik setiap invalidasi; load yang bersamaan dengan invalidasi tidak disimpan
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('USER_CACHE_ENABLED', self.enabled)
+        self.capacity = max(1, int(app.config.get('USER_CACHE_SIZE', self.capacity)))
+        self.ttl = float(app.config.get('USER_CACHE_TTL', self.ttl))
+        self.clear()
+
+    def _lookup(self, user_id):
+        """Mengembalikan entri yang masih berlaku (dan menandainya baru dipakai), atau None."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[user_id]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry
+
+    def _load(self, user_id):
+        version = self._version
+        record = query_db(f"SELECT {USER_COLUMNS} FROM users WHERE id = %s", (user_id,), one=True)
+        # Pengguna tidak ditemukan atau DB gagal: jangan di-cache
+        if not record:
+            return None
+        entry = (time.monotonic() + self.ttl, record, {})
+        with self._lock:
+            if version != self._version:
+                # Record mungkin dibaca sebelum penulisan yang baru saja di-invalidate
+                return entry
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def _entry(self, user_id):
+        if user_id is None:
+            return None
+        if not self.enabled:
+            record = query_db(f"SELECT {USER_COLUMNS} FROM users WHERE id = %s", (user_id,), one=True)
+            return (0, record, {}) if record else None
+        return self._lookup(user_id) or self._load(user_id)
+
+    def get_user(self, user_id):
+        """Record profil pengguna (salinan dict, aman diubah pemanggil) atau None."""
+        entry = self._entry(user_id)
+        return dict(entry[1]) if entry else None
+
+    def avatar_url(self, user_id, size):
+        """URL thumbnail foto profil dalam ukuran `size`, atau None jika pengguna tidak punya foto."""
+        entry = self._entry(user_id)
+        if not entry or not entry[1].get('profile_picture_path'):
+            return None
+        avatar_urls = entry[2]
+        url = avatar_urls.get(size)
+        if url is None:
+            url = avatar_urls[size] = thumbnail_url(entry[1]['profile_picture_path'], size)
+        return url
+
+    def invalidate(self, user_id):
+        """Dipanggil setelah record pengguna diubah atau dihapus."""
+        with self._lock:
+            self._version += 1
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# Cache global untuk record pengguna
+user_cache = UserCache()
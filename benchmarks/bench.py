@@ -0,0 +1,284 @@
+# benchmarks/bench.py
+"""
+Benchmark beban untuk /upload, /history, /admin/logs dan /admin/users/data.
+
+Menjalankan create_app() dengan model pengganti yang deterministik (tanpa
+TensorFlow) dan database MySQL lokal yang diisi oleh benchmarks/seed.py,
+lalu mengirim beban campuran dengan concurrency tertentu lewat HTTP.
+Hasil (p50/p95/p99, requests/sec, peak RSS) ditulis sebagai JSON.
+
+Contoh:
+    python -m benchmarks.bench --seed --users 50000 --detections 1000000
+    python -m benchmarks.bench --concurrency 16 --duration 60 --mix upload=3,history=4,admin_logs=1,admin_users=2 --output run.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import threading
+import time
+import uuid
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+import numpy as np
+from werkzeug.serving import make_server
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SAMPLE_IMAGE = os.path.join(ROOT_DIR, 'uploads', 'raw_images', '1db71a1244a54df38923e24897b0c833.JPG')
+
+
+class DeterministicModel:
+    """Model pengganti: skor kelas dihitung dari rata-rata piksel (hasil selalu sama untuk gambar yang sama)."""
+    name = 'bench-stub'
+
+    def __init__(self, delay_ms=0.0):
+        self.delay_ms = delay_ms
+
+    def predict(self, batch):
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000.0)
+        healthy = np.clip(np.asarray(batch).reshape(len(batch), -1).mean(axis=1), 0.0, 1.0)
+        return np.stack([1.0 - healthy, healthy], axis=1).astype(np.float32)
+
+
+def build_app(args):
+    from config import Config
+
+    class BenchConfig(Config):
+        DB_HOST = args.db_host
+        DB_USER = args.db_user
+        DB_PASSWORD = args.db_password
+        DB_NAME = args.db_name
+        MODEL_PRELOAD = False
+        SECRET_KEY = 'benchmark-secret'
+        SESSION_TYPE = 'filesystem'
+        SESSION_FILE_DIR = os.path.join(ROOT_DIR, 'cache', 'bench_sessions')
+        PREDICTION_CACHE_ENABLED = not args.no_cache
+        PREDICTION_CACHE_DB = os.path.join(ROOT_DIR, 'cache', 'bench_prediction_cache.sqlite3')
+        JOB_QUEUE_DB = os.path.join(ROOT_DIR, 'cache', 'bench_jobs.sqlite3')
+        UPLOAD_FOLDER_RAW = os.path.join(ROOT_DIR, 'cache', 'bench_raw_images')
+
+    os.makedirs(BenchConfig.UPLOAD_FOLDER_RAW, exist_ok=True)
+
+    from app import create_app
+    from app.utils.prediction import model_provider
+
+    app = create_app(BenchConfig)
+    # Ganti loader model dengan model deterministik sebelum dipakai pertama kali
+    model_provider.loader = lambda _path: DeterministicModel(args.model_delay_ms)
+    model_provider.backend_name = 'bench-stub'
+    model_provider.get()
+    return app
+
+
+class BenchClient:
+    """Klien HTTP sederhana (satu koneksi keep-alive per thread) dengan cookie session."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.conn = http.client.HTTPConnection(host, port, timeout=60)
+        self.cookies = {}
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f"{k}={v}" for k, v in self.cookies.items())
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Koneksi ditutup server; buka ulang sekali
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+        data = response.read()
+        for header in response.headers.get_all('Set-Cookie') or []:
+            cookie = SimpleCookie(header)
+            for key, morsel in cookie.items():
+                self.cookies[key] = morsel.value
+        return response.status, data
+
+    def login_user(self, user_index):
+        from benchmarks.seed import BENCH_PASSWORD
+        body = urlencode({'login_identifier': f"bench{user_index}@example.com", 'password': BENCH_PASSWORD})
+        self.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+
+    def login_admin(self):
+        from benchmarks.seed import BENCH_ADMIN
+        body = urlencode({'username': BENCH_ADMIN[0], 'password': BENCH_ADMIN[1]})
+        self.request('POST', '/login_administrator', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+
+
+def _multipart(image_bytes, filename):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + image_bytes + f"\r\n--{boundary}--\r\n".encode()
+    return body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+def _make_image_variants(count, seed):
+    """Beberapa variasi gambar contoh (byte berbeda) agar tidak semuanya kena cache."""
+    import cv2
+    rng = np.random.default_rng(seed)
+    base = cv2.imread(SAMPLE_IMAGE)
+    variants = []
+    for _ in range(count):
+        noisy = np.clip(base.astype(np.int16) + rng.integers(-3, 4, base.shape), 0, 255).astype(np.uint8)
+        variants.append(cv2.imencode('.jpg', noisy)[1].tobytes())
+    return variants
+
+
+def parse_mix(spec):
+    weights = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - {'upload', 'history', 'admin_logs', 'admin_users'}
+    if unknown:
+        raise SystemExit(f"Unknown workload(s): {', '.join(sorted(unknown))}")
+    return weights
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def run_workload(host, port, args):
+    weights = parse_mix(args.mix)
+    names = list(weights)
+    images = _make_image_variants(args.image_variants, args.random_seed)
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    start_barrier = threading.Barrier(args.concurrency + 1)
+
+    def worker(index):
+        rng = random.Random(args.random_seed + index)
+        user_client = BenchClient(host, port)
+        user_client.login_user(rng.randint(1, args.users))
+        admin_client = BenchClient(host, port)
+        admin_client.login_admin()
+        local_lat = {name: [] for name in names}
+        local_err = {name: 0 for name in names}
+        start_barrier.wait()
+
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights=[weights[n] for n in names])[0]
+            started = time.perf_counter()
+            if name == 'upload':
+                body, headers = _multipart(rng.choice(images), 'bench.jpg')
+                status, _ = user_client.request('POST', '/upload', body, headers)
+            elif name == 'history':
+                status, _ = user_client.request('GET', '/history')
+            elif name == 'admin_logs':
+                status, _ = admin_client.request('GET', '/admin/logs')
+            else:
+                status, _ = admin_client.request('GET', '/admin/users/data')
+            local_lat[name].append(time.perf_counter() - started)
+            # Redirect (mis. ke halaman login) juga dihitung sebagai kegagalan
+            if status >= 300:
+                local_err[name] += 1
+
+        with lock:
+            for name in names:
+                latencies[name].extend(local_lat[name])
+                errors[name] += local_err[name]
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    report = {"endpoints": {}, "elapsed_seconds": elapsed}
+    total = 0
+    for name in names:
+        values = sorted(latencies[name])
+        total += len(values)
+        report["endpoints"][name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "requests_per_second": len(values) / elapsed if elapsed else 0,
+            "p50_ms": (percentile(values, 50) or 0) * 1000,
+            "p95_ms": (percentile(values, 95) or 0) * 1000,
+            "p99_ms": (percentile(values, 99) or 0) * 1000,
+            "max_ms": (values[-1] if values else 0) * 1000,
+        }
+    report["total_requests"] = total
+    report["requests_per_second"] = total / elapsed if elapsed else 0
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db-host', default=os.environ.get('BENCH_DB_HOST', 'localhost'))
+    parser.add_argument('--db-user', default=os.environ.get('BENCH_DB_USER', 'root'))
+    parser.add_argument('--db-password', default=os.environ.get('BENCH_DB_PASSWORD', ''))
+    parser.add_argument('--db-name', default=os.environ.get('BENCH_DB_NAME', 'fusarium_bench'))
+    parser.add_argument('--seed', action='store_true', help='Buat ulang dan isi database benchmark sebelum run.')
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--detections', type=int, default=1000000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0, help='Durasi run (detik).')
+    parser.add_argument('--mix', default='upload=3,history=4,admin_logs=1,admin_users=2')
+    parser.add_argument('--image-variants', type=int, default=16)
+    parser.add_argument('--model-delay-ms', type=float, default=0.0, help='Simulasi waktu inferensi per batch.')
+    parser.add_argument('--no-cache', action='store_true', help='Nonaktifkan cache hasil prediksi.')
+    parser.add_argument('--random-seed', type=int, default=42)
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--output', help='Tulis hasil JSON ke file (default: stdout).')
+    args = parser.parse_args(argv)
+
+    if args.seed:
+        from benchmarks.seed import seed_database
+        seed_database(args.db_host, args.db_user, args.db_password, args.db_name,
+                      num_users=args.users, num_detections=args.detections, seed=args.random_seed)
+
+    app = build_app(args)
+    # Log akses werkzeug per request ikut membebani run; tampilkan error saja
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        report = run_workload('127.0.0.1', server.server_port, args)
+    finally:
+        server.shutdown()
+        from app.utils.background_writer import upload_writer
+        from app.utils.detection_buffer import detection_buffer
+        upload_writer.flush()
+        detection_buffer.flush()
+
+    report["config"] = {
+        "concurrency": args.concurrency, "duration": args.duration, "mix": args.mix,
+        "users": args.users, "detections": args.detections, "prediction_cache": not args.no_cache,
+        "model_delay_ms": args.model_delay_ms,
+    }
+    report["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    report["python"] = platform.python_version()
+    report["timestamp"] = time.time()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# benchmarks/seed.py
+"""
+Membuat dan mengisi database MySQL lokal untuk benchmark.
+
+Skema mengikuti kolom yang dipakai oleh rute aplikasi. Data dibuat
+deterministik (random.Random(seed)) sehingga dua run dengan parameter
+yang sama menghasilkan isi database yang sama.
+"""
+import random
+from datetime import datetime, timedelta
+
+import mysql.connector
+from werkzeug.security import generate_password_hash
+
+from app.utils.detection_stats import rebuild_stats
+from app.utils.migrations import apply_migrations
+
+BENCH_PASSWORD = 'Benchmark123'
+BENCH_ADMIN = ('bench_admin', 'bench_admin_password')
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        display_name VARCHAR(100) NOT NULL,
+        phone_number VARCHAR(20) NOT NULL UNIQUE,
+        email VARCHAR(120) NOT NULL UNIQUE,
+        password_hash VARCHAR(255) NOT NULL,
+        profile_picture_path VARCHAR(255) NULL,
+        date_of_birth DATE NULL,
+        address TEXT NULL,
+        total_uploads INT NOT NULL DEFAULT 0,
+        is_active TINYINT(1) NOT NULL DEFAULT 1,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS admins (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(50) NOT NULL UNIQUE,
+        password_hash VARCHAR(255) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS fusarium_new_raw_images (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        image_path VARCHAR(255) NOT NULL,
+        uploaded_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_raw_images_user (user_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS fusarium_new_detections (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        raw_image_id INT NULL,
+        result VARCHAR(100) NOT NULL,
+        confidence FLOAT NOT NULL,
+        image_path VARCHAR(255) NULL,
+        detection_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_detections_user (user_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS password_reset_tokens (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        token VARCHAR(255) NOT NULL,
+        expires_at DATETIME NOT NULL
+    )
+    """,
+]
+
+LABELS = ['Infected (TYLCV)', 'Healthy']
+
+
+def connect(host, user, password, database=None):
+    return mysql.connector.connect(host=host, user=user, password=password, database=database)
+
+
+def seed_database(host, user, password, database, num_users=50000, num_detections=1000000,
+                  sample_image='raw_images/1db71a1244a54df38923e24897b0c833.JPG',
+                  chunk_size=10000, seed=42, progress=print):
+    """
+    Membuat ulang database `database` lalu mengisinya dengan num_users pengguna
+    dan num_detections deteksi (masing-masing dengan satu baris gambar mentah).
+    Semua pengguna memakai password BENCH_PASSWORD; email bench<i>@example.com.
+    """
+    rng = random.Random(seed)
+
+    conn = connect(host, user, password)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+    cursor.execute(f"CREATE DATABASE `{database}`")
+    cursor.execute(f"USE `{database}`")
+    for statement in SCHEMA:
+        cursor.execute(statement)
+    # Indeks produksi dari folder migrations/ agar rencana query sama dengan di server
+    apply_migrations(conn, progress=progress)
+
+    # Hash password dihitung sekali; semua pengguna benchmark memakai password yang sama
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    cursor.execute("INSERT INTO admins (username, password_hash) VALUES (%s, %s)", BENCH_ADMIN)
+
+    base_date = datetime(2024, 1, 1)
+    for start in range(0, num_users, chunk_size):
+        rows = [
+            (f"Bench User {i}", f"08{i:010d}", f"bench{i}@example.com", password_hash,
+             base_date + timedelta(minutes=i))
+            for i in range(start + 1, min(start + chunk_size, num_users) + 1)
+        ]
+        cursor.executemany(
+            "INSERT INTO users (display_name, phone_number, email, password_hash, created_at) VALUES (%s, %s, %s, %s, %s)",
+            rows
+        )
+        conn.commit()
+    progress(f"Seeded {num_users} users.")
+
+    # Id gambar mentah dan deteksi berurutan karena tabel baru dibuat
+    for start in range(0, num_detections, chunk_size):
+        ids = range(start + 1, min(start + chunk_size, num_detections) + 1)
+        user_ids = [rng.randint(1, num_users) for _ in ids]
+        cursor.executemany(
+            "INSERT INTO fusarium_new_raw_images (id, user_id, image_path) VALUES (%s, %s, %s)",
+            [(i, uid, sample_image) for i, uid in zip(ids, user_ids)]
+        )
+        cursor.executemany(
+            "INSERT INTO fusarium_new_detections (user_id, raw_image_id, result, confidence, image_path, detection_date) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            [
+                (uid, i, rng.choice(LABELS), round(rng.uniform(0.5, 1.0), 4), sample_image,
+                 base_date + timedelta(seconds=i * 30))
+                for i, uid in zip(ids, user_ids)
+            ]
+        )
+        conn.commit()
+        progress(f"Seeded {min(start + chunk_size, num_detections)}/{num_detections} detections.")
+
+    # Tabel ringkasan dan users.total_uploads dihitung dari data yang baru diisi
+    rebuild_stats(conn)
+    progress("Rebuilt detection summary tables.")
+
+    cursor.close()
+    conn.close()
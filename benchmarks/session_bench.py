@@ -0,0 +1,137 @@
+# benchmarks/session_bench.py
+"""
+Micro-benchmark overhead session per request untuk setiap backend session
+(cookie, kv dengan SQLite lokal, kv dengan Redis jika --redis-url diisi, filesystem).
+
+Setiap backend dipasang pada aplikasi Flask minimal (tanpa database dan model)
+sehingga yang terukur hanya open_session/save_session. Skenario:
+  anonymous  - request tanpa cookie session
+  read       - pengguna login, route hanya membaca session (mis. login_required)
+  write      - pengguna login, route mengubah session setiap request
+Hasil (mikrodetik per request, ukuran cookie) ditulis sebagai JSON.
+
+Contoh:
+    python -m benchmarks.session_bench --requests 5000
+    python -m benchmarks.session_bench --redis-url redis://localhost:6379/15 --output sessions.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+
+from flask import Flask, session
+
+from app.utils.sessions import init_app as init_sessions
+
+# Isi session pengguna yang login (sama dengan auth_routes.login)
+LOGIN_SESSION = {'user_id': 123456, 'logged_in': True, 'user_name': 'Pengguna Benchmark'}
+
+
+def build_app(backend, workdir, redis_url=None):
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY='session-bench',
+        SESSION_BACKEND='kv' if backend.startswith('kv') else backend,
+        SESSION_PERMANENT=False,
+        SESSION_TYPE='filesystem',
+        SESSION_FILE_DIR=os.path.join(workdir, 'flask_session'),
+        SESSION_KV_DB=os.path.join(workdir, 'sessions.sqlite3'),
+        SESSION_REDIS_URL=redis_url if backend == 'kv-redis' else None,
+        SESSION_KV_TTL=3600,
+        SESSION_GC_INTERVAL=300,
+    )
+    init_sessions(app)
+
+    @app.route('/login')
+    def login():
+        session.update(LOGIN_SESSION)
+        return 'ok'
+
+    @app.route('/anonymous')
+    def anonymous():
+        return 'ok'
+
+    @app.route('/read')
+    def read():
+        return 'ok' if session.get('logged_in') else ('unauthorized', 401)
+
+    @app.route('/write')
+    def write():
+        session['counter'] = session.get('counter', 0) + 1
+        return 'ok'
+
+    return app
+
+
+def cookie_size(client, app):
+    cookie = client.get_cookie(app.config.get('SESSION_COOKIE_NAME', 'session'))
+    return len(cookie.value) if cookie else 0
+
+
+def time_requests(client, path, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}")
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def run_backend(backend, requests, redis_url=None):
+    workdir = tempfile.mkdtemp(prefix='session-bench-')
+    try:
+        app = build_app(backend, workdir, redis_url)
+        results = {}
+
+        client = app.test_client()
+        time_requests(client, '/anonymous', min(100, requests))
+        results['anonymous_us'] = time_requests(client, '/anonymous', requests)
+
+        client = app.test_client()
+        client.get('/login')
+        time_requests(client, '/read', min(100, requests))
+        results['read_us'] = time_requests(client, '/read', requests)
+        results['write_us'] = time_requests(client, '/write', requests)
+        results['cookie_bytes'] = cookie_size(client, app)
+
+        stats = getattr(app.session_interface, 'stats', None)
+        if stats is not None:
+            results['store'] = stats()
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='Request per skenario.')
+    parser.add_argument('--backends', default='cookie,kv-sqlite,filesystem')
+    parser.add_argument('--redis-url', help='Tambahkan backend kv-redis dengan URL ini.')
+    parser.add_argument('--output', help='Tulis hasil JSON ke file (default: stdout).')
+    args = parser.parse_args(argv)
+
+    backends = [name.strip() for name in args.backends.split(',') if name.strip()]
+    if args.redis_url and 'kv-redis' not in backends:
+        backends.append('kv-redis')
+
+    report = {
+        "requests_per_scenario": args.requests,
+        "python": platform.python_version(),
+        "backends": {},
+    }
+    for backend in backends:
+        report['backends'][backend] = run_backend(backend, args.requests, args.redis_url)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
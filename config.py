@@ -2,12 +2,23 @@
 import os
 
 class Config:
-    # Kunci Rahasia
-    SECRET_KEY = os.urandom(24)
+    # Kunci Rahasia. Wajib diisi di environment untuk backend session 'cookie' (semua proses
+    # dan node harus menandatangani dengan kunci yang sama); jika kosong, kunci acak per
+    # proses dibuat saat startup dan hanya backend server-side yang diizinkan.
+    SECRET_KEY = os.environ.get('SECRET_KEY')
 
     # Konfigurasi Session
+    # Backend: 'cookie' (cookie bertanda tangan, tanpa I/O di server), 'kv' (store key-value bersama:
+    # Redis jika SESSION_REDIS_URL diisi, selain itu SQLite lokal), atau 'filesystem' (Flask-Session).
+    # Default 'cookie' hanya jika SECRET_KEY diisi, selain itu 'kv'.
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND') or ('cookie' if SECRET_KEY else 'kv')
     SESSION_PERMANENT = False
-    SESSION_TYPE = "filesystem"
+    SESSION_TYPE = "filesystem"  # Hanya dipakai jika SESSION_BACKEND = 'filesystem'
+    SESSION_COOKIE_SAMESITE = 'Lax'
+    SESSION_REDIS_URL = os.environ.get('SESSION_REDIS_URL')
+    SESSION_KV_DB = os.path.join('cache', 'sessions.sqlite3')
+    SESSION_KV_TTL = 86400       # Detik tanpa perubahan sebelum session server-side kedaluwarsa
+    SESSION_GC_INTERVAL = 300    # Detik antar pembersihan entri kedaluwarsa
 
     # Konfigurasi Database
     DB_HOST = 'localhost'
@@ -15,16 +26,211 @@ class Config:
     DB_PASSWORD = ''
     DB_NAME = 'fusarium_new'
 
+    # Konfigurasi Pool Koneksi Database
+    DB_POOL_ENABLED = True
+    DB_POOL_SIZE = 5             # Koneksi yang tetap disimpan saat idle
+    DB_POOL_MAX_OVERFLOW = 10    # Koneksi tambahan saat ramai (ditutup setelah dipakai)
+    DB_POOL_TIMEOUT = 10         # Detik menunggu koneksi bebas sebelum gagal
+    DB_POOL_RECYCLE = 3600       # Detik sebelum koneksi dibuat ulang (di bawah wait_timeout MySQL)
+    DB_POOL_PRE_PING = True      # Ping koneksi saat checkout
+    DB_CONNECT_TIMEOUT = 10
+
     # Konfigurasi Mail
-    MAIL_SERVER = 'smtp.gmail.com'
-    MAIL_PORT = 587
-    MAIL_USE_TLS = True
-    MAIL_USERNAME = 'satriahadiwiyana7@gmail.com'  # Ganti dengan email Anda
-    MAIL_PASSWORD = 'uwdp fajv pfin iiuk'  # Ganti dengan App Password
+    # Untuk pengujian, arahkan ke server SMTP lokal, mis.:
+    #   python -m aiosmtpd -n -l localhost:1025
+    #   MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=0 MAIL_USERNAME= flask --app run mail send-test alamat@contoh.com
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', '587'))
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', '1') == '1'
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME', 'satriahadiwiyana7@gmail.com')  # Ganti dengan email Anda
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD', 'uwdp fajv pfin iiuk')  # Ganti dengan App Password
     MAIL_DEFAULT_SENDER = ('FUSACHECK', 'satriahadiwiyana7@students.amikom.ac.id')
+    MAIL_SMTP_TIMEOUT = 30       # Detik timeout socket SMTP
+    MAIL_SMTP_IDLE_TIMEOUT = 60  # Detik sebelum koneksi SMTP yang menganggur dibuka ulang
+
+    # Konfigurasi Antrean Email (dikirim di background; request tidak menunggu server SMTP)
+    MAIL_QUEUE_ENABLED = True
+    MAIL_QUEUE_DB = os.path.join('cache', 'mail_jobs.sqlite3')
+    MAIL_QUEUE_WORKERS = 1
+    MAIL_QUEUE_MAX_DEPTH = 10000
+    MAIL_QUEUE_MAX_RETRIES = 6      # Backoff 30, 60, ..., 960 detik (~30 menit, di bawah masa berlaku link reset)
+    MAIL_QUEUE_RETRY_BACKOFF = 30
+    MAIL_QUEUE_RESULT_TTL = 3600    # Job selesai dihapus setelah 1 jam
 
     # Konfigurasi Folder Upload
     UPLOAD_FOLDER_BASE = 'uploads'
     UPLOAD_FOLDER_RAW = os.path.join(UPLOAD_FOLDER_BASE, 'raw_images')
     UPLOAD_FOLDER_DETECTED = os.path.join(UPLOAD_FOLDER_BASE, 'detected_images')
-    UPLOAD_FOLDER_PROFILE = os.path.join(UPLOAD_FOLDER_BASE, 'profile_pics')
\ No newline at end of file
+    UPLOAD_FOLDER_PROFILE = os.path.join(UPLOAD_FOLDER_BASE, 'profile_pics')
+
+    # Konfigurasi Paginasi Riwayat & Log Deteksi
+    DETECTION_PAGE_SIZE = 50
+    DETECTION_MAX_PAGE_SIZE = 200
+
+    # Konfigurasi Ekspor Log Deteksi (/admin/logs/export)
+    EXPORT_FETCH_SIZE = 1000          # Baris per fetch dari cursor tanpa buffer
+    EXPORT_NET_WRITE_TIMEOUT = 3600   # Detik; mencegah MySQL memutus koneksi saat klien lambat
+
+    # Konfigurasi Penyajian File Unggahan
+    # 'python' (dikirim Flask), 'x-accel' (nginx, lihat UPLOAD_ACCEL_PREFIX), atau 'x-sendfile'
+    UPLOAD_SEND_MODE = 'python'
+    UPLOAD_ACCEL_PREFIX = '/_protected_uploads'  # Lokasi 'internal' nginx yang menunjuk ke folder uploads
+    UPLOAD_CACHE_MAX_AGE = 31536000  # 1 tahun untuk file bernama UUID (isi tidak pernah berubah)
+
+    # Konfigurasi Thumbnail (cache di disk, dibuat saat ingest atau saat pertama diminta)
+    THUMBNAIL_FOLDER = os.path.join(UPLOAD_FOLDER_BASE, 'thumbnails')
+    THUMBNAIL_SIZES = (64, 128, 256)
+    THUMBNAIL_DEFAULT_SIZE = 128
+    THUMBNAIL_AVATAR_SIZE = 64
+    THUMBNAIL_PROFILE_SIZE = 256
+    THUMBNAIL_FORMAT = 'webp'
+    THUMBNAIL_QUALITY = 80
+    THUMBNAIL_AT_INGEST = True
+
+    # Konfigurasi Model
+    MODEL_PATH = 'model_Tes2.h5'
+    # Muat model di background thread saat aplikasi dibuat. Nonaktif secara default agar perintah
+    # `flask ...`, benchmark, dan master prefork tidak mengimpor TensorFlow; entry point server
+    # (run.py, serve.py) memuat model sendiri. Isi MODEL_PRELOAD=1 untuk server WSGI lain (mis. gunicorn run:app).
+    MODEL_PRELOAD = os.environ.get('MODEL_PRELOAD', '0') == '1'
+    MODEL_WARMUP_BATCH_SIZE = 16  # 0 untuk menonaktifkan warmup
+    # Pemuatan yang gagal (mis. pool inferensi belum berjalan) dicoba lagi saat model
+    # dibutuhkan, dengan jeda yang berlipat ganda sampai batas maksimum (detik)
+    MODEL_LOAD_RETRY_BACKOFF = 5
+    MODEL_LOAD_RETRY_BACKOFF_MAX = 300
+
+    # Backend inferensi: 'keras', 'tflite_fp16', 'tflite_int8', atau 'onnx'
+    # Artefak non-Keras dibuat dengan `flask --app run model convert`
+    INFERENCE_BACKEND = 'keras'
+    INFERENCE_NUM_THREADS = None  # Jumlah thread intra-op untuk Keras/TFLite/ONNX (None = default runtime)
+
+    # Pool proses inferensi terpisah (`flask --app run model serve-pool`).
+    # Jika INFERENCE_POOL_ADDRESS diisi ('host:port' atau path unix socket),
+    # proses web tidak memuat model dan mengirim tensor lewat shared memory.
+    # Alamat TCP hanya boleh loopback; INFERENCE_POOL_AUTHKEY wajib diisi (tanpa default)
+    # karena koneksi pool meng-unpickle data yang diterima.
+    INFERENCE_POOL_ADDRESS = os.environ.get('INFERENCE_POOL_ADDRESS')
+    INFERENCE_POOL_AUTHKEY = (os.environ.get('INFERENCE_POOL_AUTHKEY') or '').encode() or None
+    INFERENCE_POOL_WORKERS = 2
+    INFERENCE_POOL_CPU_AFFINITY = None  # Contoh: '0-1,2-3' (satu grup CPU per worker)
+    INFERENCE_POOL_SLOTS = 4  # Jumlah koneksi + segmen shared memory per proses web
+
+    # Konfigurasi Inferensi (micro-batching)
+    INFERENCE_BATCHING_ENABLED = True
+    INFERENCE_MAX_BATCH_SIZE = 16
+    INFERENCE_MAX_WAIT_MS = 5
+
+    # Konfigurasi Cache Hasil Prediksi
+    PREDICTION_CACHE_ENABLED = True
+    PREDICTION_CACHE_SIZE = 1024
+    PREDICTION_CACHE_DB = os.path.join('cache', 'prediction_cache.sqlite3')
+
+    # Konfigurasi Unggah Banyak Gambar (/upload/batch)
+    BATCH_UPLOAD_MAX_FILES = 500
+    BATCH_UPLOAD_MAX_FILE_BYTES = 20 * 1024 * 1024
+    BATCH_UPLOAD_MAX_ARCHIVE_BYTES = 200 * 1024 * 1024  # Arsip zip yang lebih besar ditolak (413)
+
+    # Konfigurasi Admission Control Inferensi (/upload dan /upload/batch)
+    # Request di atas batas ditolak cepat dengan 503 + Retry-After alih-alih mengantre di depan model
+    INFERENCE_MAX_INFLIGHT = 32          # Per proses worker
+    INFERENCE_ADMISSION_WAIT_MS = 50     # Waktu tunggu maksimal untuk mendapat slot
+    INFERENCE_ADMISSION_RETRY_AFTER = 2  # Detik (header Retry-After)
+
+    # Konfigurasi Rate Limit (token bucket per proses worker, hanya untuk RATE_LIMIT_METHODS)
+    # {endpoint: {jenis_kunci: (kapasitas_burst, token_per_detik)}}
+    # Jenis kunci: 'ip' (alamat klien), 'user' (pengguna/admin yang login), 'account' (akun yang
+    # diisi di form), 'failed_login' (akun + IP; hanya login yang gagal yang mengambil token)
+    RATE_LIMIT_ENABLED = True
+    RATE_LIMIT_METHODS = ('POST',)
+    RATE_LIMIT_MAX_KEYS = 100000
+    RATE_LIMITS = {
+        'main.upload_image': {'ip': (30, 1.0), 'user': (30, 1.0)},
+        'main.upload_batch': {'ip': (5, 0.05), 'user': (5, 0.05)},
+        'auth.login': {'ip': (10, 0.1), 'failed_login': (5, 1 / 60)},
+        'auth.login_administrator': {'ip': (5, 1 / 60), 'failed_login': (5, 1 / 300)},
+        'auth.forgot_password': {'ip': (5, 1 / 60), 'account': (3, 1 / 300)},
+    }
+    # Jumlah proxy terpercaya di depan aplikasi (nginx, load balancer) agar alamat klien
+    # diambil dari X-Forwarded-For; 0 jika klien terhubung langsung
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', '0'))
+
+    # Konfigurasi Metrik (/metrics, format Prometheus)
+    METRICS_ENABLED = True
+    # /metrics hanya untuk admin yang login, scraper dengan header
+    # 'Authorization: Bearer <METRICS_TOKEN>', atau alamat di METRICS_ALLOWED_IPS
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_ALLOWED_IPS = tuple(
+        ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()
+    )
+
+    # Konfigurasi Job Deteksi Asinkron (/upload?mode=async)
+    JOB_QUEUE_ENABLED = True
+    # Worker antrean (deteksi, email, purge) dijalankan oleh run.py dan serve.py, bukan oleh
+    # setiap create_app() (perintah `flask ...` tidak boleh mengambil job). Isi
+    # JOB_QUEUE_START_WORKERS=1 untuk server WSGI lain (mis. gunicorn run:app).
+    JOB_QUEUE_START_WORKERS = os.environ.get('JOB_QUEUE_START_WORKERS', '0') == '1'
+    JOB_QUEUE_DB = os.path.join('cache', 'detection_jobs.sqlite3')
+    JOB_QUEUE_WORKERS = 2
+    JOB_QUEUE_MAX_DEPTH = 1000
+    JOB_QUEUE_RETRY_AFTER = 5  # Detik, untuk header Retry-After saat antrean penuh
+    JOB_MAX_RETRIES = 3
+    JOB_RETRY_BACKOFF = 2.0  # Detik, digandakan setiap percobaan ulang
+    JOB_RESULT_TTL = 86400  # Job selesai dihapus setelah 1 hari
+    JOB_EVENTS_TIMEOUT = 60
+
+    # Konfigurasi Penghapusan Massal di Background (hapus semua, per filter, per pengguna)
+    PURGE_JOB_ENABLED = True
+    PURGE_JOB_DB = os.path.join('cache', 'purge_jobs.sqlite3')
+    PURGE_JOB_WORKERS = 1
+    PURGE_JOB_MAX_DEPTH = 100
+    PURGE_JOB_MAX_RETRIES = 3
+    PURGE_JOB_RUNNING_TIMEOUT = 3600  # Transaksi penghapusan besar bisa berjalan lama
+    PURGE_REAPER_THREADS = 8          # Thread penghapus file paralel
+    PURGE_REAPER_BATCH_SIZE = 500     # Tombstone per batch
+
+    # Konfigurasi Retensi File Unggahan (`flask --app run uploads reap`, dijalankan terjadwal lewat cron, mis.:
+    #   15 3 * * *  cd /srv/fusacheck && flask --app run uploads reap)
+    # File tanpa referensi database (unggahan anonim, sisa penghapusan yang gagal) dihapus
+    # setelah berumur sekian hari per folder di bawah uploads
+    RETENTION_DAYS = {'raw_images': 7, 'profile_pics': 30}
+    RETENTION_SCAN_BATCH_SIZE = 500      # File per query pencocokan ke database
+    RETENTION_REAPER_THREADS = 4
+    RETENTION_MAX_FILES_PER_RUN = 0      # 0 = tanpa batas
+    RETENTION_TOMBSTONE_RETRY_HOURS = 24 # Tombstone purge yang lebih tua dari ini dicoba lagi (0 = nonaktif)
+    RETENTION_REPORT_FILE = os.path.join('cache', 'retention_report.json')
+
+    # Konfigurasi Penyimpanan Unggahan di Background
+    UPLOAD_ASYNC_PERSIST = True
+    UPLOAD_WRITER_QUEUE_SIZE = 256
+    UPLOAD_WRITER_THREADS = 2
+
+    # Konfigurasi Buffer Write-Behind Record Deteksi
+    DETECTION_BUFFER_ENABLED = True
+    DETECTION_BUFFER_BATCH_SIZE = 100     # Baris per transaksi
+    DETECTION_BUFFER_FLUSH_MS = 200       # Batas waktu record menunggu di buffer
+    DETECTION_BUFFER_MAX_PENDING = 5000   # Batas memori; jika penuh pemanggil menunggu lalu menulis langsung
+    DETECTION_BUFFER_PUT_TIMEOUT = 2      # Detik menunggu ruang buffer (backpressure)
+    DETECTION_BUFFER_MAX_RETRIES = 3
+    # Baris yang tetap gagal ditulis disimpan di sini dan diputar ulang secara berkala
+    DETECTION_BUFFER_SPILL_DB = os.path.join('cache', 'detection_spill.sqlite3')
+    DETECTION_BUFFER_REPLAY_INTERVAL = 60  # Detik
+
+    # Konfigurasi Cache Record Pengguna (per proses worker)
+    USER_CACHE_ENABLED = True
+    USER_CACHE_SIZE = 10000
+    USER_CACHE_TTL = 60  # Detik; batas basi di worker lain yang tidak menerima invalidasi
+
+    # Konfigurasi Server Produksi Prefork (`python serve.py`)
+    SERVER_HOST = os.environ.get('SERVER_HOST', '0.0.0.0')
+    SERVER_PORT = int(os.environ.get('SERVER_PORT', '8000'))
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', '2'))
+    SERVER_THREADS_PER_WORKER = None    # Thread intra-op inferensi per worker (None = jumlah CPU / SERVER_WORKERS)
+    SERVER_INTEROP_THREADS = 1
+    SERVER_PRELOAD_MODEL = True         # Muat model di master sebelum fork (bobot dibagi copy-on-write)
+    SERVER_PREFORK = False              # Di-set serve.py; MODEL_PRELOAD lalu dijalankan per worker setelah fork
+    SERVER_MAX_REQUESTS = 10000         # Worker didaur ulang setelah sekian request (0 = tidak pernah)
+    SERVER_MAX_REQUESTS_JITTER = 1000
+    SERVER_MAX_WORKER_MEMORY_MB = 0     # Batas memori privat worker sebelum didaur ulang (0 = tanpa batas)
+    SERVER_GRACEFUL_TIMEOUT = 30        # Detik menunggu request berjalan saat worker berhenti
+    SERVER_STATUS_FILE = os.path.join('cache', 'server_workers.json')
+    SERVER_MEMORY_REPORT_INTERVAL = 60  # Detik antar laporan memori worker di log master (0 = nonaktif)
\ No newline at end of file
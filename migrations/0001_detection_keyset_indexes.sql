@@ -0,0 +1,11 @@
+-- migrations/0001_detection_keyset_indexes.sql
+-- Indeks komposit untuk paginasi keyset (detection_date, id) pada /history dan /admin/logs.
+
+-- Riwayat pengguna: WHERE user_id = ? ORDER BY detection_date DESC, id DESC
+CREATE INDEX idx_detections_user_date ON fusarium_new_detections (user_id, detection_date, id);
+
+-- Log admin tanpa filter atau dengan rentang tanggal
+CREATE INDEX idx_detections_date ON fusarium_new_detections (detection_date, id);
+
+-- Log admin dengan filter hasil deteksi
+CREATE INDEX idx_detections_result_date ON fusarium_new_detections (result, detection_date, id);
@@ -0,0 +1,22 @@
+-- migrations/0002_detection_aggregates.sql
+-- Tabel ringkasan yang diperbarui bertahap setiap kali deteksi ditulis/dihapus.
+-- Isi awal (dan rekonsiliasi) dibuat dengan `flask --app run detections rebuild-stats`.
+
+-- Jumlah deteksi per hari per hasil
+CREATE TABLE detection_daily_stats (
+    stat_date DATE NOT NULL,
+    result VARCHAR(100) NOT NULL,
+    detections INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (stat_date, result)
+);
+
+-- Jumlah deteksi per pengguna per hasil (users.total_uploads berisi totalnya)
+CREATE TABLE user_detection_stats (
+    user_id INT NOT NULL,
+    result VARCHAR(100) NOT NULL,
+    detections INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, result)
+);
+
+-- Pengguna dengan unggahan terbanyak untuk /admin/stats
+CREATE INDEX idx_users_total_uploads ON users (total_uploads);
@@ -0,0 +1,12 @@
+-- migrations/0003_file_tombstones.sql
+-- Tombstone file unggahan yang record database-nya sudah dihapus.
+-- Ditulis dalam transaksi yang sama dengan penghapusan baris, lalu file fisiknya
+-- dihapus di background oleh job purge (lihat app/utils/purge.py).
+CREATE TABLE file_tombstones (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    job_id VARCHAR(32) NOT NULL,
+    raw_image_id INT NULL,
+    file_path VARCHAR(255) NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_file_tombstones_job (job_id, id)
+);
@@ -0,0 +1,10 @@
+-- migrations/0004_retention_indexes.sql
+-- Indeks untuk job retensi (`flask --app run uploads reap`): pencocokan file di folder
+-- uploads dengan database dilakukan per batch (WHERE <kolom> IN (...)), dan token reset
+-- password kedaluwarsa dihapus berdasarkan expires_at.
+
+CREATE INDEX idx_raw_images_path ON fusarium_new_raw_images (image_path);
+
+CREATE INDEX idx_users_profile_picture ON users (profile_picture_path);
+
+CREATE INDEX idx_password_reset_tokens_expires ON password_reset_tokens (expires_at);
@@ -0,0 +1,13 @@
+-- migrations/0005_purge_runs.sql
+-- Penanda tahap 1 job purge yang sudah commit. Ditulis dalam transaksi yang sama dengan
+-- penghapusan baris, sehingga job yang diulang (mis. worker crash sebelum progres SQLite
+-- tersimpan) tidak menjalankan DELETE lagi dan langsung lanjut ke penghapusan file
+-- (lihat app/utils/purge.py).
+CREATE TABLE purge_runs (
+    purge_id VARCHAR(32) PRIMARY KEY,
+    scope VARCHAR(16) NOT NULL,
+    detections_deleted INT NOT NULL DEFAULT 0,
+    raw_images_deleted INT NOT NULL DEFAULT 0,
+    files_total INT NOT NULL DEFAULT 0,
+    completed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -1,7 +1,17 @@
 # run.py
+import os
+
 from app import create_app
 
 app = create_app()
 
 if __name__ == "__main__":
+    # Server development: model dimuat di background sebelum request pertama dan
+    # worker antrean job dijalankan.
+    # Dengan reloader, hanya proses anak (WERKZEUG_RUN_MAIN) yang melayani request.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from app import start_job_workers
+        from app.utils.prediction import model_provider
+        model_provider.preload()
+        start_job_workers()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,98 @@
+# serve.py
+"""
+Entry point server produksi (prefork). Aplikasi dan model dimuat satu kali di proses
+master sebelum fork sehingga worker berbagi bobot model lewat copy-on-write.
+
+    python serve.py --workers 4 --bind 0.0.0.0:8000
+
+`run.py` tetap dipakai untuk server development (`python run.py`) dan perintah `flask --app run ...`.
+"""
+import argparse
+import os
+
+from config import Config
+
+
+def parse_bind(value):
+    host, _, port = value.rpartition(':')
+    return host or '0.0.0.0', int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server produksi prefork FusaCheck.")
+    parser.add_argument('--bind', default=f"{Config.SERVER_HOST}:{Config.SERVER_PORT}", help='HOST:PORT')
+    parser.add_argument('--workers', type=int, default=Config.SERVER_WORKERS)
+    parser.add_argument('--threads-per-worker', type=int, default=Config.SERVER_THREADS_PER_WORKER,
+                        help='Thread intra-op inferensi per worker (default: jumlah CPU / workers).')
+    parser.add_argument('--max-requests', type=int, default=Config.SERVER_MAX_REQUESTS)
+    parser.add_argument('--no-preload-model', action='store_true', help='Model dimuat oleh tiap worker setelah fork.')
+    args = parser.parse_args()
+
+    from app.utils.prefork import PreforkServer, worker_threads
+
+    workers = max(1, args.workers)
+    threads = args.threads_per_worker or worker_threads(workers)
+    # Harus di-set sebelum TensorFlow/ONNX Runtime/OpenMP diimpor agar N worker
+    # tidak masing-masing memakai semua core
+    os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+    os.environ.setdefault('TF_NUM_INTRAOP_THREADS', str(threads))
+    os.environ.setdefault('TF_NUM_INTEROP_THREADS', str(Config.SERVER_INTEROP_THREADS))
+
+    class ServeConfig(Config):
+        # Server produksi selalu memuat model sebelum request pertama: di master di bawah,
+        # atau di tiap worker setelah fork (post_fork). Tidak ada thread preload sebelum fork.
+        MODEL_PRELOAD = True
+        SERVER_PREFORK = True
+        JOB_QUEUE_START_WORKERS = False  # Worker antrean dijalankan per worker di post_fork
+        INFERENCE_NUM_THREADS = Config.INFERENCE_NUM_THREADS or threads
+
+    from app import create_app, start_job_workers
+    from app.utils.prediction import model_provider
+    from app.utils.job_queue import detection_jobs
+    from app.utils.purge import purge_jobs
+    from app.utils.mailer import mail_jobs
+    from app.utils.background_writer import upload_writer
+    from app.utils.detection_buffer import detection_buffer
+
+    app = create_app(ServeConfig)
+
+    # Mode pool inferensi memakai socket dan shared memory per proses, jadi tidak dimuat sebelum fork
+    preload = app.config.get('SERVER_PRELOAD_MODEL', True) and not args.no_preload_model \
+        and not app.config.get('INFERENCE_POOL_ADDRESS')
+    if preload:
+        # Tanpa warmup: inferensi pertama (dan thread pool runtime) terjadi di worker
+        model_provider.load(warmup=False)
+        print(f"Model preloaded in master ({model_provider.state}); {threads} inference thread(s) per worker.")
+
+    def post_fork(index):
+        # Master tidak menjalankan job; tiap worker membuka koneksi antrean sendiri lalu menjalankan worker job
+        detection_jobs.after_fork()
+        purge_jobs.after_fork()
+        mail_jobs.after_fork()
+        start_job_workers()
+        if preload:
+            model_provider.warmup()
+        elif app.config.get('MODEL_PRELOAD'):
+            model_provider.preload()
+
+    def worker_exit():
+        # Urutan sama dengan atexit: antrean writer dikosongkan dulu, lalu buffer deteksi
+        upload_writer.shutdown()
+        detection_buffer.shutdown()
+
+    host, port = parse_bind(args.bind)
+    PreforkServer(
+        app, host=host, port=port, num_workers=workers,
+        max_requests=args.max_requests,
+        max_requests_jitter=app.config.get('SERVER_MAX_REQUESTS_JITTER', 0),
+        max_worker_memory_mb=app.config.get('SERVER_MAX_WORKER_MEMORY_MB', 0),
+        graceful_timeout=app.config.get('SERVER_GRACEFUL_TIMEOUT', 30),
+        status_file=app.config.get('SERVER_STATUS_FILE'),
+        report_interval=app.config.get('SERVER_MEMORY_REPORT_INTERVAL', 60),
+        post_fork=post_fork,
+        worker_exit=worker_exit,
+    ).serve_forever()
+
+
+if __name__ == "__main__":
+    main()